@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark script measuring the scaling of the dnashrink Burrows-Wheeler Transform
+on random DNA sequences of increasing length (up to 10 Mb by default)
+
+Usage : python3 benchmarks/bwt_benchmark.py [length ...]
+"""
+
+__author__ = 'Mohamed Ouertani'
+
+# Standard library imports
+import random
+import sys
+import time
+# Local package imports
+from dnashrink.bwt import Bwt
+
+
+def benchmark(length:int) -> float:
+    """
+    function that times the linear time BWT construction on a random sequence
+
+    Parameters
+    -----------
+    length : int
+        Number of nucleotides of the random sequence
+
+    Returns:
+    ----------
+    elapsed : float
+        Time in seconds spent building the BWT
+    """
+    #Generate a random DNA sequence of the given length
+    sequence = "".join(random.choices("ACGT",k=length))
+    bwt_handler = Bwt(sequence)
+    #Time the BWT construction only
+    start = time.perf_counter()
+    bwt_handler.bwt_builder()
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    """
+    main function that prints the construction time for each sequence length
+
+    Returns:
+    ----------
+    None
+    """
+    #Use the lengths given on the command line or the default scale up to 10 Mb
+    lengths = [int(arg) for arg in sys.argv[1:]] or [10**4,10**5,10**6,10**7]
+    print(f"{'length':>12} {'seconds':>10} {'ns/base':>10}")
+    for length in lengths:
+        elapsed = benchmark(length)
+        print(f"{length:>12} {elapsed:>10.2f} {elapsed*1e9/length:>10.0f}")
+
+
+#Execute main function
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,6 @@
 """__init__ file for the package"""
 
-__all__ = ['binary_tree', 'bwt', 'controller',
-           'huffman', 'model', 'view', 'main']
+__all__ = ['adaptive_huffman', 'alphabet', 'binary_tree', 'bit_io', 'bwt', 'bwt_kernels',
+           'bwt_matrix', 'container', 'context_model', 'controller', 'external_bwt', 'fm_index',
+           'huffman', 'huffman_decoder', 'huffman_stream', 'model', 'mtf_rle', 'two_bit', 'view',
+           'main', 'suffix_array']
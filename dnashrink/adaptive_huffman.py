@@ -0,0 +1,477 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Adaptive Huffman module part of the dnashrink package used to compress sequences in a
+single pass (FGK algorithm) : the tree is updated after every character by both the
+encoder and the decoder, so no table is saved and the output starts with the first character
+"""
+
+__author__ = 'Mohamed Ouertani'
+
+# Standard library imports
+from typing import Generator
+# Local application imports
+from dnashrink.bit_io import BitWriter
+
+
+class AdaptiveTree():
+
+    """
+    AdaptiveTree class holding the Huffman tree of the characters seen so far in
+    parallel lists indexed by node. The nodes are numbered so that their weights never
+    decrease with their number (sibling property); the first occurrence of a character
+    is coded by the NYT (not yet transmitted) leaf followed by the character itself
+
+    Attributes
+    ----------
+    weights : list[int]
+        Number of occurrences below each node
+    parents : list[int]
+        Parent of each node; -1 for the root
+    zeros : list[int]
+        Node of the zero branch of each node; -1 for the leaves
+    ones : list[int]
+        Node of the one branch of each node; -1 for the leaves
+    symbols : list[str]
+        Character of each leaf; None for the other nodes
+    numbers : list[int]
+        Number of each node in the sibling order
+    nodes : list[int]
+        Node holding each number
+    root : int
+        Top node of the tree
+    nyt : int
+        Leaf standing for the characters not seen yet
+    leaves : dict
+        Leaf of each character seen so far
+    """
+
+    #Number of bits used to write a character after the NYT code
+    ESCAPE_BITS = 9
+    #Value written after the NYT code to end the stream
+    END_VALUE = 256
+    #Number of the root; every character and the NYT leaf fit below it
+    ROOT_NUMBER = 2*(END_VALUE+1)
+
+    def __init__(self) -> None:
+        """
+        Class constructor method creating a tree made of the NYT leaf alone
+
+        Returns:
+        ----------
+        None
+        """
+        self.weights = []
+        self.parents = []
+        self.zeros = []
+        self.ones = []
+        self.symbols = []
+        self.numbers = []
+        self.nodes = [-1]*(self.ROOT_NUMBER+1)
+        self.root = self.nyt = self.new_node(self.ROOT_NUMBER,None)
+        self.leaves = {}
+
+    def new_node(self,number:int,symbol) -> int:
+        """
+        Class method adding a leaf of weight 0 to the lists
+
+        Parameters
+        -----------
+        number : int
+            Number of the node in the sibling order
+        symbol : str
+            Character of the leaf; None for the NYT leaf
+
+        Returns:
+        ----------
+        int :
+            Index of the new node
+        """
+        node = len(self.weights)
+        self.weights.append(0)
+        self.parents.append(-1)
+        self.zeros.append(-1)
+        self.ones.append(-1)
+        self.symbols.append(symbol)
+        self.numbers.append(number)
+        self.nodes[number] = node
+        return node
+
+    def add_symbol(self,symbol:str) -> int:
+        """
+        Class method splitting the NYT leaf into a new NYT leaf and the leaf of a new character
+
+        Parameters
+        -----------
+        symbol : str
+            Character seen for the first time
+
+        Returns:
+        ----------
+        int :
+            Leaf of the character
+        """
+        parent = self.nyt
+        number = self.numbers[parent]
+        self.nyt = self.new_node(number-2,None)
+        leaf = self.new_node(number-1,symbol)
+        self.zeros[parent] = self.nyt
+        self.ones[parent] = leaf
+        self.parents[self.nyt] = self.parents[leaf] = parent
+        self.leaves[symbol] = leaf
+        return leaf
+
+    def get_code(self,node:int) -> tuple:
+        """
+        Class method giving the code of a node from the path between the root and the node
+
+        Parameters
+        -----------
+        node : int
+            Node whose code is needed
+
+        Returns:
+        ----------
+        value : int
+            Integer value of the code
+        length : int
+            Number of bits of the code
+        """
+        parents = self.parents
+        ones = self.ones
+        value = length = 0
+        #Walk up to the root, the bits being found from the last one
+        while node != self.root:
+            parent = parents[node]
+            if ones[parent] == node:
+                value |= 1 << length
+            length += 1
+            node = parent
+        return value,length
+
+    def update(self,node:int) -> None:
+        """
+        Class method incrementing the weights from a leaf up to the root
+        Before its weight grows, each node takes the place of the highest numbered node
+        of the same weight so the sibling property holds
+
+        Parameters
+        -----------
+        node : int
+            Leaf of the character that was just coded
+
+        Returns:
+        ----------
+        None
+        """
+        weights = self.weights
+        parents = self.parents
+        numbers = self.numbers
+        nodes = self.nodes
+        root_number = self.ROOT_NUMBER
+        while node != -1:
+            weight = weights[node]
+            #Find the leader of the block of nodes having the same weight
+            leader_number = numbers[node]
+            while leader_number < root_number and weights[nodes[leader_number+1]] == weight:
+                leader_number += 1
+            leader = nodes[leader_number]
+            if leader != node and leader != parents[node]:
+                self.swap(node,leader)
+            weights[node] = weight + 1
+            node = parents[node]
+
+    def swap(self,first:int,second:int) -> None:
+        """
+        Class method exchanging the places of two nodes along with their subtrees
+
+        Parameters
+        -----------
+        first : int
+            First node
+        second : int
+            Second node
+
+        Returns:
+        ----------
+        None
+        """
+        zeros = self.zeros
+        ones = self.ones
+        parents = self.parents
+        first_parent = parents[first]
+        second_parent = parents[second]
+        if first_parent == second_parent:
+            zeros[first_parent],ones[first_parent] = ones[first_parent],zeros[first_parent]
+        else:
+            if zeros[first_parent] == first:
+                zeros[first_parent] = second
+            else:
+                ones[first_parent] = second
+            if zeros[second_parent] == second:
+                zeros[second_parent] = first
+            else:
+                ones[second_parent] = first
+            parents[first],parents[second] = second_parent,first_parent
+        numbers = self.numbers
+        numbers[first],numbers[second] = numbers[second],numbers[first]
+        self.nodes[numbers[first]] = first
+        self.nodes[numbers[second]] = second
+
+
+class AdaptiveHuffmanEncoder():
+
+    """
+    AdaptiveHuffmanEncoder class coding a sequence given as successive chunks,
+    each chunk giving its complete bytes right away
+
+    Attributes
+    ----------
+    tree : AdaptiveTree
+        Tree of the characters coded so far
+    bit_writer : BitWriter
+        Writer packing the codes
+    """
+
+    def __init__(self) -> None:
+        """
+        Class constructor method for initializing all the attributes
+
+        Returns:
+        ----------
+        None
+        """
+        self.tree = AdaptiveTree()
+        self.bit_writer = BitWriter()
+
+    def feed(self,chunk:str) -> bytes:
+        """
+        Class method coding the next chunk of the sequence
+
+        Parameters
+        -----------
+        chunk : str
+            Next part of the sequence; its characters are latin-1 characters
+
+        Returns:
+        ----------
+        bytes :
+            Complete bytes of codes written since the previous chunk
+        """
+        tree = self.tree
+        leaves = tree.leaves
+        write = self.bit_writer.write
+        escape_bits = tree.ESCAPE_BITS
+        for symbol in chunk:
+            leaf = leaves.get(symbol)
+            if leaf is None:
+                if ord(symbol) >= tree.END_VALUE:
+                    raise ValueError(f"Character {symbol!r} is not a latin-1 character")
+                #Write the NYT code followed by the character
+                write(*tree.get_code(tree.nyt))
+                write(ord(symbol),escape_bits)
+                leaf = tree.add_symbol(symbol)
+            else:
+                write(*tree.get_code(leaf))
+            tree.update(leaf)
+        return self.bit_writer.take_bytes()
+
+    def finish(self) -> bytes:
+        """
+        Class method ending the stream with the NYT code followed by the end value
+
+        Returns:
+        ----------
+        bytes :
+            Remaining bytes of codes; the last byte is padded with zeros
+        """
+        tree = self.tree
+        self.bit_writer.write(*tree.get_code(tree.nyt))
+        self.bit_writer.write(tree.END_VALUE,tree.ESCAPE_BITS)
+        self.bit_writer.write(0,-self.bit_writer.pending_bits % 8)
+        return self.bit_writer.take_bytes()
+
+
+class AdaptiveHuffmanDecoder():
+
+    """
+    AdaptiveHuffmanDecoder class decoding the bytes of an AdaptiveHuffmanEncoder given
+    as successive chunks; the codes may be split between chunks
+
+    Attributes
+    ----------
+    tree : AdaptiveTree
+        Tree of the characters decoded so far
+    node : int
+        Node reached by the bits read since the last decoded character
+    escape_left : int
+        Number of bits of an escaped character still to be read
+    escape_value : int
+        Bits of the escaped character read so far
+    finished : bool
+        True once the end value was read
+    """
+
+    def __init__(self) -> None:
+        """
+        Class constructor method for initializing all the attributes
+
+        Returns:
+        ----------
+        None
+        """
+        self.tree = AdaptiveTree()
+        self.node = self.tree.root
+        #The tree starts with the NYT leaf alone so the first character is escaped
+        self.escape_left = self.tree.ESCAPE_BITS
+        self.escape_value = 0
+        self.finished = False
+
+    def feed(self,chunk:bytes) -> str:
+        """
+        Class method decoding the characters whose codes end in the next chunk
+
+        Parameters
+        -----------
+        chunk : bytes
+            Next part of the packed codes
+
+        Returns:
+        ----------
+        str :
+            The decoded characters
+        """
+        tree = self.tree
+        zeros = tree.zeros
+        ones = tree.ones
+        symbols = tree.symbols
+        root = tree.root
+        node = self.node
+        escape_left = self.escape_left
+        escape_value = self.escape_value
+        decoded = []
+        for byte in chunk:
+            if self.finished:
+                break
+            for shift in range(7,-1,-1):
+                bit = (byte >> shift) & 1
+                if escape_left:
+                    escape_value = (escape_value << 1) | bit
+                    escape_left -= 1
+                    if escape_left:
+                        continue
+                    if escape_value == tree.END_VALUE:
+                        #The remaining bits are padding
+                        self.finished = True
+                        break
+                    symbol = chr(escape_value)
+                    escape_value = 0
+                    leaf = tree.add_symbol(symbol)
+                else:
+                    node = ones[node] if bit else zeros[node]
+                    if zeros[node] != -1:
+                        continue
+                    if node == tree.nyt:
+                        escape_left = tree.ESCAPE_BITS
+                        continue
+                    symbol = symbols[node]
+                    leaf = node
+                decoded.append(symbol)
+                tree.update(leaf)
+                node = root
+        self.node = node
+        self.escape_left = escape_left
+        self.escape_value = escape_value
+        return "".join(decoded)
+
+    def decode_chunks(self,chunks) -> Generator:
+        """
+        Class generator method decoding the successive chunks of the packed codes
+
+        Parameters
+        -----------
+        chunks : iterable[bytes]
+            Successive parts of the packed codes
+
+        Yields:
+        ----------
+        str :
+            The characters decoded from each chunk
+        """
+        for chunk in chunks:
+            symbols = self.feed(chunk)
+            if symbols:
+                yield symbols
+            if self.finished:
+                break
+
+
+class AdaptiveHuffmanCodec():
+
+    """
+    AdaptiveHuffmanCodec class giving the adaptive Huffman coding the codec interface
+    of the model; the stream ends with its own end value so no field is saved
+    """
+
+    def encode(self,sequence:str) -> bytes:
+        """
+        Class method compressing a whole sequence
+
+        Parameters
+        -----------
+        sequence : str
+            Sequence to be compressed
+
+        Returns:
+        ----------
+        bytes :
+            Packed codes
+        """
+        encoder = AdaptiveHuffmanEncoder()
+        return encoder.feed(sequence) + encoder.finish()
+
+    def decode(self,packed:bytes) -> str:
+        """
+        Class method decompressing the output of encode
+
+        Parameters
+        -----------
+        packed : bytes
+            Packed codes
+
+        Returns:
+        ----------
+        str :
+            The original sequence
+        """
+        return AdaptiveHuffmanDecoder().feed(packed)
+
+    def get_fields(self) -> dict:
+        """
+        Class method giving the fields saved in the header of the compressed file
+
+        Returns:
+        ----------
+        dict :
+            No field is needed
+        """
+        return {}
+
+    @classmethod
+    def from_fields(cls,_fields:dict):
+        """
+        Class method creating a codec from the fields saved in a compressed file header
+        The adaptive codes need no field : the tree is rebuilt while decoding
+
+        Parameters
+        -----------
+        _fields : dict
+            Header fields written by get_fields, unused
+
+        Returns:
+        ----------
+        AdaptiveHuffmanCodec :
+            Codec able to decode the compressed sequence
+        """
+        return cls()
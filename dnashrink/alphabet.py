@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Alphabet module part of the dnashrink package used to validate and count the characters
+of a sequence with whole-sequence operations instead of a loop over the characters.
+NumPy is used for the counting when it is installed
+"""
+
+__author__ = 'Mohamed Ouertani'
+
+# Standard library imports
+from collections import Counter
+# Third party imports
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class SequenceAlphabet():
+
+    """
+    SequenceAlphabet class checking whether a sequence only holds nucleotides and
+    counting its characters; both results are kept so each sequence is only scanned once
+
+    Attributes
+    ----------
+    sequence : str
+        Sequence being checked
+    nucleotide_status : bool
+        True if the sequence only holds nucleotides; None until is_nucleotide is called
+    counts : dict
+        Number of occurences of each character; None until get_counts is called
+    backend : str
+        "numpy" when the counting is vectorized, "python" otherwise
+    """
+
+    #Characters of an uncompressed sequence
+    NUCLEOTIDES = "ATGCN$"
+
+    def __init__(self,sequence:str) -> None:
+        """
+        Class constructor method for initializing all the attributes
+
+        Parameters
+        -----------
+        sequence : str
+            Sequence to be checked
+
+        Returns:
+        ----------
+        None
+        """
+        self.sequence = sequence
+        self.nucleotide_status = None
+        self.counts = None
+        self.backend = "numpy" if np is not None else "python"
+
+    def is_nucleotide(self) -> bool:
+        """
+        Class method verifying that the sequence only holds nucleotides
+        The nucleotides are deleted from the encoded sequence in a single pass
+
+        Returns:
+        ----------
+        bool :
+            True if the sequence is uncompressed
+        """
+        if self.nucleotide_status is None:
+            #Compressed sequences hold characters outside of ascii
+            self.nucleotide_status = (self.sequence.isascii() and not self.sequence.encode("ascii")
+                                      .translate(None,self.NUCLEOTIDES.encode("ascii")))
+        return self.nucleotide_status
+
+    def get_counts(self) -> dict:
+        """
+        Class method counting the occurences of each character of the sequence
+
+        Returns:
+        ----------
+        counts : dict
+            Number of occurences of each character found in the sequence
+        """
+        if self.counts is None:
+            if self.backend == "numpy" and self.is_nucleotide():
+                #Count the byte values of the sequence in a single pass
+                sequence_bytes = np.frombuffer(self.sequence.encode("ascii"),dtype=np.uint8)
+                byte_counts = np.bincount(sequence_bytes,minlength=256)
+                self.counts = {chr(value):int(byte_counts[value])
+                               for value in np.flatnonzero(byte_counts)}
+            else:
+                #Count each character of the alphabet found in the sequence
+                self.counts = {char:self.sequence.count(char)
+                               for char in sorted(set(self.sequence))}
+        return self.counts
+
+    def get_kmer_counts(self,kmer_size:int) -> dict:
+        """
+        Class method counting the occurences of each k-mer when the sequence is cut into
+        consecutive k-mers; the last k-mer is shorter when the length is not a multiple of k
+
+        Parameters
+        -----------
+        kmer_size : int
+            Number of characters of each k-mer
+
+        Returns:
+        ----------
+        kmer_counts : dict
+            Number of occurences of each k-mer found in the sequence
+        """
+        if kmer_size == 1:
+            return dict(self.get_counts())
+        whole_length = len(self.sequence) - len(self.sequence) % kmer_size
+        if self.backend == "numpy" and self.is_nucleotide():
+            #Read the k-mers as fixed size byte strings and count the distinct ones
+            kmers = np.frombuffer(self.sequence[:whole_length].encode("ascii"),
+                                  dtype=f"S{kmer_size}")
+            distinct_kmers,counts = np.unique(kmers,return_counts=True)
+            kmer_counts = {kmer.decode("ascii"):int(count)
+                           for kmer,count in zip(distinct_kmers,counts)}
+        else:
+            kmer_counts = dict(Counter(self.sequence[start:start+kmer_size]
+                                       for start in range(0,whole_length,kmer_size)))
+        #Count the shorter last k-mer
+        tail = self.sequence[whole_length:]
+        if tail:
+            kmer_counts[tail] = kmer_counts.get(tail,0) + 1
+        return kmer_counts
@@ -7,6 +7,10 @@ Node and BinaryTree Classes used for the Huffman compression/decompression steps
 
 __author__ = 'Mohamed Ouertani'
 
+# Standard library imports
+import heapq
+from array import array
+
 
 class Node:
 
@@ -28,6 +32,9 @@ class Node:
         to a Node or could be empty/None
     """
 
+    #Nodes hold no attribute dictionnary
+    __slots__ = ("freq","car","zero","one")
+
     def __init__(self, freq,car=None) -> None:
         """
         Class constructor method for initializing all the attributes
@@ -151,9 +158,10 @@ class Node:
 
     def get_leaves(self,binary_tree,car_code="") -> dict:
         """
-        Class recursive method that gets all leaves of the Node
+        Class method that gets all leaves of the Node
         This method also fills the coding and decoding dictionnaries while searching
-        for the leaves of the BinaryTree
+        for the leaves of the BinaryTree; the Nodes are visited with a stack and the
+        path of each Node is kept as an integer until a leaf is reached
 
         Parameters
         -----------
@@ -171,28 +179,23 @@ class Node:
         decoding_dict : dict
             Dictionnary that will be used for the decompression steps of the Huffman algorithm
         """
-        #Initialize code for path
-        code = car_code
-        #Verify if Node is a leaf
-        if (not self.zero and
-            not self.one):
-            #If Node is a leaf fill the dictionnaries with it's values
-            binary_tree.coding_dic[self.car] = code
-            binary_tree.decoding_dic[code] = self.car
-            return binary_tree.coding_dic , binary_tree.decoding_dic
-        #Verify if leaf has a Node assigned to zero branch
-        if self.zero:
-            #Add 0 to leaf path
-            code += "0"
-            #Call recursive method on zero Node
-            self.zero.get_leaves(binary_tree,code)
-        #Verify if leaf has a Node assigned to one branch
-        if self.one:
-            #Remove last digit and add 1 to leaf path
-            code = code[:-1]
-            code += "1"
-            #Call recursive method on one Node
-            self.one.get_leaves(binary_tree,code)
+        #Each stack item holds a Node, the value and the length of its path
+        stack = [(self,int(car_code,2) if car_code else 0,len(car_code))]
+        while stack:
+            node,value,length = stack.pop()
+            #Verify if Node is a leaf
+            if (not node.zero and
+                not node.one):
+                #If Node is a leaf fill the dictionnaries with it's values
+                code = format(value,"b").zfill(length) if length else ""
+                binary_tree.coding_dic[node.car] = code
+                binary_tree.decoding_dic[code] = node.car
+                continue
+            #Visit the one branch after the zero branch by adding it first
+            if node.one:
+                stack.append((node.one,(value << 1) | 1,length + 1))
+            if node.zero:
+                stack.append((node.zero,value << 1,length + 1))
         return binary_tree.coding_dic , binary_tree.decoding_dic
 
     def __str__(self) -> str:
@@ -214,11 +217,21 @@ class BinaryTree():
     Attributes
     ----------
     head_node : Node
-        Represents the top Node of the tree
+        Represents the top Node of the tree built with tree_builder
     coding_dic : dict
         Compression dictionnary extracted from the creation of the tree
     decoding_dic : dict
         Decompression dictionnary extracted from the creation of the tree
+    head : int
+        Index of the top node of the tree built with heap_builder; -1 if it is empty
+    zeros : array
+        Index of the zero branch of each node built with heap_builder; -1 for the leaves
+    ones : array
+        Index of the one branch of each node built with heap_builder; -1 for the leaves
+    freqs : list[int]
+        Frequency of each node built with heap_builder
+    cars : list[str]
+        Character of each leaf built with heap_builder; None for the cumulative nodes
     """
 
     def __init__(self):
@@ -232,6 +245,11 @@ class BinaryTree():
         self.head_node = None
         self.coding_dic = {}
         self.decoding_dic = {}
+        self.head = -1
+        self.zeros = array("i")
+        self.ones = array("i")
+        self.freqs = []
+        self.cars = []
 
     def tree_builder(self,list_frequencies):
         """
@@ -294,10 +312,81 @@ class BinaryTree():
                 i += 1
         return self
 
+    def heap_builder(self,list_frequencies):
+        """
+        Class method that builds a minimum-redundancy tree according to a frequency list
+        The two nodes with the lowest frequencies are merged until a single node is left,
+        using a heap to find them
+        The nodes are kept in the parallel arrays of the tree instead of Node objects
+
+        Parameters
+        -----------
+        list_frequencies : list[tuple]
+            A list of all the characters and their corresponding frequencies
+
+        Returns:
+        ----------
+        BinaryTree :
+            Represents the final built BinaryTree Object
+        """
+        #The leaves come first in the arrays, followed by the cumulative nodes
+        self.cars = [car for car,_ in list_frequencies]
+        self.freqs = [freq for _,freq in list_frequencies]
+        self.zeros = array("i",[-1])*len(self.freqs)
+        self.ones = array("i",[-1])*len(self.freqs)
+        #The index of the nodes breaks the ties between equal frequencies
+        heap = [(freq,node) for node,freq in enumerate(self.freqs)]
+        heapq.heapify(heap)
+        node = len(heap)
+        #Merge the 2 nodes with the lowest frequencies under a cumulative node
+        while len(heap) > 1:
+            zero_freq,zero_node = heapq.heappop(heap)
+            one_freq,one_node = heap[0]
+            self.freqs.append(zero_freq + one_freq)
+            self.cars.append(None)
+            self.zeros.append(zero_node)
+            self.ones.append(one_node)
+            #Replace the second node by the cumulative node in a single step
+            heapq.heapreplace(heap,(zero_freq + one_freq,node))
+            node += 1
+        if heap:
+            self.head = heap[0][1]
+            #A single character still needs a one bit code
+            if self.zeros[self.head] == -1:
+                self.head = self.add_node(self.freqs[self.head],None,self.head)
+        return self
+
+    def add_node(self,freq:int,car=None,zero=-1,one=-1) -> int:
+        """
+        Class method that adds a node to the parallel arrays of the tree
+
+        Parameters
+        -----------
+        freq : int
+            Frequency of the node
+        car : str (default = None)
+            Character of a leaf; None for a cumulative node
+        zero : int (default = -1)
+            Index of the node of the zero branch
+        one : int (default = -1)
+            Index of the node of the one branch
+
+        Returns:
+        ----------
+        int :
+            Index of the new node
+        """
+        self.freqs.append(freq)
+        self.cars.append(car)
+        self.zeros.append(zero)
+        self.ones.append(one)
+        return len(self.freqs) - 1
+
     def get_tree_leaves(self) -> dict:
         """
         Class method that gets all tree leaves and creates coding/decoding dictionnaries
-        This method calls the get_leaves method of the head_node attribute
+        This method calls the get_leaves method of the head_node attribute for the trees
+        built with tree_builder and walks the arrays of the trees built with heap_builder
 
         Returns:
         ----------
@@ -306,9 +395,60 @@ class BinaryTree():
         decoding_dic : dict
             Decompression dictionnary extracted from the creation of the tree
         """
-        self.coding_dic , self.decoding_dic = self.head_node.get_leaves(self)
+        if self.head_node is not None:
+            self.coding_dic , self.decoding_dic = self.head_node.get_leaves(self)
+            return self.coding_dic , self.decoding_dic
+        #Build the code of each leaf of the arrays from the integer value of its path
+        for car,(value,length) in self.leaf_paths():
+            code = format(value,"b").zfill(length)
+            self.coding_dic[car] = code
+            self.decoding_dic[code] = car
         return self.coding_dic , self.decoding_dic
 
+    def get_code_lengths(self) -> dict:
+        """
+        Class method that gets the depth of every leaf, which is all the canonical codes need
+
+        Returns:
+        ----------
+        dict :
+            Code length of each character
+        """
+        if self.head_node is not None:
+            coding_dic,_ = self.get_tree_leaves()
+            return {car:len(code) for car,code in coding_dic.items()}
+        return {car:length for car,(_,length) in self.leaf_paths()}
+
+    def leaf_paths(self) -> list:
+        """
+        Class method that walks the parallel arrays with a stack, from the zero branch
+        to the one branch, keeping the path of each node as an integer
+
+        Returns:
+        ----------
+        list[tuple] :
+            Character of each leaf with the value and the length of its path
+        """
+        #An empty sequence has no leaves
+        if self.head == -1:
+            return []
+        zeros = self.zeros
+        ones = self.ones
+        paths = []
+        stack = [(self.head,0,0)]
+        while stack:
+            node,value,length = stack.pop()
+            zero = zeros[node]
+            one = ones[node]
+            if zero == -1 and one == -1:
+                paths.append((self.cars[node],(value,length)))
+                continue
+            #Visit the one branch after the zero branch by adding it first
+            if one != -1:
+                stack.append((one,(value << 1) | 1,length + 1))
+            stack.append((zero,value << 1,length + 1))
+        return paths
+
 
     def __str__(self) -> str:
         """
@@ -321,4 +461,8 @@ class BinaryTree():
             Represents the print_node method of the head Node which returns the entire
             Nodes and sub Nodes of the BinaryTree Object
         """
+        if self.head_node is None:
+            #Trees built with heap_builder are shown by their leaves
+            return "\n".join(f"{car} , {self.freqs[node]}" for node,car in enumerate(self.cars)
+                             if car is not None)
         return str(self.head_node.print_node())
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Bit input/output module part of the dnashrink package used by the Huffman compression
+to write variable length codes straight into bytes and to read them back bit by bit
+"""
+
+__author__ = 'Mohamed Ouertani'
+
+
+class BitWriter():
+
+    """
+    BitWriter class packing variable length codes into a bytearray
+    The bits are kept in an integer accumulator and moved to the buffer by whole bytes
+
+    Attributes
+    ----------
+    buffer : bytearray
+        Complete bytes written so far
+    accumulator : int
+        Bits not yet moved to the buffer
+    pending_bits : int
+        Number of bits held by the accumulator
+    """
+
+    #Number of bits gathered in the accumulator before moving them to the buffer
+    FLUSH_BITS = 4096
+
+    def __init__(self) -> None:
+        """
+        Class constructor method for initializing all the attributes
+
+        Returns:
+        ----------
+        None
+        """
+        self.buffer = bytearray()
+        self.accumulator = 0
+        self.pending_bits = 0
+
+    def write(self,value:int,length:int) -> None:
+        """
+        Class method writing the length lowest bits of value, most significant bit first
+
+        Parameters
+        -----------
+        value : int
+            Integer value of the code
+        length : int
+            Number of bits of the code
+
+        Returns:
+        ----------
+        None
+        """
+        self.accumulator = (self.accumulator << length) | value
+        self.pending_bits += length
+        if self.pending_bits >= self.FLUSH_BITS:
+            self.flush()
+
+    def write_symbols(self,symbols,coding_dict:dict) -> None:
+        """
+        Class method writing the code of every symbol of a sequence
+        The loop works on local variables since it runs once per nucleotide
+
+        Parameters
+        -----------
+        symbols : str
+            Sequence whose symbols are all keys of coding_dict
+        coding_dict : dict
+            Binary code string of each symbol
+
+        Returns:
+        ----------
+        None
+        """
+        #Convert the code strings to integer values once
+        codes = {symbol:(int(code,2),len(code)) for symbol,code in coding_dict.items()}
+        flush_bits = self.FLUSH_BITS
+        accumulator = self.accumulator
+        pending_bits = self.pending_bits
+        buffer = self.buffer
+        for symbol in symbols:
+            value,length = codes[symbol]
+            accumulator = (accumulator << length) | value
+            pending_bits += length
+            if pending_bits >= flush_bits:
+                #Move all the complete bytes to the buffer
+                rest = pending_bits & 7
+                buffer += (accumulator >> rest).to_bytes(pending_bits >> 3,"big")
+                accumulator &= (1 << rest) - 1
+                pending_bits = rest
+        self.accumulator = accumulator
+        self.pending_bits = pending_bits
+
+    def flush(self) -> None:
+        """
+        Class method moving the complete bytes of the accumulator to the buffer
+
+        Returns:
+        ----------
+        None
+        """
+        rest = self.pending_bits & 7
+        self.buffer += (self.accumulator >> rest).to_bytes(self.pending_bits >> 3,"big")
+        self.accumulator &= (1 << rest) - 1
+        self.pending_bits = rest
+
+    def get_bytes(self) -> tuple:
+        """
+        Class method returning all the bits written as bytes
+        The last incomplete byte keeps its bits right-aligned like the Huffman files expect
+
+        Returns:
+        ----------
+        packed_bytes : bytearray
+            Bytes holding all the written bits
+        last_bits : int
+            Number of bits of the last byte (8 if it is complete)
+        """
+        self.flush()
+        if self.pending_bits:
+            return self.buffer + bytes([self.accumulator]),self.pending_bits
+        return bytearray(self.buffer),8
+
+    def take_bytes(self) -> bytes:
+        """
+        Class method removing the complete bytes written so far from the buffer,
+        so a stream of codes can be written out without keeping it in memory
+        The bits of the last incomplete byte stay in the accumulator
+
+        Returns:
+        ----------
+        bytes :
+            Complete bytes written since the previous call
+        """
+        self.flush()
+        complete_bytes = bytes(self.buffer)
+        self.buffer = bytearray()
+        return complete_bytes
+
+
+class BitReader():
+
+    """
+    BitReader class reading back the bits of bytes produced by a BitWriter
+
+    Attributes
+    ----------
+    data : bytes
+        Bytes holding the bits
+    last_bits : int
+        Number of right-aligned bits of the last byte
+    """
+
+    def __init__(self,data:bytes,last_bits=8) -> None:
+        """
+        Class constructor method for initializing all the attributes
+
+        Parameters
+        -----------
+        data : bytes
+            Bytes holding the bits
+        last_bits : int (default = 8)
+            Number of right-aligned bits of the last byte
+
+        Returns:
+        ----------
+        None
+        """
+        self.data = data
+        self.last_bits = last_bits
+
+    def __len__(self) -> int:
+        """
+        Class method giving the number of bits held by the data
+
+        Returns:
+        ----------
+        int :
+            Number of bits
+        """
+        if not self.data:
+            return 0
+        return 8*(len(self.data)-1) + self.last_bits
+
+    def __iter__(self):
+        """
+        Class method generating the bits one by one, most significant bit first
+
+        Returns:
+        ----------
+        Generator :
+            Each bit as an integer 0 or 1
+        """
+        data = self.data
+        if not data:
+            return
+        for byte in data[:-1]:
+            for shift in range(7,-1,-1):
+                yield (byte >> shift) & 1
+        for shift in range(self.last_bits-1,-1,-1):
+            yield (data[-1] >> shift) & 1
+
+    def to_binary(self) -> str:
+        """
+        Class method writing the bits as a string of "0" and "1" characters
+        This is only meant for display since it takes one character per bit
+
+        Returns:
+        ----------
+        str :
+            Binary representation of the data
+        """
+        if not self.data:
+            return ""
+        binary_bytes = "".join(format(byte,"08b") for byte in self.data[:-1])
+        return binary_bytes + format(self.data[-1],"b").zfill(self.last_bits)
@@ -8,7 +8,15 @@ and make them more compressible
 
 __author__ = 'Mohamed Ouertani'
 
+# Standard library imports
+from array import array
+from concurrent.futures import ProcessPoolExecutor
 from typing import Generator
+# Local application imports
+from dnashrink.bwt_kernels import NUMPY_AVAILABLE, NumpyKernels
+from dnashrink.bwt_matrix import BwtMatrix
+from dnashrink.fm_index import FmIndex
+from dnashrink.suffix_array import SuffixArray
 
 class Bwt():
 
@@ -23,9 +31,27 @@ class Bwt():
         Original sequence obtained after reverse Burrows-Wheeler Transform
     bwt_sequence : str
         Bwt sequence obtained after Burrows-Wheeler Transform
+    primary_index : int
+        Row of the sorted rotations matrix holding the original sequence
+    suffix_array : array
+        Suffix array of the input sequence used for the linear time transform
+    block_size : int
+        Number of nucleotides transformed independently in each block;
+        None if the whole sequence is a single block
+    primary_indices : list[int]
+        Primary index of each block of a blocked transform
+    backend : str
+        "numpy" if the vectorized kernels are used, "python" otherwise
+    checkpoint_rate : int
+        Number of text positions between two checkpoints of a BWT sequence
+    checkpoints : list[int]
+        Row of the sorted rotations matrix of every checkpoint_rate-th text position
+    record_lengths : list[int]
+        Lengths of the records of a multi-record sequence, each getting its own $
     """
 
-    def __init__(self,input_sequence:str) -> None:
+    def __init__(self,input_sequence:str,block_size=None,checkpoint_rate=None,
+                 checkpoints=None,record_lengths=None) -> None:
         """
         Class method for Creation of interface and all the widgets inside
 
@@ -34,6 +60,14 @@ class Bwt():
         input_sequence : str
             input sequence to be transformed or reverse transformed
             using Burrows-Wheeler algorithm
+        block_size : int (default = None)
+            Block size of input_sequence if it is a blocked BWT sequence
+        checkpoint_rate : int (default = None)
+            Number of text positions between two checkpoints of a BWT sequence
+        checkpoints : list[int] (default = None)
+            Rows of the checkpoints of a BWT sequence used for random access
+        record_lengths : list[int] (default = None)
+            Lengths of the records making up a normal input_sequence
 
         Returns:
         ----------
@@ -42,6 +76,14 @@ class Bwt():
         self.input_sequence = input_sequence
         self.normal_sequence = None
         self.bwt_sequence = None
+        self.primary_index = None
+        self.suffix_array = None
+        self.block_size = block_size
+        self.primary_indices = None
+        self.backend = "numpy" if NUMPY_AVAILABLE else "python"
+        self.checkpoint_rate = checkpoint_rate
+        self.checkpoints = checkpoints
+        self.record_lengths = record_lengths
 
     def bwt_generator(self) -> Generator:
 
@@ -49,6 +91,8 @@ class Bwt():
         Class method that returns all the steps of the Burrows-Wheeler Transform
         from a created Burrows-Wheeler matrix using the input sequence.
         The Burrows-Wheeler Transform corresponds to the last column of the matrix.
+        Each step is a BwtMatrix view computed from the suffix array on request,
+        so the steps cost constant memory.
 
         Input
         ----------
@@ -63,62 +107,358 @@ class Bwt():
         dollar_sequence = self.input_sequence + "$"
         #Calculating the length of the sequence
         sequence_length = len(dollar_sequence)
-        #Initializing the empty transformation list
-        bwt_list = []
-        #Transforming the dollar_sequence into bwt_sequence
-        for _ in range(sequence_length):
-            #Adding the sequence to the bwt_list
-            bwt_list.append(dollar_sequence)
-            #Returning the current bwt_list
-            yield "\n".join(bwt_list)
-            #Rotating the dollar_sequence by one character
-            dollar_sequence = dollar_sequence[-1] + dollar_sequence[:-1]
-        #Sorting the bwt_list alphabetically
-        bwt_list.sort()
-        #Returning the final sorted bwt_list
-        yield "\n".join(bwt_list)
-        #Getting the last character of each line to form the bwt_sequence
-        self.bwt_sequence = "".join(list(rotation[sequence_length-1] for rotation in bwt_list))
+        #Computing the suffix array and the bwt_sequence used by the matrix views
+        self.bwt_builder()
+        #Returning the rotations matrix growing by one rotation at each step
+        for step in range(1,sequence_length+1):
+            #Row j is the dollar_sequence rotated by j characters to the right
+            yield BwtMatrix(dollar_sequence,range(0,-step,-1))
+        #Returning the final sorted matrix whose rows follow the suffix array
+        yield BwtMatrix(dollar_sequence,self.suffix_array)
         #Returning the obtained bwt_sequence
         yield self.bwt_sequence
 
+    def bwt_builder(self) -> str:
+
+        """
+        Class method that computes the Burrows-Wheeler Transform directly from the
+        suffix array of the input sequence built in linear time with SA-IS.
+        Unlike bwt_generator no rotation is ever built so it scales to whole genomes.
+
+        Returns
+        -------
+        bwt_sequence : str
+            The Burrows-Wheeler Transform of the input sequence
+        """
+        #Sort all the suffixes of the input sequence
+        suffix_sorter = SuffixArray(self.input_sequence,self.record_lengths)
+        self.suffix_array = suffix_sorter.build()
+        #Derive the last column and the primary index from the suffix array
+        if self.backend == "numpy":
+            self.bwt_sequence,self.primary_index = NumpyKernels.last_column(
+                suffix_sorter.text,self.suffix_array)
+        else:
+            self.bwt_sequence,self.primary_index = suffix_sorter.bwt()
+        return self.bwt_sequence
 
     def bwt_decoder(self) -> Generator:
 
         """
         Class method for decoding a BWT sequence to recover original sequence
+        The sequence is decoded with LF-mapping first, then each step of the matrix
+        reconstruction is returned as a BwtMatrix view computed from its suffix array
 
         Returns
         -------
         Generator :
             The Burrows-Wheeler reverse transformation steps
         """
-        #initializing the bwt_sequence attribute
-        self.bwt_sequence = self.input_sequence
+        #Decoding the sequence in linear time
+        normal_sequence = self.lf_decoder()
+        #Adding $ to the end of the decoded sequence
+        dollar_sequence = normal_sequence + "$"
         #Calculating the length of the bwt_sequence
-        bwt_length = len(self.bwt_sequence)
-        #Filling decoding list with empty string
-        decoding_list = [""]*bwt_length
-        #Split the bwt_sequence to a list of single characters
-        split_bwt = list(self.bwt_sequence)
-        #Generate the bwt reverse transformation matrix
-        for _ in range(bwt_length):
-            #Adding the bwt_list characters at the start of each line
-            decoding_list = [i + j for i, j in zip(split_bwt, decoding_list)]
-            #returning the current list before sort
-            yield "\n".join(decoding_list)
-            decoding_list.sort()
-            #returning the current matrix after sort
-            yield "\n".join(decoding_list)
-        #Getting the line wih $ at the end
-        for dollar_sequence in decoding_list:
-            if dollar_sequence[bwt_length-1] == "$":
-                #Removing the dollar at the end of the sequence
-                self.normal_sequence = dollar_sequence[:-1]
-                break
+        bwt_length = len(dollar_sequence)
+        #Sorting the rotations of the decoded sequence
+        suffix_array = SuffixArray(normal_sequence).build()
+        #Generate the bwt reverse transformation matrix one more column at a time
+        for step in range(1,bwt_length+1):
+            #Rows after adding the bwt characters at the start of each line
+            yield BwtMatrix(dollar_sequence,suffix_array,width=step,shift=-1)
+            #Rows after sorting are the first characters of the sorted rotations
+            yield BwtMatrix(dollar_sequence,suffix_array,width=step)
         #Returning the original sequence obtained from the reverse transformation
         yield self.normal_sequence
 
+    def lf_decoder(self) -> str:
+
+        """
+        Class method for decoding a BWT sequence in linear time using LF-mapping.
+        The C table gives the first row of each character in the first column and
+        the Occ ranks give the occurrence number of each character in the last column,
+        so each row can be mapped to the row of its preceding character.
+
+        Returns
+        -------
+        normal_sequence : str
+            Original sequence obtained from the reverse transformation
+        """
+        #initializing the bwt_sequence attribute
+        self.bwt_sequence = self.input_sequence
+        #A BWT of several records holds one $ per record
+        records_count = self.bwt_sequence.count("$")
+        #Follow all the rows at once with the vectorized kernels
+        if self.backend == "numpy" and records_count == 1:
+            self.normal_sequence = NumpyKernels.inverse(self.bwt_sequence)
+            return self.normal_sequence
+        c_table,occ_ranks = self.lf_tables(self.bwt_sequence)
+        #Decode each record from the row starting with its own $
+        self.normal_sequence = "".join(
+            self.lf_walker(row,lambda char,row:c_table[char] + occ_ranks[row])
+            for row in range(records_count))
+        return self.normal_sequence
+
+    def lf_walker(self,row:int,lf_mapping) -> str:
+
+        """
+        Class method walking backwards from a row starting with $ until the
+        preceding $ is reached, which decodes the record ending at that row
+
+        Parameters
+        -----------
+        row : int
+            Row starting with the $ of the record
+        lf_mapping : function
+            Function giving the LF-mapping of a row from its last character and index
+
+        Returns
+        -------
+        str :
+            The decoded record
+        """
+        bwt_sequence = self.input_sequence
+        decoded = []
+        char = bwt_sequence[row]
+        #Walk backwards through the sequence until the $ is reached
+        while char != "$":
+            decoded.append(char)
+            row = lf_mapping(char,row)
+            char = bwt_sequence[row]
+        #The characters were recovered from last to first
+        decoded.reverse()
+        return "".join(decoded)
+
+    def decode_record(self,index:int,fm_index=None) -> str:
+
+        """
+        Class method decoding a single record of a multi-record BWT sequence
+        The rows starting with a $ are ordered like the records, so record index
+        is decoded from row index without reversing the other records
+
+        Parameters
+        -----------
+        index : int
+            Index of the record in the original file
+        fm_index : FmIndex (default = None)
+            Index giving the occurrence counts; built from the BWT sequence if not precised
+
+        Returns
+        -------
+        str :
+            The decoded record
+        """
+        if fm_index is None:
+            fm_index = FmIndex(self.input_sequence,sa_rate=0)
+        return self.lf_walker(index,lambda char,row:fm_index.c_table[char]
+                              + fm_index.occ(char,row))
+
+    def checkpoint_sampler(self,checkpoint_rate:int) -> list:
+
+        """
+        Class method that samples the row of every checkpoint_rate-th text position
+        from the suffix array computed by bwt_builder
+
+        Parameters
+        -----------
+        checkpoint_rate : int
+            Number of text positions between two checkpoints
+
+        Returns
+        -------
+        checkpoints : list[int]
+            Row of text positions 0, checkpoint_rate, 2*checkpoint_rate...
+        """
+        self.checkpoint_rate = checkpoint_rate
+        self.checkpoints = [0]*(len(self.input_sequence)//checkpoint_rate + 1)
+        for row,position in enumerate(self.suffix_array):
+            if position % checkpoint_rate == 0 and position < len(self.input_sequence):
+                self.checkpoints[position//checkpoint_rate] = row
+        return self.checkpoints
+
+    def decode_range(self,start:int,end:int,fm_index=None) -> str:
+
+        """
+        Class method decoding the region [start,end) of the original sequence
+        without reversing the whole BWT sequence. The LF-mapping walk starts from the
+        nearest checkpoint after the region, so it costs O(end - start + checkpoint_rate).
+        Blocked BWT sequences only reverse the blocks overlapping the region.
+
+        Parameters
+        -----------
+        start : int
+            Position of the first nucleotide of the region
+        end : int
+            Position following the last nucleotide of the region
+        fm_index : FmIndex (default = None)
+            Index giving the occurrence counts; built from the BWT sequence if not precised
+
+        Returns
+        -------
+        str :
+            The requested region of the original sequence
+        """
+        if self.block_size:
+            #Reverse only the blocks overlapping the region
+            bwt_block_size = self.block_size + 1
+            blocks_count = -(-len(self.input_sequence)//bwt_block_size)
+            first_block = start // self.block_size
+            last_block = min((max(end,start+1) - 1) // self.block_size,blocks_count-1)
+            region = "".join(self.block_inverse(
+                self.input_sequence[block*bwt_block_size:(block+1)*bwt_block_size])
+                for block in range(first_block,last_block+1))
+            offset = first_block*self.block_size
+            return region[start-offset:end-offset]
+        if self.input_sequence.count("$") > 1:
+            raise ValueError("Region decoding needs a BWT sequence of a single record")
+        if fm_index is None:
+            fm_index = FmIndex(self.input_sequence,sa_rate=0)
+        sequence_length = len(self.input_sequence) - 1
+        end = min(end,sequence_length)
+        if start >= end:
+            return ""
+        #Find the first checkpoint at or after the end of the region
+        if self.checkpoints:
+            position = -(-end//self.checkpoint_rate)*self.checkpoint_rate
+        else:
+            position = sequence_length
+        if position >= sequence_length:
+            #The row starting with $ follows the last position of the sequence
+            position,row = sequence_length,0
+        else:
+            row = self.checkpoints[position//self.checkpoint_rate]
+        #Walk backwards from the checkpoint to the start of the region
+        decoded = []
+        while position > start:
+            decoded.append(self.input_sequence[row])
+            row = fm_index.lf_mapping(row)
+            position -= 1
+        decoded.reverse()
+        return "".join(decoded[:end-start])
+
+    def block_builder(self,block_size:int,workers=None) -> str:
+
+        """
+        Class method that transforms the input sequence block by block like bzip2.
+        Each block is transformed independently in a pool of processes and ends
+        with its own $, so the blocks can also be reversed independently.
+
+        Parameters
+        -----------
+        block_size : int
+            Number of nucleotides in each block
+        workers : int (default = None)
+            Number of processes used; the number of processors if not precised
+
+        Returns
+        -------
+        bwt_sequence : str
+            Concatenation of the Burrows-Wheeler Transform of each block
+        """
+        #Split the input sequence into blocks
+        blocks = [self.input_sequence[start:start+block_size]
+                  for start in range(0,len(self.input_sequence),block_size)] or [""]
+        #Transform the blocks in parallel keeping their order
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            block_results = list(executor.map(self.block_transform,blocks))
+        #Reassemble the blocks and record their primary indices
+        self.bwt_sequence = "".join(bwt_block for bwt_block,_ in block_results)
+        self.primary_indices = [primary_index for _,primary_index in block_results]
+        self.block_size = block_size
+        return self.bwt_sequence
+
+    def block_decoder(self,workers=None) -> str:
+
+        """
+        Class method that reverses a blocked BWT sequence with a pool of processes
+
+        Parameters
+        -----------
+        workers : int (default = None)
+            Number of processes used; the number of processors if not precised
+
+        Returns
+        -------
+        normal_sequence : str
+            Original sequence obtained by joining the reversed blocks in order
+        """
+        #initializing the bwt_sequence attribute
+        self.bwt_sequence = self.input_sequence
+        #Each transformed block holds its nucleotides and a $
+        bwt_block_size = self.block_size + 1
+        bwt_blocks = [self.bwt_sequence[start:start+bwt_block_size]
+                      for start in range(0,len(self.bwt_sequence),bwt_block_size)]
+        #Reverse the blocks in parallel keeping their order
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            self.normal_sequence = "".join(executor.map(self.block_inverse,bwt_blocks))
+        return self.normal_sequence
+
+    @staticmethod
+    def block_transform(block:str) -> tuple:
+        """
+        Static class method transforming a single block inside a worker process
+
+        Parameters
+        -----------
+        block : str
+            Block of the input sequence
+
+        Returns
+        -------
+        bwt_block : str
+            Burrows-Wheeler Transform of the block
+        primary_index : int
+            Row of the block's sorted rotations holding the block
+        """
+        return SuffixArray(block).bwt()
+
+    @staticmethod
+    def block_inverse(bwt_block:str) -> str:
+        """
+        Static class method reversing a single block inside a worker process
+
+        Parameters
+        -----------
+        bwt_block : str
+            Burrows-Wheeler Transform of a block
+
+        Returns
+        -------
+        str :
+            Original block of the sequence
+        """
+        return Bwt(bwt_block).lf_decoder()
+
+    @staticmethod
+    def lf_tables(bwt_sequence:str) -> tuple:
+        """
+        Static class method computing the tables used by the LF-mapping
+
+        Parameters
+        -----------
+        bwt_sequence : str
+            Last column of the sorted rotations matrix
+
+        Returns
+        -------
+        c_table : dict
+            Number of characters smaller than each character in the sequence
+        occ_ranks : array
+            For each row, number of occurrences of its last character in the rows above
+        """
+        #Rank each character of the last column among the identical characters above it
+        counts = dict.fromkeys(set(bwt_sequence),0)
+        occ_ranks = array("l",[0])*len(bwt_sequence)
+        for row,char in enumerate(bwt_sequence):
+            occ_ranks[row] = counts[char]
+            counts[char] += 1
+        #Cumulate the counts in alphabetical order to get the first row of each character
+        c_table = {}
+        total = 0
+        for char in sorted(counts):
+            c_table[char] = total
+            total += counts[char]
+        return c_table,occ_ranks
+
     def input_is_bwt(self) -> bool:
         """
         Class method for checking if input_sequence is bwt or not
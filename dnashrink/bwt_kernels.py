@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+BWT kernels module part of the dnashrink package providing NumPy vectorized versions
+of the Burrows-Wheeler Transform loops on uint8 arrays.
+NumPy is optional : NUMPY_AVAILABLE tells the Bwt class whether these kernels can be used
+"""
+
+__author__ = 'Mohamed Ouertani'
+
+# Third party imports
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+NUMPY_AVAILABLE = np is not None
+
+
+class NumpyKernels():
+
+    """
+    NumpyKernels class gathering the vectorized BWT kernels as static methods
+    Every kernel works on the uint8 view of a sequence so no Python object
+    is created per character
+    """
+
+    @staticmethod
+    def to_uint8(sequence:str):
+        """
+        Static class method giving the uint8 array view of a sequence
+
+        Parameters
+        -----------
+        sequence : str
+            Sequence made of single byte characters
+
+        Returns:
+        ----------
+        ndarray :
+            Character codes of the sequence
+        """
+        return np.frombuffer(sequence.encode("latin-1"),dtype=np.uint8)
+
+    @staticmethod
+    def c_array(codes):
+        """
+        Static class method computing the C array of a BWT sequence
+
+        Parameters
+        -----------
+        codes : ndarray
+            uint8 character codes of the BWT sequence
+
+        Returns:
+        ----------
+        ndarray :
+            For each of the 256 codes, number of characters with a smaller code
+        """
+        counts = np.bincount(codes,minlength=256)
+        return np.concatenate(([0],np.cumsum(counts)[:-1]))
+
+    @staticmethod
+    def rank_table(codes):
+        """
+        Static class method computing the occurrence rank of each row
+        using a cumulative sum over the one-hot column of each character
+
+        Parameters
+        -----------
+        codes : ndarray
+            uint8 character codes of the BWT sequence
+
+        Returns:
+        ----------
+        ndarray :
+            For each row, number of occurrences of its character in the rows above
+        """
+        ranks = np.empty(len(codes),dtype=np.int64)
+        for code in np.flatnonzero(np.bincount(codes,minlength=256)):
+            one_hot = codes == code
+            ranks[one_hot] = np.cumsum(one_hot)[one_hot] - 1
+        return ranks
+
+    @staticmethod
+    def lf_walk(codes,lf_array):
+        """
+        Static class method following the LF-mapping cycle with many walkers at once.
+        Walkers start on evenly spaced rows and each one walks backwards until it
+        reaches the start row of another walker, so every vectorized step decodes one
+        character per walker. The segments are then chained from the walker of row 0.
+        The LF-mapping, the character and the start flag of the next row are packed
+        in a single integer so each step only reads memory once per walker.
+
+        Parameters
+        -----------
+        codes : ndarray
+            uint8 character codes of the BWT sequence
+        lf_array : ndarray
+            LF-mapping of each row
+
+        Returns:
+        ----------
+        ndarray :
+            Codes of the text rotation starting with $ (the $ then the original sequence)
+        """
+        rows_count = len(codes)
+        #Spread about 4 sqrt(n) walkers over the rows, one of them on row 0
+        walkers_count = max(1,4*int(rows_count**0.5))
+        starts = np.unique(np.concatenate(([0],np.linspace(0,rows_count-1,walkers_count,
+                                                            dtype=np.int64))))
+        walkers_count = len(starts)
+        is_start = np.zeros(rows_count,dtype=np.int64)
+        is_start[starts] = 1
+        #Pack the next row (40 bits), the character (8 bits) and the start flag
+        packed = lf_array | (codes.astype(np.int64) << 40) | (is_start[lf_array] << 48)
+        row_mask = (1 << 40) - 1
+        current_rows = starts.copy()
+        lengths = np.zeros(walkers_count,dtype=np.int64)
+        successors = np.zeros(walkers_count,dtype=np.int64)
+        finished = np.zeros(walkers_count,dtype=bool)
+        #Characters decoded by each walker, one line per step
+        decoded = np.empty((max(16,2*rows_count//walkers_count),walkers_count),dtype=np.uint8)
+        step = 0
+        while not finished.all():
+            if step == len(decoded):
+                decoded = np.concatenate((decoded,np.empty_like(decoded)))
+            values = packed[current_rows]
+            decoded[step] = values >> 40
+            current_rows = values & row_mask
+            #Walkers reaching the start row of another walker end their segment
+            reached = ((values >> 48) != 0) & ~finished
+            if reached.any():
+                lengths[reached] = step + 1
+                successors[reached] = np.searchsorted(starts,current_rows[reached])
+                finished |= reached
+            step += 1
+        #Chain the segments decoded backwards starting from row 0
+        segments = decoded[:step].T.copy()
+        pieces = []
+        walker = 0
+        for _ in range(walkers_count):
+            pieces.append(segments[walker,:lengths[walker]])
+            walker = successors[walker]
+        return np.concatenate(pieces)[::-1]
+
+    @staticmethod
+    def inverse(bwt_sequence:str) -> str:
+        """
+        Static class method reversing a BWT sequence holding a single $
+
+        Parameters
+        -----------
+        bwt_sequence : str
+            Last column of the sorted rotations matrix
+
+        Returns:
+        ----------
+        normal_sequence : str
+            Original sequence without the $
+        """
+        codes = NumpyKernels.to_uint8(bwt_sequence)
+        #The LF-mapping of a row is the first row of its character plus its rank
+        lf_array = NumpyKernels.c_array(codes)[codes] + NumpyKernels.rank_table(codes)
+        text = NumpyKernels.lf_walk(codes,lf_array)
+        return text[1:].tobytes().decode("latin-1")
+
+    @staticmethod
+    def last_column(text:bytes,suffix_array) -> tuple:
+        """
+        Static class method extracting the BWT from a suffix array
+
+        Parameters
+        -----------
+        text : bytes
+            Sequence followed by the $ sentinel
+        suffix_array : array
+            Start positions of the sorted suffixes of text
+
+        Returns:
+        ----------
+        bwt_sequence : str
+            Last column of the sorted rotations matrix
+        primary_index : int
+            Row of the sorted rotations matrix holding the original sequence
+        """
+        codes = np.frombuffer(text,dtype=np.uint8)
+        #Position -1 of the text is the $ preceding the first suffix
+        bwt_codes = codes[np.asarray(suffix_array) - 1]
+        primary_index = int(np.flatnonzero(bwt_codes == 36)[0])
+        return bwt_codes.tobytes().decode("latin-1"),primary_index
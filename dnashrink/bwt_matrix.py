@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+BwtMatrix module part of the dnashrink package used to display the steps of the
+Burrows-Wheeler Transform without ever building the rotations matrix in memory
+"""
+
+__author__ = 'Mohamed Ouertani'
+
+
+class BwtMatrix():
+
+    """
+    BwtMatrix class representing a virtual view of a Burrows-Wheeler matrix step.
+    Every row is a rotation of the text truncated to a number of columns and is only
+    computed when requested, so a step costs constant memory whatever the text length.
+
+    Attributes
+    ----------
+    text : str
+        Sequence ending with $ whose rotations form the matrix
+    starts : sequence[int]
+        Start position in the text of each row; typically the suffix array or a range
+    shift : int
+        Offset added to every start position (-1 adds the preceding character)
+    width : int
+        Number of columns of the matrix
+    page_size : int
+        Number of rows rendered when the matrix is displayed
+    display_width : int
+        Maximum number of columns rendered for each displayed row
+    """
+
+    def __init__(self,text,starts,width=None,shift=0,page_size=100,display_width=80) -> None:
+        """
+        Class constructor method for initializing all the attributes
+
+        Parameters
+        -----------
+        text : str
+            Sequence ending with $ whose rotations form the matrix
+        starts : sequence[int]
+            Start position in the text of each row
+        width : int (default = None)
+            Number of columns of the matrix; the full text length if not precised
+        shift : int (default = 0)
+            Offset added to every start position
+        page_size : int (default = 100)
+            Number of rows rendered when the matrix is displayed
+        display_width : int (default = 80)
+            Maximum number of columns rendered for each displayed row
+
+        Returns:
+        ----------
+        None
+        """
+        self.text = text
+        self.starts = starts
+        self.shift = shift
+        self.width = len(text) if width is None else width
+        self.page_size = page_size
+        self.display_width = display_width
+
+    def row(self,index:int) -> str:
+        """
+        Class method that computes a single row of the matrix
+
+        Parameters
+        -----------
+        index : int
+            Index of the row to compute
+
+        Returns:
+        ----------
+        row : str
+            Rotation of the text starting at the row's position truncated to width
+        """
+        text_length = len(self.text)
+        #Get the start of the rotation in the text
+        start = (self.starts[index] + self.shift) % text_length
+        end = start + self.width
+        #Wrap around the end of the text if needed
+        if end <= text_length:
+            return self.text[start:end]
+        return self.text[start:] + self.text[:end-text_length]
+
+    def rows(self,first:int,last:int) -> list:
+        """
+        Class method that computes a window of consecutive rows of the matrix
+
+        Parameters
+        -----------
+        first : int
+            Index of the first row of the window
+        last : int
+            Index following the last row of the window
+
+        Returns:
+        ----------
+        rows : list[str]
+            The requested rows of the matrix
+        """
+        return [self.row(index) for index in range(max(first,0),min(last,len(self)))]
+
+    def page(self,number:int) -> str:
+        """
+        Class method that renders one page of rows for display
+
+        Parameters
+        -----------
+        number : int
+            Index of the page to render starting from 0
+
+        Returns:
+        ----------
+        page : str
+            The rows of the page, each shortened to display_width columns
+        """
+        first = number*self.page_size
+        lines = []
+        for row in self.rows(first,first+self.page_size):
+            #Keep the start of long rows and their last column separated by dots
+            if len(row) > self.display_width:
+                row = f"{row[:self.display_width-4]}...{row[-1]}"
+            lines.append(row)
+        #Indicate the number of rows which are not displayed
+        hidden_rows = len(self) - first - len(lines)
+        if hidden_rows > 0:
+            lines.append(f"... {hidden_rows} more rows")
+        return "\n".join(lines)
+
+    def page_count(self) -> int:
+        """
+        Class method returning the number of pages needed to display all the rows
+
+        Returns:
+        ----------
+        int :
+            Number of pages of the matrix; at least 1
+        """
+        return max(1,-(-len(self)//self.page_size))
+
+    def __getitem__(self,index:int) -> str:
+        """
+        Class method used to get a row of the matrix using brackets
+
+        Parameters
+        -----------
+        index : int
+            Index of the row to compute
+
+        Returns:
+        ----------
+        row : str
+            The requested row of the matrix
+        """
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("BwtMatrix row index out of range")
+        return self.row(index)
+
+    def __len__(self) -> int:
+        """
+        Class method returning the number of rows of the matrix
+
+        Returns:
+        ----------
+        int :
+            Number of rows of the matrix
+        """
+        return len(self.starts)
+
+    def __str__(self) -> str:
+        """
+        Class method used to format displayed content when print is called on BwtMatrix object
+
+        Returns:
+        ----------
+        str :
+            Represents the first page of the matrix
+        """
+        return self.page(0)
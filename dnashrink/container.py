@@ -0,0 +1,389 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Container module part of the dnashrink package used to save compressed sequences in a
+versioned binary file : a header holding the codec, the stages, the symbol table, the
+original length, the block index and the BWT layout is followed by the compressed bytes,
+both being protected by a crc32 checksum
+"""
+
+__author__ = 'Mohamed Ouertani'
+
+# Standard library imports
+import struct
+import zlib
+from typing import Generator
+
+
+class Container():
+
+    """
+    Container class reading and writing the binary files of compressed sequences
+
+    Layout (little-endian) :
+    magic "DNSK", version, codec id, flags (BWT input, MTF and RLE stages, BWT layout),
+    last bits, original length, symbol table (symbol and code length of each Huffman
+    symbol), codec fields (key and value of each field of the other codecs), block index
+    (block size and the start of each block), BWT layout if its flag is set (BWT block
+    size and primary indices, checkpoint rate and checkpoints, header and length of each
+    record), payload length, header crc32, then the payload and its crc32
+
+    Attributes
+    ----------
+    codec : str
+        Codec of the payload : "huffman", "twobit", "context" or "adaptive"
+    bwt : bool
+        True if the compressed sequence is a BWT sequence
+    stages : list[str]
+        Stages ("mtf" then "rle") applied before the compression
+    last_bits : int
+        Number of bits of the last byte of the payload
+    original_length : int
+        Number of symbols given by the decompression of the payload
+    code_lengths : dict
+        Length of the canonical Huffman code of each symbol
+    fields : dict
+        Fields needed by the other codecs to decode the payload
+    block_size : int
+        Number of symbols in each block; 0 if the payload is a single block
+    block_offsets : list[int]
+        Position in bytes of the start of each block of the payload
+    bwt_block_size : int
+        Number of nucleotides of each block of a blocked BWT sequence; 0 for a single block
+    primary_indices : list[int]
+        Primary index of each block of a blocked BWT sequence
+    checkpoint_rate : int
+        Number of text positions between two checkpoints of the BWT sequence; 0 for none
+    checkpoints : list[int]
+        Row of every checkpoint_rate-th text position of the BWT sequence
+    records : list[list]
+        Header and length of each FASTA record making up the sequence
+    payload : bytes
+        Compressed bytes; None if they are read as a stream
+    payload_offset : int
+        Position of the payload in the file
+    payload_length : int
+        Number of bytes of the payload
+    payload_crc : int
+        crc32 of the payload
+    """
+
+    #First bytes of every container file
+    MAGIC = b"DNSK"
+    #Version written by this class; older versions can still be read
+    VERSION = 1
+    #Identifier of each codec
+    CODEC_IDS = {"huffman":0,"twobit":1,"context":2,"adaptive":3}
+    #Flag of the BWT input and of each stage
+    BWT_FLAG = 1
+    STAGE_FLAGS = {"mtf":2,"rle":4}
+    #Flag of the BWT layout section
+    LAYOUT_FLAG = 8
+    #Magic, version, codec id, flags, last bits and original length
+    START = struct.Struct("<4sBBBBQ")
+    #Number of bytes read at once when the payload is streamed
+    CHUNK_SIZE = 1 << 20
+
+    def __init__(self,codec="huffman",code_lengths=None,fields=None,payload=b"") -> None:
+        """
+        Class constructor method for initializing all the attributes
+        The other header values keep their default until they are set on the container
+
+        Parameters
+        -----------
+        codec : str (default = "huffman")
+            Codec of the payload
+        code_lengths : dict (default = None)
+            Length of the canonical Huffman code of each symbol
+        fields : dict (default = None)
+            Fields needed by the other codecs to decode the payload
+        payload : bytes (default = b"")
+            Compressed bytes
+
+        Returns:
+        ----------
+        None
+        """
+        self.codec = codec
+        self.bwt = False
+        self.stages = []
+        self.last_bits = 8
+        self.original_length = 0
+        self.code_lengths = code_lengths or {}
+        self.fields = fields or {}
+        self.block_size = 0
+        self.block_offsets = []
+        self.bwt_block_size = 0
+        self.primary_indices = []
+        self.checkpoint_rate = 0
+        self.checkpoints = []
+        self.records = []
+        self.payload = payload
+        self.payload_offset = None
+        self.payload_length = len(payload) if payload is not None else 0
+        self.payload_crc = zlib.crc32(payload) if payload is not None else 0
+
+    def header_to_bytes(self) -> bytes:
+        """
+        Class method packing the header, its crc32 included
+
+        Returns:
+        ----------
+        bytes :
+            Header written before the payload
+        """
+        flags = self.BWT_FLAG if self.bwt else 0
+        for stage in self.stages:
+            flags |= self.STAGE_FLAGS[stage]
+        if self.has_layout():
+            flags |= self.LAYOUT_FLAG
+        header = bytearray(self.START.pack(self.MAGIC,self.VERSION,self.CODEC_IDS[self.codec],
+                                           flags,self.last_bits,self.original_length))
+        #Symbol table of the canonical Huffman codes
+        header += struct.pack("<H",len(self.code_lengths))
+        for symbol,length in sorted(self.code_lengths.items()):
+            symbol_bytes = symbol.encode("utf-8")
+            header += struct.pack("<B",len(symbol_bytes)) + symbol_bytes + struct.pack("<B",length)
+        #Fields of the other codecs
+        header += struct.pack("<H",len(self.fields))
+        for key,value in self.fields.items():
+            key_bytes = str(key).encode("utf-8")
+            value_bytes = str(value).encode("utf-8")
+            header += struct.pack("<B",len(key_bytes)) + key_bytes
+            header += struct.pack("<I",len(value_bytes)) + value_bytes
+        #Block index
+        header += struct.pack("<QI",self.block_size,len(self.block_offsets))
+        header += struct.pack(f"<{len(self.block_offsets)}Q",*self.block_offsets)
+        #Layout of the BWT sequence
+        if self.has_layout():
+            for size,values in ((self.bwt_block_size,self.primary_indices),
+                                (self.checkpoint_rate,self.checkpoints)):
+                header += struct.pack(f"<QI{len(values)}Q",size,len(values),*values)
+            header += struct.pack("<I",len(self.records))
+            for record_header,length in self.records:
+                header_bytes = record_header.encode("utf-8")
+                header += struct.pack("<H",len(header_bytes)) + header_bytes
+                header += struct.pack("<Q",length)
+        header += struct.pack("<Q",self.payload_length)
+        header += struct.pack("<I",zlib.crc32(header))
+        return bytes(header)
+
+    def has_layout(self) -> bool:
+        """
+        Class method verifying if the BWT layout section is needed
+
+        Returns:
+        ----------
+        bool :
+            True if the sequence is a blocked BWT, has checkpoints or several records
+        """
+        return bool(self.bwt_block_size or self.checkpoint_rate or len(self.records) > 1)
+
+    def save(self,output_file:str) -> None:
+        """
+        Class method writing the header, the payload and its crc32 into a file
+
+        Parameters
+        -----------
+        output_file : str
+            Path of the container file
+
+        Returns:
+        ----------
+        None
+        """
+        self.payload_length = len(self.payload)
+        self.payload_crc = zlib.crc32(self.payload)
+        with open(output_file,"wb") as container_output:
+            container_output.write(self.header_to_bytes())
+            container_output.write(self.payload)
+            container_output.write(struct.pack("<I",self.payload_crc))
+
+    def start_stream(self,output_file:str):
+        """
+        Class method opening a container file whose payload is written chunk by chunk
+        The header is written again by end_stream once the payload is complete
+
+        Parameters
+        -----------
+        output_file : str
+            Path of the container file
+
+        Returns:
+        ----------
+        BufferedWriter :
+            Open container file
+        """
+        self.payload = None
+        self.payload_length = 0
+        self.payload_crc = 0
+        container_output = open(output_file,"wb")
+        container_output.write(self.header_to_bytes())
+        return container_output
+
+    def write_stream(self,container_output,chunk:bytes) -> None:
+        """
+        Class method writing the next chunk of the payload
+
+        Parameters
+        -----------
+        container_output : BufferedWriter
+            File opened by start_stream
+        chunk : bytes
+            Next part of the payload
+
+        Returns:
+        ----------
+        None
+        """
+        container_output.write(chunk)
+        self.payload_length += len(chunk)
+        self.payload_crc = zlib.crc32(chunk,self.payload_crc)
+
+    def end_stream(self,container_output) -> None:
+        """
+        Class method writing the payload crc32 and the final header, then closing the file
+        The header keeps its size since only its fixed size values have changed
+
+        Parameters
+        -----------
+        container_output : BufferedWriter
+            File opened by start_stream
+
+        Returns:
+        ----------
+        None
+        """
+        container_output.write(struct.pack("<I",self.payload_crc))
+        container_output.seek(0)
+        container_output.write(self.header_to_bytes())
+        container_output.close()
+
+    @classmethod
+    def is_container(cls,input_file:str) -> bool:
+        """
+        Class method verifying if a file starts with the magic bytes
+
+        Parameters
+        -----------
+        input_file : str
+            Path of the file
+
+        Returns:
+        ----------
+        bool :
+            True if the file is a container
+        """
+        with open(input_file,"rb") as file_input:
+            return file_input.read(len(cls.MAGIC)) == cls.MAGIC
+
+    @classmethod
+    def load(cls,input_file:str,read_payload=True):
+        """
+        Class method reading a container file and verifying its checksums
+
+        Parameters
+        -----------
+        input_file : str
+            Path of the container file
+        read_payload : bool (default = True)
+            Read the payload; otherwise it can be streamed with read_payload_chunks
+
+        Returns:
+        ----------
+        Container :
+            Header values and payload of the file
+        """
+        container = cls(payload=None)
+        with open(input_file,"rb") as file_input:
+            header = bytearray()
+
+            def read(size:int) -> bytes:
+                #Read the next header bytes and keep them for the header crc32
+                data = file_input.read(size)
+                if len(data) != size:
+                    raise ValueError(f"{input_file} is truncated")
+                header.extend(data)
+                return data
+
+            magic,version,codec_id,flags,last_bits,original_length = cls.START.unpack(
+                read(cls.START.size))
+            if magic != cls.MAGIC:
+                raise ValueError(f"{input_file} is not a dnashrink container")
+            if version > cls.VERSION:
+                raise ValueError(f"{input_file} was written by a newer version ({version})")
+            codecs = {codec_id:codec for codec,codec_id in cls.CODEC_IDS.items()}
+            if codec_id not in codecs:
+                raise ValueError(f"{input_file} uses an unknown codec ({codec_id})")
+            container.codec = codecs[codec_id]
+            container.bwt = bool(flags & cls.BWT_FLAG)
+            container.stages = [stage for stage,flag in cls.STAGE_FLAGS.items() if flags & flag]
+            container.last_bits = last_bits
+            container.original_length = original_length
+            symbol_count, = struct.unpack("<H",read(2))
+            for _ in range(symbol_count):
+                symbol = read(read(1)[0]).decode("utf-8")
+                container.code_lengths[symbol] = read(1)[0]
+            field_count, = struct.unpack("<H",read(2))
+            for _ in range(field_count):
+                key = read(read(1)[0]).decode("utf-8")
+                value_length, = struct.unpack("<I",read(4))
+                container.fields[key] = read(value_length).decode("utf-8")
+            container.block_size,block_count = struct.unpack("<QI",read(12))
+            container.block_offsets = list(struct.unpack(f"<{block_count}Q",read(8*block_count)))
+            if flags & cls.LAYOUT_FLAG:
+                container.bwt_block_size,index_count = struct.unpack("<QI",read(12))
+                container.primary_indices = list(struct.unpack(f"<{index_count}Q",
+                                                               read(8*index_count)))
+                container.checkpoint_rate,checkpoint_count = struct.unpack("<QI",read(12))
+                container.checkpoints = list(struct.unpack(f"<{checkpoint_count}Q",
+                                                           read(8*checkpoint_count)))
+                record_count, = struct.unpack("<I",read(4))
+                for _ in range(record_count):
+                    header_length, = struct.unpack("<H",read(2))
+                    record_header = read(header_length).decode("utf-8")
+                    container.records.append([record_header,struct.unpack("<Q",read(8))[0]])
+            container.payload_length, = struct.unpack("<Q",read(8))
+            #A crc32 cut by the end of the file doesn't match either
+            if file_input.read(4) != struct.pack("<I",zlib.crc32(header)):
+                raise ValueError(f"{input_file} has a corrupted header")
+            container.payload_offset = file_input.tell()
+            if read_payload:
+                container.payload = file_input.read(container.payload_length)
+                container.payload_crc = zlib.crc32(container.payload)
+                if (len(container.payload) != container.payload_length
+                    or file_input.read(4) != struct.pack("<I",container.payload_crc)):
+                    raise ValueError(f"{input_file} has a corrupted payload")
+        return container
+
+    def read_payload_chunks(self,input_file:str,chunk_size=CHUNK_SIZE) -> Generator:
+        """
+        Class generator method reading the payload of a container loaded without it
+        The crc32 is verified once the last chunk is read
+
+        Parameters
+        -----------
+        input_file : str
+            Path of the container file
+        chunk_size : int (default = 1 MiB)
+            Number of bytes read at once
+
+        Yields:
+        ----------
+        bytes :
+            Successive parts of the payload
+        """
+        payload_crc = 0
+        remaining = self.payload_length
+        with open(input_file,"rb") as file_input:
+            file_input.seek(self.payload_offset)
+            while remaining:
+                chunk = file_input.read(min(chunk_size,remaining))
+                if not chunk:
+                    raise ValueError(f"{input_file} is truncated")
+                remaining -= len(chunk)
+                payload_crc = zlib.crc32(chunk,payload_crc)
+                yield chunk
+            if file_input.read(4) != struct.pack("<I",payload_crc):
+                raise ValueError(f"{input_file} has a corrupted payload")
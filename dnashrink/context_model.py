@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Context model module part of the dnashrink package used to compress nucleotide
+sequences below 2 bits per base : an adaptive order-k context model predicts each
+nucleotide from the k previous ones and drives a binary range coder
+"""
+
+__author__ = 'Mohamed Ouertani'
+
+# Standard library imports
+from array import array
+# Local application imports
+from dnashrink.two_bit import TwoBitCodec
+
+
+class ContextCoder():
+
+    """
+    ContextCoder class compressing nucleotides with an order-k context model.
+    Each nucleotide is coded as 2 binary decisions (high bit then low bit) whose
+    probabilities are kept for every context of k previous nucleotides. After the n-th
+    decision of a context its probability moves towards the decision by 1/(n+1.5), so
+    rare contexts learn from their first occurrences, until n reaches ADAPTATION_LIMIT.
+    Contexts longer than table_bits bits are hashed.
+    The range coder is the carry-less coder used by LZMA.
+    Non ACGT symbols are coded as A and saved in an exception list like the TwoBitCodec
+
+    Attributes
+    ----------
+    order : int
+        Number of previous nucleotides making up the context
+    table_bits : int
+        Number of bits indexing the contexts of the probability table
+    sequence_length : int
+        Number of nucleotides of the compressed sequence
+    runs : list[list]
+        Start, length and symbol of each run of non ACGT symbols
+    """
+
+    #Number of bits of the probabilities
+    PROBABILITY_BITS = 12
+    #Number of decisions after which the adaptation rate stops decreasing
+    ADAPTATION_LIMIT = 30
+    #Adaptation rate 1/(n+1.5) of the n-th decision scaled to 16 bits
+    ADAPTATION_RATES = [int(65536/(n+1.5)) for n in range(ADAPTATION_LIMIT+1)]
+    #Bounds of the probabilities keeping both decisions codable
+    PROBABILITY_MIN = 16
+    PROBABILITY_MAX = 4080
+    #Multiplier hashing the contexts that don't fit in the table
+    HASH_MULTIPLIER = 2654435761
+
+    def __init__(self,order=12,table_bits=22,sequence_length=None,runs=None) -> None:
+        """
+        Class constructor method for initializing all the attributes
+
+        Parameters
+        -----------
+        order : int (default = 12)
+            Number of previous nucleotides making up the context
+        table_bits : int (default = 22)
+            Number of bits indexing the contexts of the probability table
+        sequence_length : int (default = None)
+            Number of nucleotides of the compressed sequence if it is already compressed
+        runs : list[list] (default = None)
+            Exception list of the compressed sequence if it is already compressed
+
+        Returns:
+        ----------
+        None
+        """
+        self.order = order
+        self.table_bits = min(table_bits,2*order)
+        self.sequence_length = sequence_length
+        self.runs = runs if runs is not None else []
+
+    def new_tables(self) -> tuple:
+        """
+        Class method creating the probability table, every probability being 1/2,
+        and the table counting the decisions of each probability
+        Each context has 3 probabilities : the high bit then the low bit for both
+        values of the high bit
+
+        Returns:
+        ----------
+        probabilities : array
+            Probabilities of a 0 decision scaled to PROBABILITY_BITS bits
+        counts : array
+            Number of decisions seen by each probability up to ADAPTATION_LIMIT
+        """
+        probabilities = array("H",[1 << (self.PROBABILITY_BITS-1)])*(3 << self.table_bits)
+        counts = array("B",[0])*(3 << self.table_bits)
+        return probabilities,counts
+
+    def encode(self,sequence:str) -> bytes:
+        """
+        Class method compressing a sequence with the context model and the range coder
+
+        Parameters
+        -----------
+        sequence : str
+            Sequence to be compressed
+
+        Returns:
+        ----------
+        bytes :
+            Output of the range coder
+        """
+        self.sequence_length = len(sequence)
+        self.runs = TwoBitCodec.find_runs(sequence)
+        #Translate the nucleotides to their 2-bit codes; other symbols become A
+        codes_table = bytearray(256)
+        for code,base in enumerate(TwoBitCodec.BASES):
+            codes_table[ord(base)] = code
+        codes = sequence.encode("latin-1").translate(bytes(codes_table))
+        probabilities,counts = self.new_tables()
+        probability_bits = self.PROBABILITY_BITS
+        probability_one = 1 << probability_bits
+        probability_min = self.PROBABILITY_MIN
+        probability_max = self.PROBABILITY_MAX
+        rates = self.ADAPTATION_RATES
+        limit = self.ADAPTATION_LIMIT
+        context_mask = (1 << 2*self.order) - 1
+        hashed = 2*self.order > self.table_bits
+        hash_shift = 32 - self.table_bits
+        multiplier = self.HASH_MULTIPLIER
+        output = bytearray()
+        low = 0
+        interval = 0xFFFFFFFF
+        cache = 0
+        cache_size = 1
+        context = 0
+        for code in codes:
+            if hashed:
+                index = 3*(((context*multiplier) & 0xFFFFFFFF) >> hash_shift)
+            else:
+                index = 3*context
+            #Code the high bit then the low bit within the high bit branch
+            for position,bit in ((index,code >> 1),(index+1+(code >> 1),code & 1)):
+                probability = probabilities[position]
+                bound = (interval >> probability_bits)*probability
+                count = counts[position]
+                rate = rates[count]
+                if bit:
+                    low += bound
+                    interval -= bound
+                    probability = max(probability - ((probability*rate) >> 16),probability_min)
+                else:
+                    interval = bound
+                    probability = min(probability + (((probability_one-probability)*rate) >> 16),
+                                      probability_max)
+                probabilities[position] = probability
+                if count < limit:
+                    counts[position] = count + 1
+                while interval < 0x1000000:
+                    interval <<= 8
+                    #Shift the top byte of low out, propagating the carry
+                    if low < 0xFF000000 or low > 0xFFFFFFFF:
+                        carry = low >> 32
+                        output.append((cache+carry) & 0xFF)
+                        output.extend(bytes([(0xFF+carry) & 0xFF])*(cache_size-1))
+                        cache_size = 0
+                        cache = (low >> 24) & 0xFF
+                    cache_size += 1
+                    low = (low & 0xFFFFFF) << 8
+            context = ((context << 2) | code) & context_mask
+        #Flush the remaining bytes of low
+        for _ in range(5):
+            if low < 0xFF000000 or low > 0xFFFFFFFF:
+                carry = low >> 32
+                output.append((cache+carry) & 0xFF)
+                output.extend(bytes([(0xFF+carry) & 0xFF])*(cache_size-1))
+                cache_size = 0
+                cache = (low >> 24) & 0xFF
+            cache_size += 1
+            low = (low & 0xFFFFFF) << 8
+        return bytes(output)
+
+    def decode(self,compressed:bytes) -> str:
+        """
+        Class method decompressing the output of encode
+
+        Parameters
+        -----------
+        compressed : bytes
+            Output of the range coder
+
+        Returns:
+        ----------
+        str :
+            The original sequence
+        """
+        probabilities,counts = self.new_tables()
+        probability_bits = self.PROBABILITY_BITS
+        probability_one = 1 << probability_bits
+        probability_min = self.PROBABILITY_MIN
+        probability_max = self.PROBABILITY_MAX
+        rates = self.ADAPTATION_RATES
+        limit = self.ADAPTATION_LIMIT
+        context_mask = (1 << 2*self.order) - 1
+        hashed = 2*self.order > self.table_bits
+        hash_shift = 32 - self.table_bits
+        multiplier = self.HASH_MULTIPLIER
+        #Pad the input so the decoder can read past the flushed bytes
+        compressed = bytes(compressed) + bytes(4)
+        codes = bytearray(self.sequence_length)
+        interval = 0xFFFFFFFF
+        value = int.from_bytes(compressed[1:5],"big")
+        position = 5
+        context = 0
+        for base_index in range(self.sequence_length):
+            if hashed:
+                index = 3*(((context*multiplier) & 0xFFFFFFFF) >> hash_shift)
+            else:
+                index = 3*context
+            code = 0
+            #Decode the high bit then the low bit within the high bit branch
+            for table_index in (index,None):
+                if table_index is None:
+                    table_index = index + 1 + code
+                probability = probabilities[table_index]
+                bound = (interval >> probability_bits)*probability
+                count = counts[table_index]
+                rate = rates[count]
+                if value < bound:
+                    interval = bound
+                    probability = min(probability + (((probability_one-probability)*rate) >> 16),
+                                      probability_max)
+                    code <<= 1
+                else:
+                    value -= bound
+                    interval -= bound
+                    probability = max(probability - ((probability*rate) >> 16),probability_min)
+                    code = (code << 1) | 1
+                probabilities[table_index] = probability
+                if count < limit:
+                    counts[table_index] = count + 1
+                while interval < 0x1000000:
+                    interval <<= 8
+                    value = (value << 8) | compressed[position]
+                    position += 1
+            codes[base_index] = code
+            context = ((context << 2) | code) & context_mask
+        #Translate the 2-bit codes back to nucleotides
+        bases_table = bytearray(256)
+        for code,base in enumerate(TwoBitCodec.BASES):
+            bases_table[code] = ord(base)
+        sequence = codes.translate(bytes(bases_table)).decode("latin-1")
+        return TwoBitCodec.restore_runs(sequence,self.runs)
+
+    def get_fields(self) -> dict:
+        """
+        Class method giving the fields saved in the header of the compressed file
+
+        Returns:
+        ----------
+        dict :
+            Context order, table size, sequence length and exception runs
+        """
+        return {"order":self.order,"table_bits":self.table_bits,"length":self.sequence_length,
+                "runs":TwoBitCodec.runs_to_string(self.runs)}
+
+    @classmethod
+    def from_fields(cls,fields:dict):
+        """
+        Class method creating a coder from the fields saved in a compressed file header
+
+        Parameters
+        -----------
+        fields : dict
+            Header fields written by get_fields
+
+        Returns:
+        ----------
+        ContextCoder :
+            Coder able to decode the compressed sequence
+        """
+        return cls(int(fields["order"]),int(fields["table_bits"]),int(fields["length"]),
+                   TwoBitCodec.string_to_runs(fields["runs"]))
@@ -9,7 +9,10 @@ manipulate data  using the Model component  and interact with the View to render
 
 __author__ = 'Mohamed Ouertani'
 
+# Standard library imports
+from collections import deque
 # Local package imports
+from dnashrink.bwt_matrix import BwtMatrix
 from dnashrink.model import Model
 from dnashrink.view import View
 
@@ -24,6 +27,13 @@ class Controller():
         Model object that manipulates all sequences and data in the program
     view : View
         View object that interacts with the user and displays request results
+    step_limit : int
+        Maximum sequence length for which intermediate steps are displayed;
+        longer sequences are transformed directly
+    current_step : BwtMatrix or str
+        Last step displayed by the Next or End buttons
+    step_page : int
+        Page of the current_step being displayed when it is a BwtMatrix
     """
 
     def __init__(self) -> None:
@@ -38,6 +48,11 @@ class Controller():
         self.model = Model(self)
         #Initializing the view attribute with a View object
         self.view = View(self)
+        #Initializing the maximum length of sequences displayed step by step
+        self.step_limit = 50000
+        #Initializing the displayed step and its page
+        self.current_step = None
+        self.step_page = 0
 
     def function_handler(self,function) -> None:
         """
@@ -74,6 +89,10 @@ class Controller():
                 self.step_by_step()
             elif function == "End":
                 self.jump_to_end()
+            elif function == "Previous page":
+                self.change_page(-1)
+            elif function == "Next page":
+                self.change_page(1)
             elif function == "Load":
                 self.load_file()
 
@@ -92,10 +111,15 @@ class Controller():
             #Verify if sequence is uncompressed
             if self.model.is_uncompressed():
                 #Call model compression method
-                compressed_seq,binary_sequence = self.model.compress_sequence()
+                #Only display the binary sequence of short sequences
+                binary_display = len(self.model.current_sequence) <= self.step_limit
+                compressed_seq,binary_sequence = self.model.compress_sequence(binary_display)
                 #Call view update_text method to display results
-                self.view.update_text(f"Binary sequence : {binary_sequence}\n\n"
-                                    +f"Compressed sequence : {compressed_seq}")
+                if binary_sequence is None:
+                    self.view.update_text(f"Compressed sequence : {compressed_seq}")
+                else:
+                    self.view.update_text(f"Binary sequence : {binary_sequence}\n\n"
+                                        +f"Compressed sequence : {compressed_seq}")
             else:
                 #Show warning message if sequence is already compressed
                 self.view.show_warning("Sequence is already compressed")
@@ -118,10 +142,15 @@ class Controller():
             #Verify if sequence is compressed
             if not self.model.is_uncompressed():
                 #Call model decompression method
-                decompressed_seq,binary_sequence = self.model.decompress_sequence()
+                #Only display the binary sequence of short sequences
+                binary_display = len(self.model.current_sequence) <= self.step_limit
+                decompressed_seq,binary_sequence = self.model.decompress_sequence(binary_display)
                 #Call view update_text method to display results
-                self.view.update_text(f"Binary sequence : {binary_sequence}\n\n"
-                                    +f"Decompressed sequence : {decompressed_seq}")
+                if binary_sequence is None:
+                    self.view.update_text(f"Decompressed sequence : {decompressed_seq}")
+                else:
+                    self.view.update_text(f"Binary sequence : {binary_sequence}\n\n"
+                                        +f"Decompressed sequence : {decompressed_seq}")
             else:
                 #Show warning message if sequence is already decompressed
                 self.view.show_warning("Sequence is already decompressed")
@@ -142,8 +171,10 @@ class Controller():
         if self.model.is_uncompressed():
             #Verify if sequence is not bwt
             if not self.model.bwt_handler.input_is_bwt():
+                #Display steps only for sequences short enough to be read
+                step_display = len(self.model.current_sequence) <= self.step_limit
                 #Call model sequence_to_bwt method
-                bwt_generator = self.model.sequence_to_bwt()
+                bwt_generator = self.model.sequence_to_bwt(step_display)
                 #Update model's current_function attribute with bwt transformation method
                 self.model.update_current_function(bwt_generator)
                 #Call view update_text method to display results
@@ -169,8 +200,10 @@ class Controller():
         if self.model.is_uncompressed():
             #Verify if sequence is bwt
             if self.model.bwt_handler.input_is_bwt():
+                #Display steps only for sequences short enough to be read
+                step_display = len(self.model.current_sequence) <= self.step_limit
                 #Call model bwt_to_sequence method
-                bwt_decoder = self.model.bwt_to_sequence()
+                bwt_decoder = self.model.bwt_to_sequence(step_display)
                 #Update model's current_function attribute with reverse bwt transformation method
                 self.model.update_current_function(bwt_decoder)
                 #Call view update_text method to display results
@@ -196,9 +229,10 @@ class Controller():
         if self.model.current_function:
             try:
                 #Get yield result from the current_function attribute
-                next_value = next(self.model.current_function)
-                #Call view update_text method to display results
-                self.view.update_text(f" Next step :\n{next_value} ")
+                self.current_step = next(self.model.current_function)
+                self.step_page = 0
+                #Call display_step method to display the first page of results
+                self.display_step("Next step")
             #Intercept no more results
             except StopIteration:
                 #Update model's current_sequence
@@ -207,6 +241,7 @@ class Controller():
                 self.view.update_text(f"Current sequence : {current_sequence}")
                 #Reset the current_function attribute of the model
                 self.model.current_function = None
+                self.current_step = None
         else:
             #Display warning if no function is selected
             self.view.show_warning("No function is chosen yet")
@@ -225,9 +260,11 @@ class Controller():
         if self.model.current_function:
             try:
                 #Recover last yield value directly from current_function generator
-                last_value = list(self.model.current_function)[-1]
-                #Call view update_text method to display results
-                self.view.update_text(f" Last step :\n{last_value} ")
+                #keeping only one step in memory at a time
+                self.current_step = deque(self.model.current_function,maxlen=1)[-1]
+                self.step_page = 0
+                #Call display_step method to display the first page of results
+                self.display_step("Last step")
             #Intercept no more results
             except IndexError:
                 #Update model's current_sequence
@@ -236,10 +273,59 @@ class Controller():
                 self.view.update_text(f"Current sequence : {current_sequence}")
                 #Reset the current_function attribute of the model
                 self.model.current_function = None
+                self.current_step = None
         else:
             #Display warning if no function is selected
             self.view.show_warning("No function is chosen yet")
 
+    def change_page(self,offset:int) -> None:
+        """
+        Class method linked to the Previous page and Next page buttons in view
+        This method displays another page of the rows of the current step, each page
+        being computed on request from the BwtMatrix
+
+        Parameters
+        -----------
+        offset : int
+            Number of pages to move by : -1 for the previous page, 1 for the next one
+
+        Returns:
+        ----------
+        None
+        """
+        #Verify if the current step has several pages
+        if isinstance(self.current_step,BwtMatrix) and self.current_step.page_count() > 1:
+            #Stay between the first and the last page
+            page = min(max(self.step_page+offset,0),self.current_step.page_count()-1)
+            if page != self.step_page:
+                self.step_page = page
+                self.display_step("Current step")
+        else:
+            #Display warning if there is nothing to page through
+            self.view.show_warning("The current step has a single page")
+
+    def display_step(self,title:str) -> None:
+        """
+        Class method that displays the current page of the current step
+
+        Parameters
+        -----------
+        title : str
+            Title displayed before the step
+
+        Returns:
+        ----------
+        None
+        """
+        if isinstance(self.current_step,BwtMatrix):
+            page_count = self.current_step.page_count()
+            #Call view update_text method to display the rows of the page
+            self.view.update_text(f" {title} (page {self.step_page+1}/{page_count}) :\n"
+                                  +f"{self.current_step.page(self.step_page)} ")
+        else:
+            #Call view update_text method to display results
+            self.view.update_text(f" {title} :\n{self.current_step} ")
+
     def save(self) -> None:
         """
         Class method linked to save button in view which is used
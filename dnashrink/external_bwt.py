@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+External BWT module part of the dnashrink package used to transform sequences
+larger than the available memory : the sequence is memory-mapped, the suffixes are
+distributed into buckets spilled to temporary files and the BWT is written as a stream
+"""
+
+__author__ = 'Mohamed Ouertani'
+
+# Standard library imports
+import math
+import mmap
+import os
+import shutil
+import tempfile
+from array import array
+from typing import Generator
+
+
+class ExternalBwt():
+
+    """
+    ExternalBwt class for the Burrows-Wheeler Transform of files larger than memory
+
+    Attributes
+    ----------
+    input_file : str
+        Path of the sequence or FASTA file to be transformed
+    output_file : str
+        Path of the BWT file written as a stream
+    memory_budget : int
+        Maximum number of bytes used for the suffixes sorted at the same time
+    temporary_directory : str
+        Directory inside which the spilled buckets are written
+    primary_index : int
+        Row of the sorted rotations matrix holding the original sequence
+    """
+
+    #Bytes needed in memory for each suffix of a bucket being sorted (position and key)
+    SUFFIX_COST = 128
+    #Number of characters compared at once when sorting the suffixes of a bucket
+    KEY_LENGTH = 32
+    #Number of bytes read or written at once when streaming files
+    CHUNK_SIZE = 1 << 20
+
+    def __init__(self,input_file:str,output_file:str,memory_budget=256*1024*1024,
+                 temporary_directory="./data") -> None:
+        """
+        Class constructor method for initializing all the attributes
+
+        Parameters
+        -----------
+        input_file : str
+            Path of the sequence or FASTA file to be transformed
+        output_file : str
+            Path of the BWT file written as a stream
+        memory_budget : int (default = 256 MiB)
+            Maximum number of bytes used for the suffixes sorted at the same time
+        temporary_directory : str (default = "./data")
+            Directory inside which the spilled buckets are written
+
+        Returns:
+        ----------
+        None
+        """
+        self.input_file = input_file
+        self.output_file = output_file
+        self.memory_budget = memory_budget
+        self.temporary_directory = temporary_directory
+        self.primary_index = None
+
+    def transform(self) -> int:
+        """
+        Class method that writes the BWT of the input file into the output file
+
+        Returns:
+        ----------
+        primary_index : int
+            Row of the sorted rotations matrix holding the original sequence
+        """
+        work_directory = tempfile.mkdtemp(prefix="bwt_",dir=self.temporary_directory)
+        try:
+            #Write the cleaned sequence followed by $ so it can be memory-mapped
+            text_file = os.path.join(work_directory,"sequence.raw")
+            text_length = self.clean_sequence(text_file)
+            with open(text_file,"rb") as text_input:
+                text = mmap.mmap(text_input.fileno(),0,access=mmap.ACCESS_READ)
+                try:
+                    buckets = self.spill_buckets(text,text_length,work_directory)
+                    self.write_bwt(text,buckets)
+                finally:
+                    text.close()
+        finally:
+            shutil.rmtree(work_directory,ignore_errors=True)
+        return self.primary_index
+
+    def clean_sequence(self,text_file:str) -> int:
+        """
+        Class method that streams the input file into a raw sequence file
+        FASTA headers, spaces and backlines are removed and $ is added at the end
+        Only one record is transformed : a ValueError is raised for multi-record FASTA
+        files, whose records each need their own $ as done by the in-memory Bwt class
+
+        Parameters
+        -----------
+        text_file : str
+            Path of the raw sequence file to create
+
+        Returns:
+        ----------
+        text_length : int
+            Length of the raw sequence including the $
+        """
+        text_length = 0
+        with open(text_file,"wb") as text_output:
+            for records_count,line in self.read_sequence_lines(self.input_file,self.CHUNK_SIZE):
+                if records_count > 1:
+                    raise ValueError(f"{self.input_file} holds several FASTA records, "
+                                     "load it in memory to transform each record")
+                text_output.write(line)
+                text_length += len(line)
+            text_output.write(b"$")
+        return text_length + 1
+
+    @staticmethod
+    def read_sequence_lines(input_file:str,chunk_size=CHUNK_SIZE) -> Generator:
+        """
+        Static class generator method reading the lines of a sequence or FASTA file
+        FASTA headers, spaces and backlines are removed from the lines
+
+        Parameters
+        -----------
+        input_file : str
+            Path of the sequence or FASTA file
+        chunk_size : int (default = 1 MiB)
+            Maximum number of bytes read at once from a line
+
+        Yields:
+        ----------
+        tuple(int,bytes) :
+            Number of FASTA headers read so far and the cleaned part of a line
+        """
+        records_count = 0
+        header = False
+        line_start = True
+        with open(input_file,"rb") as file_input:
+            #Lines are read in parts so a sequence written on one line stays bounded
+            for line in iter(lambda:file_input.readline(chunk_size),b""):
+                if line_start:
+                    header = line.startswith(b">")
+                    records_count += header
+                line_start = line.endswith(b"\n")
+                #Skip the FASTA headers
+                if not header:
+                    yield records_count,line.translate(None,b" \t\r\n")
+
+    def spill_buckets(self,text,text_length:int,work_directory:str) -> list:
+        """
+        Class method that distributes all the suffixes into buckets according to
+        their first characters; each bucket is small enough to be sorted within
+        the memory budget and is spilled to its own file
+
+        Parameters
+        -----------
+        text : mmap
+            Memory-mapped raw sequence
+        text_length : int
+            Length of the raw sequence including the $
+        work_directory : str
+            Directory where the bucket files are created
+
+        Returns:
+        ----------
+        buckets : list[tuple]
+            Prefix and file path of each bucket in lexicographic order
+        """
+        #Choose the prefix length giving buckets that fit in the budget on average
+        bucket_capacity = max(1,self.memory_budget // self.SUFFIX_COST)
+        prefix_length = max(1,math.ceil(math.log(max(text_length/bucket_capacity,1),4)) + 1)
+        #Buffers are flushed to the bucket files when they reach their share of the budget
+        buffer_limit = max(1024,self.memory_budget // (8*4**prefix_length))
+        buffers = {}
+        paths = {}
+        for position in range(text_length):
+            prefix = text[position:position+prefix_length]
+            positions = buffers.get(prefix)
+            if positions is None:
+                positions = buffers[prefix] = array("q")
+                paths[prefix] = os.path.join(work_directory,f"bucket_{len(paths)}.bin")
+            positions.append(position)
+            if len(positions) >= buffer_limit:
+                self.flush_bucket(paths[prefix],positions)
+                buffers[prefix] = array("q")
+        for prefix,positions in buffers.items():
+            self.flush_bucket(paths[prefix],positions)
+        return sorted(paths.items())
+
+    @staticmethod
+    def flush_bucket(path:str,positions:array) -> None:
+        """
+        Static class method appending suffix positions to a bucket file
+
+        Parameters
+        -----------
+        path : str
+            Path of the bucket file
+        positions : array
+            Suffix positions to be appended
+
+        Returns:
+        ----------
+        None
+        """
+        with open(path,"ab") as bucket_output:
+            positions.tofile(bucket_output)
+
+    def write_bwt(self,text,buckets:list) -> None:
+        """
+        Class method that sorts each bucket in turn and streams the BWT characters
+        of its suffixes into the output file
+
+        Parameters
+        -----------
+        text : mmap
+            Memory-mapped raw sequence
+        buckets : list[tuple]
+            Prefix and file path of each bucket in lexicographic order
+
+        Returns:
+        ----------
+        None
+        """
+        bucket_capacity = max(1,self.memory_budget // self.SUFFIX_COST)
+        row = 0
+        #Buckets are processed from a stack holding the smallest prefix on top
+        pending = [(prefix,path,1) for prefix,path in reversed(buckets)]
+        with open(self.output_file,"wb") as bwt_output:
+            while pending:
+                prefix,path,extension = pending.pop()
+                #Split the buckets too large for the budget using longer prefixes
+                if (os.path.getsize(path)//8 > bucket_capacity
+                        and not prefix.endswith(b"$")):
+                    pending.extend(reversed(self.split_bucket(text,prefix,path,extension)))
+                    continue
+                positions = array("q")
+                with open(path,"rb") as bucket_input:
+                    positions.frombytes(bucket_input.read())
+                os.remove(path)
+                self.sort_suffixes(text,positions)
+                #The BWT character of a suffix is the character preceding it
+                bwt_block = bytes(text[position-1] for position in positions)
+                if 0 in positions:
+                    self.primary_index = row + positions.index(0)
+                bwt_output.write(bwt_block)
+                row += len(positions)
+
+    def split_bucket(self,text,prefix:bytes,path:str,extension:int) -> list:
+        """
+        Class method that splits a bucket file into smaller buckets using the
+        characters following its prefix; the extension doubles each time so long
+        repeats are split in a logarithmic number of passes
+
+        Parameters
+        -----------
+        text : mmap
+            Memory-mapped raw sequence
+        prefix : bytes
+            Prefix shared by all the suffixes of the bucket
+        path : str
+            Path of the bucket file
+        extension : int
+            Number of characters added to the prefix
+
+        Returns:
+        ----------
+        buckets : list[tuple]
+            Prefix, file path and next extension of each sub-bucket in lexicographic order
+        """
+        prefix_length = len(prefix) + extension
+        sub_paths = {}
+        with open(path,"rb") as bucket_input:
+            #Read the bucket by chunks to stay within the budget
+            while chunk := bucket_input.read(self.CHUNK_SIZE):
+                positions = array("q")
+                positions.frombytes(chunk)
+                sub_buffers = {}
+                for position in positions:
+                    sub_prefix = text[position:position+prefix_length]
+                    sub_buffers.setdefault(sub_prefix,array("q")).append(position)
+                for sub_prefix,sub_positions in sub_buffers.items():
+                    if sub_prefix not in sub_paths:
+                        sub_paths[sub_prefix] = f"{path}.{len(sub_paths)}"
+                    self.flush_bucket(sub_paths[sub_prefix],sub_positions)
+        os.remove(path)
+        return [(sub_prefix,sub_path,2*extension)
+                for sub_prefix,sub_path in sorted(sub_paths.items())]
+
+    def sort_suffixes(self,text,positions:array) -> None:
+        """
+        Class method sorting suffix positions sharing a prefix, comparing KEY_LENGTH
+        characters at a time and only going deeper for the groups still tied
+
+        Parameters
+        -----------
+        text : mmap
+            Memory-mapped raw sequence
+        positions : array
+            Suffix positions to be sorted in place
+
+        Returns:
+        ----------
+        None
+        """
+        key_length = self.KEY_LENGTH
+        #Each pending group is its start, end and number of characters already compared
+        pending = [(0,len(positions),0)]
+        while pending:
+            start,end,offset = pending.pop()
+            group = sorted(positions[start:end],
+                           key=lambda position: text[position+offset:position+offset+key_length])
+            positions[start:end] = array("q",group)
+            #Find the runs of suffixes whose compared characters are still equal
+            previous_key = None
+            run_start = start
+            for index in range(start,end+1):
+                key = (text[positions[index]+offset:positions[index]+offset+key_length]
+                       if index < end else None)
+                if key != previous_key:
+                    if index - run_start > 1:
+                        pending.append((run_start,index,offset+key_length))
+                    run_start = index
+                    previous_key = key
@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+FM-index module part of the dnashrink package used to count and locate patterns
+directly inside a BWT sequence without reversing the transformation
+"""
+
+__author__ = 'Mohamed Ouertani'
+
+# Standard library imports
+import json
+import zlib
+from array import array
+from bisect import bisect_right
+
+
+class FmIndex():
+
+    """
+    FmIndex class answering pattern queries on a Burrows-Wheeler Transform
+
+    Attributes
+    ----------
+    bwt_sequence : str
+        Last column of the sorted rotations matrix
+    occ_rate : int
+        Number of rows between two stored occurrence checkpoints
+    sa_rate : int
+        Number of text positions between two stored suffix array samples
+    c_table : dict
+        Number of characters smaller than each character in the bwt_sequence
+    checkpoints : dict
+        For each character, its number of occurrences before every occ_rate rows
+    sa_samples : dict
+        Text position of the rows whose position is a multiple of sa_rate or is the
+        start of a record
+    record_lengths : list[int]
+        Lengths of the records of a multi-record BWT sequence; empty for a single record
+    record_starts : list[int]
+        Text position of the start of each record, the records being joined by their $
+    """
+
+    def __init__(self,bwt_sequence:str,suffix_array=None,occ_rate=64,sa_rate=32,
+                 record_lengths=None) -> None:
+        """
+        Class constructor method for initializing all the attributes and building the index
+
+        Parameters
+        -----------
+        bwt_sequence : str
+            Last column of the sorted rotations matrix
+        suffix_array : array (default = None)
+            Suffix array used for the sampling; recovered with LF-mapping if not precised
+        occ_rate : int (default = 64)
+            Number of rows between two stored occurrence checkpoints
+        sa_rate : int (default = 32)
+            Number of text positions between two stored suffix array samples;
+            0 to only build the occurrence checkpoints used by count and LF-mapping
+        record_lengths : list[int] (default = None)
+            Lengths of the records if the BWT sequence holds one $ per record
+
+        Returns:
+        ----------
+        None
+        """
+        self.bwt_sequence = bwt_sequence
+        self.occ_rate = occ_rate
+        self.sa_rate = sa_rate
+        self.c_table = {}
+        self.checkpoints = {}
+        self.sa_samples = {}
+        self.set_records(record_lengths)
+        #Build the index only if it isn't loaded from a file
+        if bwt_sequence is not None:
+            self.build_occ()
+            if sa_rate:
+                self.build_samples(suffix_array)
+
+    def set_records(self,record_lengths) -> None:
+        """
+        Class method that computes the start of each record in the text
+
+        Parameters
+        -----------
+        record_lengths : list[int]
+            Lengths of the records; None or a single length for a single record
+
+        Returns:
+        ----------
+        None
+        """
+        self.record_lengths = []
+        if record_lengths and len(record_lengths) > 1:
+            self.record_lengths = list(record_lengths)
+        self.record_starts = [0]
+        #Each record is followed by its own $
+        for length in self.record_lengths[:-1]:
+            self.record_starts.append(self.record_starts[-1] + length + 1)
+
+    def build_occ(self) -> None:
+        """
+        Class method that builds the C table and the occurrence checkpoints
+
+        Returns:
+        ----------
+        None
+        """
+        bwt_sequence = self.bwt_sequence
+        alphabet = sorted(set(bwt_sequence))
+        #Count the occurrences of each character before every checkpoint row
+        for char in alphabet:
+            counts = array("l",[0])
+            total = 0
+            for start in range(0,len(bwt_sequence),self.occ_rate):
+                total += bwt_sequence.count(char,start,start+self.occ_rate)
+                counts.append(total)
+            self.checkpoints[char] = counts
+        #Cumulate the total counts in alphabetical order
+        total = 0
+        for char in alphabet:
+            self.c_table[char] = total
+            total += self.checkpoints[char][-1]
+
+    def build_samples(self,suffix_array=None) -> None:
+        """
+        Class method that samples the suffix array every sa_rate text positions
+
+        Parameters
+        -----------
+        suffix_array : array (default = None)
+            Suffix array of the text; recovered by LF-mapping from the $ row of each
+            record if not precised
+
+        Returns:
+        ----------
+        None
+        """
+        #The starts of the records are sampled so locate never walks past a $
+        record_starts = set(self.record_starts)
+        if suffix_array is not None:
+            for row,position in enumerate(suffix_array):
+                if position % self.sa_rate == 0 or position in record_starts:
+                    self.sa_samples[row] = position
+            return
+        ends = self.record_starts[1:] + [len(self.bwt_sequence)]
+        #Row index starts with the $ of record index, which ends the record
+        for row,(start,end) in enumerate(zip(self.record_starts,ends)):
+            position = end - 1
+            #Walk backwards through the record sampling the positions on the way
+            while position >= start:
+                if position % self.sa_rate == 0 or position == start:
+                    self.sa_samples[row] = position
+                row = self.lf_mapping(row)
+                position -= 1
+
+    def occ(self,char:str,row:int) -> int:
+        """
+        Class method that counts the occurrences of a character before a row
+
+        Parameters
+        -----------
+        char : str
+            Character to count
+        row : int
+            Row before which occurrences are counted
+
+        Returns:
+        ----------
+        int :
+            Number of occurrences of char in bwt_sequence[:row]
+        """
+        block = row // self.occ_rate
+        #Start from the closest checkpoint and count the remaining rows
+        return (self.checkpoints[char][block]
+                + self.bwt_sequence.count(char,block*self.occ_rate,row))
+
+    def lf_mapping(self,row:int) -> int:
+        """
+        Class method that maps a row to the row of its preceding text position
+
+        Parameters
+        -----------
+        row : int
+            Row of the sorted rotations matrix
+
+        Returns:
+        ----------
+        int :
+            Row starting with the last character of the given row
+        """
+        char = self.bwt_sequence[row]
+        return self.c_table[char] + self.occ(char,row)
+
+    def backward_search(self,pattern:str) -> tuple:
+        """
+        Class method that finds the range of rows starting with a pattern
+
+        Parameters
+        -----------
+        pattern : str
+            Pattern to search in the indexed sequence
+
+        Returns:
+        ----------
+        top : int
+            First row starting with the pattern
+        bottom : int
+            Row following the last row starting with the pattern
+        """
+        top = 0
+        bottom = len(self.bwt_sequence)
+        #Extend the match one character at a time from the end of the pattern
+        for char in reversed(pattern):
+            if char not in self.c_table:
+                return 0,0
+            top = self.c_table[char] + self.occ(char,top)
+            bottom = self.c_table[char] + self.occ(char,bottom)
+            if top >= bottom:
+                return 0,0
+        return top,bottom
+
+    def count(self,pattern:str) -> int:
+        """
+        Class method that counts the occurrences of a pattern in O(len(pattern))
+
+        Parameters
+        -----------
+        pattern : str
+            Pattern to count in the indexed sequence
+
+        Returns:
+        ----------
+        int :
+            Number of occurrences of the pattern
+        """
+        top,bottom = self.backward_search(pattern)
+        return bottom - top
+
+    def locate(self,pattern:str) -> list:
+        """
+        Class method that locates the occurrences of a pattern
+        Each occurrence costs at most sa_rate LF-mapping steps
+
+        Parameters
+        -----------
+        pattern : str
+            Pattern to locate in the indexed sequence
+
+        Returns:
+        ----------
+        positions : list[int] or list[tuple]
+            Sorted start positions of the pattern in the original sequence; for several
+            records, sorted (record, offset) pairs giving the position in each record
+        """
+        top,bottom = self.backward_search(pattern)
+        positions = []
+        for row in range(top,bottom):
+            steps = 0
+            #Walk backwards until a sampled row is reached
+            while row not in self.sa_samples:
+                row = self.lf_mapping(row)
+                steps += 1
+            positions.append(self.sa_samples[row] + steps)
+        if self.record_lengths:
+            #Find the record holding each position of the joined text
+            records = [bisect_right(self.record_starts,position) - 1 for position in positions]
+            return sorted((record,position - self.record_starts[record])
+                          for record,position in zip(records,positions))
+        return sorted(positions)
+
+    def save(self,file_path:str) -> None:
+        """
+        Class method that saves the index next to its BWT file so it is not rebuilt
+
+        Parameters
+        -----------
+        file_path : str
+            Path of the index file to create
+
+        Returns:
+        ----------
+        None
+        """
+        index_content = {"bwt_length":len(self.bwt_sequence),
+                         "bwt_crc":self.bwt_crc(self.bwt_sequence),
+                         "occ_rate":self.occ_rate,
+                         "sa_rate":self.sa_rate,
+                         "c_table":self.c_table,
+                         "record_lengths":self.record_lengths,
+                         "checkpoints":{char:counts.tolist()
+                                        for char,counts in self.checkpoints.items()},
+                         "sa_samples":[item for sample in self.sa_samples.items()
+                                       for item in sample]}
+        with open(file_path,"w") as index_output:
+            json.dump(index_content,index_output)
+
+    @staticmethod
+    def bwt_crc(bwt_sequence:str) -> int:
+        """
+        Static class method giving the crc32 of a BWT sequence saved with its index
+
+        Parameters
+        -----------
+        bwt_sequence : str
+            BWT sequence the index is built on
+
+        Returns:
+        ----------
+        int :
+            crc32 of the sequence
+        """
+        return zlib.crc32(bwt_sequence.encode("utf-8"))
+
+    @classmethod
+    def load(cls,file_path:str,bwt_sequence:str):
+        """
+        Class method that loads a saved index for its BWT sequence
+        An index saved for another sequence raises a ValueError so it can be rebuilt
+
+        Parameters
+        -----------
+        file_path : str
+            Path of the index file
+        bwt_sequence : str
+            BWT sequence the index was built on
+
+        Returns:
+        ----------
+        FmIndex :
+            The loaded index
+        """
+        with open(file_path,"r") as index_input:
+            index_content = json.load(index_input)
+        #Verify that the index was built on this BWT sequence
+        if (index_content.get("bwt_length") != len(bwt_sequence)
+            or index_content.get("bwt_crc") != cls.bwt_crc(bwt_sequence)):
+            raise ValueError(f"{file_path} doesn't index this BWT sequence")
+        fm_index = cls(None,occ_rate=index_content["occ_rate"],
+                       sa_rate=index_content["sa_rate"])
+        fm_index.bwt_sequence = bwt_sequence
+        fm_index.set_records(index_content.get("record_lengths"))
+        fm_index.c_table = index_content["c_table"]
+        fm_index.checkpoints = {char:array("l",counts)
+                                for char,counts in index_content["checkpoints"].items()}
+        samples = index_content["sa_samples"]
+        fm_index.sa_samples = dict(zip(samples[0::2],samples[1::2]))
+        return fm_index
@@ -9,9 +9,14 @@ decompress DNA sequences using the Huffman algorithm
 __author__ = 'Mohamed Ouertani'
 
 # Standard library imports
-from collections import Counter
+import heapq
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 # Local application imports
+from dnashrink.alphabet import SequenceAlphabet
 from dnashrink.binary_tree import BinaryTree
+from dnashrink.bit_io import BitReader, BitWriter
+from dnashrink.huffman_decoder import TableDecoder
 
 class Huffman():
 
@@ -26,17 +31,34 @@ class Huffman():
         Non-binary decompressed DNA sequence
     binary_tree : BinaryTree
         Binary tree created using the sequence
+    code_lengths : Dict
+        Length of the code of each character, enough to rebuild the canonical codes
     coding_dict : Dict
         Dictionnary used for transforming DNA sequence to binary
     decoding_dict : Dict
         Dictionnary used for transforming binary sequence back to original DNA sequence
     huffman_sequence : str
         Final compressed sequence obtained after the Huffman compression algorithm
+    packed_sequence : bytearray
+        Huffman codes of the original_sequence packed into bytes
+    last_bits : int
+        Number of bits of the last byte of packed_sequence
     binary_sequence : str
-        Intermediate binary sequence for compression and decompression steps
+        Intermediate binary sequence only built to display the compression steps
+    block_size : int
+        Number of characters coded independently in each block;
+        None if the whole sequence is a single block
+    block_offsets : list[int]
+        Position in bytes of the start of each block of packed_sequence
+    kmer_size : int
+        Number of nucleotides making up each symbol of the Huffman alphabet
+    max_code_length : int
+        Maximum number of bits of a code; None if the codes are not limited
     """
 
-    def __init__(self,input_sequence,decoding_dict=None) -> None:
+    def __init__(self,input_sequence,decoding_dict=None,uncompressed=None,
+                 last_bits=None,block_size=None,block_offsets=None,kmer_size=1,
+                 max_code_length=None) -> None:
         """
         Class constructor method for initializing all the attributes
 
@@ -46,6 +68,19 @@ class Huffman():
             Sequence passed by the Model to be compressed/decompressed
         decoding_dict : dict (default = None)
             Dictionnary used for decompression if input sequence is already compressed
+        uncompressed : bool (default = None)
+            Compression status of the input sequence; verified with sequence_checker
+            if not precised, which only recognizes nucleotide sequences
+        last_bits : int (default = None)
+            Number of bits of the last Char if input sequence is already compressed
+        block_size : int (default = None)
+            Block size of input_sequence if it is compressed in blocks
+        block_offsets : list[int] (default = None)
+            Start of each block if input sequence is compressed in blocks
+        kmer_size : int (default = 1)
+            Number of nucleotides coded together as a single symbol (2 to 4 for k-mers)
+        max_code_length : int (default = None)
+            Maximum number of bits of a code (e.g. 12 or 15) so the decoding tables stay small
 
         Returns:
         ----------
@@ -53,20 +88,37 @@ class Huffman():
         """
         #Initializing the input_sequence attribute
         self.input_sequence = input_sequence
+        self.kmer_size = kmer_size
+        self.max_code_length = max_code_length
+        if uncompressed is None:
+            uncompressed = self.sequence_checker()
         #Verifying if input_sequence sequence is uncompressed
-        if self.sequence_checker():
-        #Initializing all the attributes
+        if uncompressed:
+        #Initializing all the attributes; the codes are only built for a compression
             self.original_sequence = input_sequence
-            self.frequency_list = self.car_frequency()
-            self.binary_tree = BinaryTree().tree_builder(self.frequency_list)
-            self.coding_dict, self.decoding_dict = self.binary_tree.get_tree_leaves()
+            self.frequency_list = None
+            self.binary_tree = None
+            self.code_lengths = self.coding_dict = self.decoding_dict = None
             self.huffman_sequence = None
+            self.last_bits = None
+            self.block_size = None
+            self.block_offsets = None
         else:
             self.original_sequence = None
             self.frequency_list = None
             self.binary_tree = None
             self.coding_dict,self.decoding_dict = None, decoding_dict
+            self.code_lengths = None
+            #Sequences that aren't nucleotides are loaded without any codes to decode them
+            if decoding_dict is not None:
+                self.code_lengths = {symbol:len(code) for code,symbol in decoding_dict.items()}
+                #The longest symbol gives the size of the k-mers the sequence was cut into
+                self.kmer_size = max(map(len,decoding_dict.values()),default=1)
             self.huffman_sequence = input_sequence
+            self.last_bits = last_bits
+            self.block_size = block_size
+            self.block_offsets = block_offsets
+        self.packed_sequence = None
         self.binary_sequence = None
 
     def sequence_checker(self) -> bool:
@@ -78,16 +130,13 @@ class Huffman():
         bool :
             Boolean variable result for compression verification
         """
-        #Going through the sequence characters
-        for char in self.input_sequence:
-            #Verifying if character is part of the list
-            if char not in ["A","T","G","C","N","$"]:
-                return False
-        return True
+        #Delete the nucleotides in a single pass instead of checking each character
+        return SequenceAlphabet(self.input_sequence).is_nucleotide()
 
     def car_frequency(self) -> list:
         """
         Class method to calculate character frequencies in the original_sequence attribute
+        The k-mers are counted instead of the characters when kmer_size is above 1
 
         Returns:
         ----------
@@ -95,135 +144,373 @@ class Huffman():
             A list of all the characters in the original_sequence and their corresponding
             frequencies ordered in a descending order by frequencies
         """
-        #Count all character occurences in the sequence using Counter object
-        counts = Counter(self.original_sequence)
-        #Sort all the counted characters using their frequencies in a descending order
-        counts_list = sorted(counts.items(), key=lambda x:x[1])
+        #Count all character occurences in the sequence
+        counts = SequenceAlphabet(self.original_sequence).get_kmer_counts(self.kmer_size)
+        #Sort all the counted characters using their frequencies in a descending order,
+        #the characters breaking the ties so the codes don't depend on the counting order
+        counts_list = sorted(counts.items(), key=lambda x:(x[1],x[0]))
         return counts_list
 
+    def build_codes(self) -> None:
+        """
+        Class method building the codes of the original_sequence from its frequencies
+        if they are not known yet; the codes are only needed to compress the sequence
+
+        Returns:
+        ----------
+        None
+        """
+        #Compressed sequences already know their code lengths
+        if self.code_lengths is None:
+            self.frequency_list = self.car_frequency()
+            self.binary_tree = BinaryTree().heap_builder(self.frequency_list)
+            self.code_builder()
+
+    def code_builder(self) -> None:
+        """
+        Class method that keeps the code lengths given by the binary_tree and replaces
+        its codes by the canonical codes having the same lengths
+        The lengths are computed again with package-merge if a code is longer than
+        max_code_length
+
+        Returns:
+        ----------
+        None
+        """
+        self.code_lengths = self.binary_tree.get_code_lengths()
+        if (self.max_code_length
+            and max(self.code_lengths.values(),default=0) > self.max_code_length):
+            self.code_lengths = self.limited_code_lengths(self.frequency_list,
+                                                          self.max_code_length)
+        self.coding_dict,self.decoding_dict = self.canonical_codes(self.code_lengths)
+
+    @staticmethod
+    def limited_code_lengths(list_frequencies:list,max_length:int) -> dict:
+        """
+        Static class method giving the optimal code lengths that don't exceed max_length
+        with the package-merge algorithm : at each of the max_length-1 levels the items are
+        paired into packages which are merged with the characters by frequency, then the
+        code length of a character is the number of times it is found in the 2n-2 lowest items
+
+        Parameters
+        -----------
+        list_frequencies : list[tuple]
+            A list of all the characters and their corresponding frequencies
+        max_length : int
+            Maximum number of bits of a code
+
+        Returns:
+        ----------
+        code_lengths : dict
+            Length of the code of each character
+        """
+        #Characters are sorted like the frequency lists so the ties are always broken the same way
+        list_frequencies = sorted(list_frequencies,key=lambda x:(x[1],x[0]))
+        if len(list_frequencies) <= 1:
+            return {car:1 for car,_ in list_frequencies}
+        if len(list_frequencies) > 1 << max_length:
+            raise ValueError(f"{len(list_frequencies)} characters can't have codes of "
+                             f"{max_length} bits or less")
+        #A character item holds its index, a package item the 2 items it was made of
+        characters = [(freq,index) for index,(_,freq) in enumerate(list_frequencies)]
+        items = characters
+        for _ in range(max_length-1):
+            packages = [(items[index][0]+items[index+1][0],items[index],items[index+1])
+                        for index in range(0,len(items)-1,2)]
+            items = list(heapq.merge(characters,packages,key=lambda item:item[0]))
+        #Count the characters found in the selected items
+        lengths = [0]*len(list_frequencies)
+        stack = items[:2*len(list_frequencies)-2]
+        while stack:
+            item = stack.pop()
+            if len(item) == 2:
+                lengths[item[1]] += 1
+            else:
+                stack.append(item[1])
+                stack.append(item[2])
+        return {car:length for (car,_),length in zip(list_frequencies,lengths)}
+
+    @staticmethod
+    def canonical_codes(code_lengths:dict) -> tuple:
+        """
+        Static class method assigning the canonical Huffman codes : characters are sorted
+        by code length then by character and each code is the previous one plus 1,
+        shifted left when the length grows
+
+        Parameters
+        -----------
+        code_lengths : dict
+            Length of the code of each character
+
+        Returns:
+        ----------
+        coding_dict : dict
+            Binary code of each character
+        decoding_dict : dict
+            Character of each binary code
+        """
+        coding_dict = {}
+        decoding_dict = {}
+        code = 0
+        previous_length = 0
+        for symbol,length in sorted(code_lengths.items(),key=lambda item:(item[1],item[0])):
+            code <<= length - previous_length
+            binary_code = format(code,"b").zfill(length)
+            coding_dict[symbol] = binary_code
+            decoding_dict[binary_code] = symbol
+            code += 1
+            previous_length = length
+        return coding_dict,decoding_dict
+
+    def is_canonical(self) -> bool:
+        """
+        Class method verifying that the decoding_dict holds the canonical codes,
+        which is not the case for files compressed before canonical codes were used
+
+        Returns:
+        ----------
+        bool :
+            True if the codes can be rebuilt from code_lengths alone
+        """
+        self.build_codes()
+        return self.canonical_codes(self.code_lengths)[1] == self.decoding_dict
+
+    def canonical_repack(self) -> str:
+        """
+        Class method coding a sequence compressed before canonical codes were used again
+        with the canonical codes of the same lengths, so only the lengths need to be saved
+
+        Returns:
+        ----------
+        huffman_sequence : str
+            The compressed sequence coded with the canonical codes
+        """
+        if not self.is_canonical():
+            self.binary_to_sequence()
+            self.coding_dict,self.decoding_dict = self.canonical_codes(self.code_lengths)
+            self.sequence_to_bytes()
+            self.binary_to_char()
+        return self.huffman_sequence
+
+    def sequence_to_bytes(self) -> bytearray:
+        """
+        Class method to pack the codes of the original_sequence nucleotides into bytes
+        using the coding_dict and a BitWriter, without building a binary string
+
+        Returns:
+        ----------
+        packed_sequence : bytearray
+            Bytes holding the codes; the bits of the last byte are right-aligned
+        """
+        self.build_codes()
+        bit_writer = BitWriter()
+        bit_writer.write_symbols(self.tokenize(self.original_sequence,self.kmer_size),
+                                 self.coding_dict)
+        self.packed_sequence,self.last_bits = bit_writer.get_bytes()
+        self.block_size = self.block_offsets = None
+        return self.packed_sequence
+
+    def block_to_bytes(self,block_size:int,workers=None) -> bytearray:
+        """
+        Class method packing the original_sequence block by block in a pool of processes
+        All the blocks share the codes of the whole sequence but each one starts on a new
+        byte, so the blocks can also be decoded independently
+
+        Parameters
+        -----------
+        block_size : int
+            Number of characters in each block
+        workers : int (default = None)
+            Number of processes used; the number of processors if not precised
+
+        Returns:
+        ----------
+        packed_sequence : bytearray
+            Concatenation of the packed blocks; the bits of the last byte are right-aligned
+        """
+        self.build_codes()
+        #The blocks hold whole k-mers
+        block_size += -block_size % self.kmer_size
+        #Split the original sequence into blocks
+        blocks = [self.original_sequence[start:start+block_size]
+                  for start in range(0,len(self.original_sequence),block_size)] or [""]
+        #Pack the blocks in parallel keeping their order
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            block_results = list(executor.map(self.block_encode,blocks,repeat(self.coding_dict),
+                                              repeat(self.kmer_size)))
+        #Reassemble the blocks and record where each one starts
+        self.packed_sequence = bytearray()
+        self.block_offsets = []
+        for index,(packed_block,last_bits) in enumerate(block_results):
+            self.block_offsets.append(len(self.packed_sequence))
+            if index < len(block_results) - 1 and last_bits < 8:
+                #The padding of the inner blocks goes after their codes
+                packed_block[-1] = (packed_block[-1] << (8-last_bits)) & 0xFF
+            self.packed_sequence += packed_block
+        self.last_bits = block_results[-1][1]
+        self.block_size = block_size
+        return self.packed_sequence
+
+    @staticmethod
+    def tokenize(sequence:str,kmer_size:int):
+        """
+        Static class method cutting a sequence into the symbols of the Huffman alphabet
+
+        Parameters
+        -----------
+        sequence : str
+            Sequence to be cut
+        kmer_size : int
+            Number of nucleotides of each symbol
+
+        Returns:
+        ----------
+        iterable[str] :
+            The sequence itself for single characters, its consecutive k-mers otherwise
+        """
+        if kmer_size == 1:
+            return sequence
+        return (sequence[start:start+kmer_size] for start in range(0,len(sequence),kmer_size))
+
+    @staticmethod
+    def block_encode(block:str,coding_dict:dict,kmer_size=1) -> tuple:
+        """
+        Static class method packing a single block inside a worker process
+
+        Parameters
+        -----------
+        block : str
+            Block of the original sequence
+        coding_dict : dict
+            Binary code of each character
+        kmer_size : int (default = 1)
+            Number of nucleotides of each symbol
+
+        Returns:
+        ----------
+        packed_block : bytearray
+            Codes of the block; the bits of the last byte are right-aligned
+        last_bits : int
+            Number of bits of the last byte
+        """
+        bit_writer = BitWriter()
+        bit_writer.write_symbols(Huffman.tokenize(block,kmer_size),coding_dict)
+        return bit_writer.get_bytes()
+
+    @staticmethod
+    def block_decode(packed_block:bytes,decoding_dict:dict,last_bits:int,block_size:int) -> str:
+        """
+        Static class method decoding a single block inside a worker process
+
+        Parameters
+        -----------
+        packed_block : bytes
+            Codes of the block
+        decoding_dict : dict
+            Character of each binary code
+        last_bits : int
+            Number of bits of the last byte
+        block_size : int
+            Number of characters in each block
+
+        Returns:
+        ----------
+        str :
+            Block of the original sequence, without the characters read from the padding
+        """
+        return TableDecoder(decoding_dict).decode(packed_block,last_bits)[:block_size]
+
     def sequence_to_binary(self) -> str:
         """
         Class method to transform the original_sequence nucleotides into binary code
         using the coding_dict
+        The binary string is only built for display from the packed bytes
 
         Returns:
         ----------
         binary_sequence : str
             Final binary sequence after transformation
         """
-        #Initializing binary_sequence attribute
-        self.binary_sequence = ""
-        #Fill binary_sequence with binary code corresponding to each nucleotide from coding_dict
-        for nuc in self.original_sequence:
-            self.binary_sequence += self.coding_dict[nuc]
+        if self.packed_sequence is None:
+            self.sequence_to_bytes()
+        self.binary_sequence = BitReader(self.packed_sequence,self.last_bits).to_binary()
         return self.binary_sequence
 
     def binary_to_char(self) -> str:
         """
-        Class method to transform binary_sequence by taking 8 bits at a time
-        and converting them to their corresponding Char using UTF-8 encoding
+        Class method to transform the packed bytes into Char sequence
+        each byte being converted to the Char with the same code point
 
         Returns:
         ----------
         huffman_sequence : str
             The final compressed sequence of the Huffman compression algorithm
         decoding_dict : Dict
-            The new decoding dictionnary with the last Char number of bits needed
-            for decompressing the sequence
-        """
-        #Initializing the huffman_sequence attribute
-        self.huffman_sequence = ""
-        #Calculating the length of the binary_sequence attribute
-        len_binary = len(self.binary_sequence)
-        i=0
-        #Transforming the binary sequence to Char sequence
-        while i < len_binary:
-            if i+8 <= len_binary:
-                #Getting the 8 bit subsequence
-                partial_sequence = self.binary_sequence[i:i+8]
-                #Transforming subsequence to char and adding it to huffman_sequence
-                self.huffman_sequence += chr(int(partial_sequence,2))
-                i = i+8
-            else: #Condition for the last Char transformation
-                #Getting the last bits subsequence
-                partial_sequence = self.binary_sequence[i:len_binary]
-                #Transforming subsequence to char and adding it to huffman_sequence
-                self.huffman_sequence += chr(int(partial_sequence,2))
-                break
-
-        #calculating the length of the huffman_sequence
-        len_compressed = len(self.huffman_sequence)
-        #Getting the last character from the huffman_sequence
-        last_char = self.huffman_sequence[len_compressed-1]
-        #Calculating the number of bits of last character
-        last_bits = len_binary%8
-
-        #Adding the last character and it's number of bits to decoding_dict
-        if last_bits == 0:
-            self.decoding_dict[last_char] = 8
-        else:
-            self.decoding_dict[last_char] = last_bits
-
+            The decoding dictionnary needed for decompressing the sequence;
+            the last Char number of bits is kept in the last_bits attribute
+        """
+        if self.packed_sequence is None:
+            self.sequence_to_bytes()
+        #Code points 0 to 255 are the latin-1 characters
+        self.huffman_sequence = self.packed_sequence.decode("latin-1")
         return self.huffman_sequence,self.decoding_dict
 
+    def get_bit_reader(self) -> BitReader:
+        """
+        Class method giving a BitReader over the bits of the huffman_sequence
+
+        Returns:
+        ----------
+        BitReader :
+            Reader of the compressed bits
+        """
+        return BitReader(self.huffman_sequence.encode("latin-1"),self.last_bits)
+
     def char_to_binary(self) -> str:
         """
         Class method to transform a compressed sequence to binary
+        The binary string is only needed for display since binary_to_sequence
+        reads the bits directly from the compressed sequence
 
         Returns:
         ----------
         binary_sequence : str
             Intermediate binary sequence obtained from decompressing the Huffman_sequence
         """
-        #Initializing binary_sequence attribute
-        self.binary_sequence = ""
-        #Going through each character of the huffman_sequence
-        for index,char in enumerate(self.huffman_sequence):
-            if index != len(self.huffman_sequence)-1:
-                #Transform Char to binary int and fill first characters with 0 to obtain 8 bit code
-                binary_char = str(format(ord(char),'b')).zfill(8)
-            else:
-                #Replace the last Char by binary equivalent with number of bits from decoding_dict
-                decoding_keys = list(self.decoding_dict.values())
-                #Transform Char to binary int and fill first characters with 0 for last bits code
-                binary_char = str(format(ord(char),'b')).zfill(int(decoding_keys[-1]))
-            #Add partial binary seq to binary_sequence
-            self.binary_sequence += binary_char
+        self.binary_sequence = self.get_bit_reader().to_binary()
         return self.binary_sequence
 
-    def binary_to_sequence(self) -> str:
+    def binary_to_sequence(self,workers=None) -> str:
         """
         Class method for the final step of decompressing the sequence
+        The codes are decoded several bits at a time using the lookup tables of a TableDecoder
+        and the blocks of a blocked sequence are decoded in a pool of processes
+
+        Parameters
+        -----------
+        workers : int (default = None)
+            Number of processes decoding the blocks; the number of processors if not precised
 
         Returns:
         ----------
         original sequence : str
             The final decompressed sequence obtained using the Huffman algorithm
         """
-        #Initialize original sequence attribute
-        self.original_sequence = ""
-        #Calculate length og binary_sequence attribute
-        sequence_length = len(self.binary_sequence)
-        i = 0
-        length_subsequence = 1
-        #Transforming the binary sequence to original DNA sequence
-        while i + length_subsequence <= sequence_length:
-            #Getting the subbinary_sequence from binary_sequence
-            subbinary_sequence = self.binary_sequence[i:i+length_subsequence]
-            #searching for corresonding key to subbinary sequence in decoding dictionnary
-            if subbinary_sequence in self.decoding_dict.keys():
-                #If subsequence in dictionnary add the corresponding value to original_sequence
-                self.original_sequence += self.decoding_dict[subbinary_sequence]
-                #Moving index forward
-                i = i + length_subsequence
-                #Initialize length of subsequence to 1
-                length_subsequence = 1
-            else: #If subsequence is not in the dictionnary increase it's length
-                length_subsequence += 1
-        #Calculate frequency of new original_sequence
-        self.frequency_list = self.car_frequency()
-        #Build BinaryTree corresonding to new original_sequence
-        self.binary_tree = BinaryTree().tree_builder(self.frequency_list)
-        #Create new coding and decoding dictionnaries
-        self.coding_dict, self.decoding_dict = self.binary_tree.get_tree_leaves()
+        bit_reader = self.get_bit_reader()
+        if self.block_offsets:
+            #Decode the blocks in parallel keeping their order
+            data = bit_reader.data
+            ends = self.block_offsets[1:] + [len(data)]
+            packed_blocks = [data[start:end] for start,end in zip(self.block_offsets,ends)]
+            #Only the last block has right-aligned bits
+            last_bits = [8]*(len(packed_blocks)-1) + [bit_reader.last_bits]
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                self.original_sequence = "".join(executor.map(self.block_decode,packed_blocks,
+                    repeat(self.decoding_dict),last_bits,repeat(self.block_size)))
+        else:
+            #Transforming the bits to original DNA sequence
+            table_decoder = TableDecoder(self.decoding_dict)
+            self.original_sequence = table_decoder.decode(bit_reader.data,bit_reader.last_bits)
+        #The decoding_dict already describes the sequence so it is kept for a new compression
+        self.coding_dict = {symbol:code for code,symbol in self.decoding_dict.items()}
         return self.original_sequence
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Huffman decoder module part of the dnashrink package used to decompress Huffman codes
+with precomputed lookup tables instead of reading the bits one by one
+"""
+
+__author__ = 'Mohamed Ouertani'
+
+# Standard library imports
+from typing import Generator
+
+
+class TableDecoder():
+
+    """
+    TableDecoder class decoding packed Huffman codes table_bits bits at a time.
+    The primary table gives, for every table_bits-bit value, all the complete codes
+    it starts with and the number of bits they use, so one lookup usually decodes
+    several nucleotides. Values that are only the prefix of a longer code point to a
+    secondary table indexed by the following bits, giving the symbol and its code length.
+
+    Attributes
+    ----------
+    codes : dict
+        Symbol of each binary code string
+    table_bits : int
+        Number of bits read at once for the primary table lookups
+    max_length : int
+        Length of the longest code
+    primary_table : list[tuple]
+        Decoded symbols and number of bits used for every table_bits-bit value
+    secondary_tables : dict
+        Symbol and code length for the codes longer than table_bits,
+        indexed by their first table_bits bits then by the following bits
+    """
+
+    #Default number of bits read at once
+    TABLE_BITS = 12
+    #Number of bytes added to the bit window at each refill
+    REFILL_BYTES = 32
+
+    def __init__(self,codes:dict,table_bits=TABLE_BITS) -> None:
+        """
+        Class constructor method for initializing all the attributes
+
+        Parameters
+        -----------
+        codes : dict
+            Symbol of each binary code string
+        table_bits : int (default = 12)
+            Number of bits read at once for the primary table lookups
+
+        Returns:
+        ----------
+        None
+        """
+        self.codes = codes
+        self.table_bits = table_bits
+        self.max_length = max((len(code) for code in codes),default=0)
+        self.primary_table = None
+        self.secondary_tables = {}
+        self.build_tables()
+
+    def build_tables(self) -> None:
+        """
+        Class method filling the primary and secondary lookup tables
+
+        Returns:
+        ----------
+        None
+        """
+        table_bits = self.table_bits
+        #Index the codes by their length and value
+        codes = {(len(code),int(code,2)):symbol for code,symbol in self.codes.items()}
+        self.primary_table = []
+        for index in range(1 << table_bits):
+            symbols = []
+            used_bits = length = value = 0
+            #Decode as many complete codes as the index holds
+            for shift in range(table_bits-1,-1,-1):
+                value = (value << 1) | ((index >> shift) & 1)
+                length += 1
+                symbol = codes.get((length,value))
+                if symbol is not None:
+                    symbols.append(symbol)
+                    used_bits += length
+                    length = value = 0
+            self.primary_table.append(("".join(symbols),used_bits))
+        #The codes longer than table_bits fill every secondary index starting with them
+        extra_bits = self.max_length - table_bits
+        for (length,value),symbol in codes.items():
+            if length <= table_bits:
+                continue
+            prefix = value >> (length-table_bits)
+            table = self.secondary_tables.setdefault(prefix,[None]*(1 << extra_bits))
+            suffix = (value & ((1 << (length-table_bits))-1)) << (self.max_length-length)
+            for index in range(suffix,suffix + (1 << (self.max_length-length))):
+                table[index] = (symbol,length)
+
+    def decode(self,data:bytes,last_bits=8) -> str:
+        """
+        Class method decoding all the codes packed in data
+
+        Parameters
+        -----------
+        data : bytes
+            Packed codes; the bits of the last byte are right-aligned
+        last_bits : int (default = 8)
+            Number of bits of the last byte
+
+        Returns:
+        ----------
+        str :
+            The decoded symbols
+        """
+        return "".join(self.decode_stream([data],last_bits))
+
+    def decode_stream(self,chunks,last_bits=8) -> Generator:
+        """
+        Class generator method decoding packed codes read as successive chunks of bytes
+        The codes may be split between chunks; the bits left after the last complete code
+        of a chunk are kept in the window until the next one
+
+        Parameters
+        -----------
+        chunks : iterable[bytes]
+            Successive parts of the packed codes
+        last_bits : int (default = 8)
+            Number of right-aligned bits of the last byte of the last chunk
+
+        Yields:
+        ----------
+        str :
+            The symbols decoded from each chunk
+        """
+        window = available = 0
+        #The last byte read is held back until it is known whether it ends the stream
+        pending = b""
+        for chunk in chunks:
+            if not chunk:
+                continue
+            data = pending + bytes(chunk[:-1])
+            pending = bytes(chunk[-1:])
+            symbols,window,available = self.decode_bits(data,window,available)
+            if symbols:
+                yield symbols
+        if pending:
+            #Left-align the last byte so the bits are contiguous
+            data = bytes([(pending[0] << (8-last_bits)) & 0xFF])
+            symbols,window,available = self.decode_bits(data,window,available,last_bits)
+            yield symbols
+
+    def decode_bits(self,data:bytes,window:int,available:int,last_bits=None) -> tuple:
+        """
+        Class method decoding the codes held by a bit window followed by data
+
+        Parameters
+        -----------
+        data : bytes
+            Bytes following the bits of the window
+        window : int
+            Bits left undecoded by the previous call
+        available : int
+            Number of bits of the window
+        last_bits : int (default = None)
+            Number of bits of the last byte when data ends the stream;
+            otherwise the bits that can't fill a whole lookup are returned undecoded
+
+        Returns:
+        ----------
+        symbols : str
+            The decoded symbols
+        window : int
+            Bits left undecoded
+        available : int
+            Number of bits left undecoded
+        """
+        final = last_bits is not None
+        data_bits = 8*len(data) - (8-last_bits if final and data else 0)
+        table_bits = self.table_bits
+        table_mask = (1 << table_bits) - 1
+        primary_table = self.primary_table
+        secondary_tables = self.secondary_tables
+        extra_bits = self.max_length - table_bits
+        extra_mask = (1 << max(extra_bits,0)) - 1
+        #Bits needed in the window before each lookup
+        window_bits = max(table_bits,self.max_length)
+        refill_bytes = max(self.REFILL_BYTES,window_bits//8 + 1)
+        symbols = []
+        position = 0
+        window &= (1 << available) - 1
+        remaining = available + data_bits
+        #The last lookups of the stream only need table_bits real bits since the codes
+        #can't go past its end; otherwise a lookup waits for a full window
+        threshold = table_bits if final else window_bits
+        while remaining >= threshold:
+            if available < window_bits:
+                #Refill the window with the next bytes, padding the end with zeros
+                chunk = data[position:position+refill_bytes]
+                window = (((window & ((1 << available)-1)) << (8*refill_bytes))
+                          | (int.from_bytes(chunk,"big") << (8*(refill_bytes-len(chunk)))))
+                available += 8*refill_bytes
+                position += refill_bytes
+            prefix = (window >> (available-table_bits)) & table_mask
+            decoded,used_bits = primary_table[prefix]
+            if used_bits:
+                symbols.append(decoded)
+            else:
+                #The index is the prefix of a longer code
+                extra = (window >> (available-self.max_length)) & extra_mask
+                decoded,used_bits = secondary_tables[prefix][extra]
+                symbols.append(decoded)
+            available -= used_bits
+            remaining -= used_bits
+        if not final:
+            #Keep the real bits of the window followed by the bytes not read yet
+            unread = data[position:]
+            window_real_bits = remaining - 8*len(unread)
+            window = (((window >> (available-window_real_bits)) & ((1 << window_real_bits)-1))
+                      << (8*len(unread))) | int.from_bytes(unread,"big")
+            return "".join(symbols),window,remaining
+        #Decode the last bits one by one
+        codes = self.codes
+        code = ""
+        for _ in range(remaining):
+            if available == 0:
+                window = data[position]
+                available = 8
+                position += 1
+            available -= 1
+            code += "1" if (window >> available) & 1 else "0"
+            symbol = codes.get(code)
+            if symbol is not None:
+                symbols.append(symbol)
+                code = ""
+        return "".join(symbols),0,0
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Huffman stream module part of the dnashrink package used to compress or decompress
+sequences larger than memory : the codes are built from a first pass or a sample and
+the sequence is then coded chunk by chunk, every chunk giving its output right away
+"""
+
+__author__ = 'Mohamed Ouertani'
+
+# Standard library imports
+from collections import Counter
+from typing import Generator
+# Local application imports
+from dnashrink.binary_tree import BinaryTree
+from dnashrink.bit_io import BitWriter
+from dnashrink.external_bwt import ExternalBwt
+from dnashrink.huffman import Huffman
+from dnashrink.huffman_decoder import TableDecoder
+
+
+class HuffmanStreamEncoder():
+
+    """
+    HuffmanStreamEncoder class coding a sequence given as successive chunks with
+    canonical Huffman codes built beforehand from the character frequencies
+    Only the bits of the last incomplete byte are kept between two chunks
+
+    Attributes
+    ----------
+    code_lengths : dict
+        Length of the code of each character
+    coding_dict : dict
+        Binary code of each character
+    decoding_dict : dict
+        Character of each binary code
+    bit_writer : BitWriter
+        Writer packing the codes of the chunks
+    sequence_length : int
+        Number of characters coded so far
+    last_bits : int
+        Number of bits of the last byte, known once finish is called
+    """
+
+    #Number of characters read at once from the input files
+    CHUNK_SIZE = 1 << 20
+    #Characters given a code even when the sample used for the frequencies misses them
+    ALPHABET = "ACGTN"
+
+    def __init__(self,frequencies:dict) -> None:
+        """
+        Class constructor method for initializing all the attributes
+
+        Parameters
+        -----------
+        frequencies : dict
+            Frequency of each character that can be found in the sequence
+
+        Returns:
+        ----------
+        None
+        """
+        #Same tree and canonical codes as the Huffman class
+        frequency_list = sorted(frequencies.items(),key=lambda x:(x[1],x[0]))
+        self.code_lengths = BinaryTree().heap_builder(frequency_list).get_code_lengths()
+        self.coding_dict,self.decoding_dict = Huffman.canonical_codes(self.code_lengths)
+        self.bit_writer = BitWriter()
+        self.sequence_length = 0
+        self.last_bits = None
+
+    @classmethod
+    def from_chunks(cls,chunks):
+        """
+        Class method creating an encoder from a first pass over the chunks of the sequence
+
+        Parameters
+        -----------
+        chunks : iterable[str]
+            Successive parts of the sequence
+
+        Returns:
+        ----------
+        HuffmanStreamEncoder :
+            Encoder holding the optimal codes of the sequence
+        """
+        counts = Counter()
+        for chunk in chunks:
+            counts.update(chunk)
+        return cls(counts)
+
+    @classmethod
+    def from_sample(cls,sample:str,alphabet=ALPHABET):
+        """
+        Class method creating an encoder from the frequencies of a sample of the sequence
+        Every character of the alphabet is counted once more so it still gets a code
+
+        Parameters
+        -----------
+        sample : str
+            Part of the sequence whose frequencies are used for the whole of it
+        alphabet : str (default = "ACGTN")
+            Characters that may be found in the sequence
+
+        Returns:
+        ----------
+        HuffmanStreamEncoder :
+            Encoder holding the codes of the sample
+        """
+        counts = Counter(alphabet)
+        counts.update(sample)
+        return cls(counts)
+
+    def feed(self,chunk:str) -> bytes:
+        """
+        Class method coding the next chunk of the sequence
+
+        Parameters
+        -----------
+        chunk : str
+            Next part of the sequence
+
+        Returns:
+        ----------
+        bytes :
+            Complete bytes of codes written since the previous chunk
+        """
+        try:
+            self.bit_writer.write_symbols(chunk,self.coding_dict)
+        except KeyError as error:
+            raise ValueError(f"Character {error} has no Huffman code") from None
+        self.sequence_length += len(chunk)
+        return self.bit_writer.take_bytes()
+
+    def finish(self) -> bytes:
+        """
+        Class method ending the stream and setting the last_bits attribute
+
+        Returns:
+        ----------
+        bytes :
+            Remaining bytes of codes; the bits of the last byte are right-aligned
+        """
+        packed_bytes,self.last_bits = self.bit_writer.get_bytes()
+        self.bit_writer = BitWriter()
+        return bytes(packed_bytes)
+
+    @staticmethod
+    def read_sequence_chunks(input_file:str,chunk_size=CHUNK_SIZE) -> Generator:
+        """
+        Static class generator method reading a sequence or FASTA file in chunks
+        FASTA headers, spaces and backlines are removed by ExternalBwt.read_sequence_lines
+
+        Parameters
+        -----------
+        input_file : str
+            Path of the sequence file
+        chunk_size : int (default = 1 MiB)
+            Number of characters of each chunk
+
+        Yields:
+        ----------
+        str :
+            Successive parts of the sequence
+        """
+        pieces = []
+        size = 0
+        for _,line in ExternalBwt.read_sequence_lines(input_file,chunk_size):
+            pieces.append(line)
+            size += len(line)
+            if size >= chunk_size:
+                yield b"".join(pieces).decode("latin-1")
+                pieces = []
+                size = 0
+        if pieces:
+            yield b"".join(pieces).decode("latin-1")
+
+
+class HuffmanStreamDecoder():
+
+    """
+    HuffmanStreamDecoder class decoding canonical Huffman codes given as successive
+    chunks of bytes, the symbols of each chunk being given right away
+
+    Attributes
+    ----------
+    code_lengths : dict
+        Length of the code of each character
+    decoding_dict : dict
+        Character of each binary code
+    last_bits : int
+        Number of bits of the last byte of the stream
+    table_decoder : TableDecoder
+        Lookup tables decoding the codes
+    """
+
+    def __init__(self,code_lengths:dict,last_bits=8) -> None:
+        """
+        Class constructor method for initializing all the attributes
+
+        Parameters
+        -----------
+        code_lengths : dict
+            Length of the code of each character
+        last_bits : int (default = 8)
+            Number of bits of the last byte of the stream
+
+        Returns:
+        ----------
+        None
+        """
+        self.code_lengths = code_lengths
+        _,self.decoding_dict = Huffman.canonical_codes(code_lengths)
+        self.last_bits = last_bits
+        self.table_decoder = TableDecoder(self.decoding_dict)
+
+    def decode_chunks(self,chunks) -> Generator:
+        """
+        Class generator method decoding the successive chunks of the packed codes
+
+        Parameters
+        -----------
+        chunks : iterable[bytes]
+            Successive parts of the packed codes
+
+        Yields:
+        ----------
+        str :
+            The symbols decoded from each chunk
+        """
+        yield from self.table_decoder.decode_stream(chunks,self.last_bits)
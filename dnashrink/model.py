@@ -9,11 +9,22 @@ interacting and manipulating the data directly under the commands of the Control
 __author__ = 'Mohamed Ouertani'
 
 # Standard library imports
+import json
 import os
 from typing import Generator
 # Local package imports
+from dnashrink.adaptive_huffman import AdaptiveHuffmanCodec
+from dnashrink.alphabet import SequenceAlphabet
+from dnashrink.bit_io import BitReader
 from dnashrink.bwt import Bwt
+from dnashrink.container import Container
+from dnashrink.context_model import ContextCoder
+from dnashrink.external_bwt import ExternalBwt
+from dnashrink.fm_index import FmIndex
 from dnashrink.huffman import Huffman
+from dnashrink.huffman_stream import HuffmanStreamDecoder, HuffmanStreamEncoder
+from dnashrink.mtf_rle import MoveToFront, ZeroRunLength
+from dnashrink.two_bit import TwoBitCodec
 
 
 class Model():
@@ -33,6 +44,8 @@ class Model():
         decompression of DNA sequences
     decoding_dict : dict
         Dictionnary necessary for Decompression of DNA sequences
+    last_bits : int
+        Number of bits of the last Char of the compressed sequence
     current_file : str
         Currently used file name without extension used for saving files
     current_sequence : str
@@ -41,8 +54,56 @@ class Model():
         Function being used to transform the current_sequence
     bwt_status : bool
         Current state of the sequence : BWT or Normal
+    fm_index : FmIndex
+        Index answering pattern queries on the current BWT sequence
+    block_size : int
+        Number of nucleotides per block for new BWT transforms;
+        None to transform the whole sequence as a single block
+    workers : int
+        Number of processes used for blocked transforms; None for all processors
+    bwt_metadata : dict
+        Layout of the current BWT sequence saved in a .meta file next to text files
+        and in the header of container files
+    bwt_stages : list[str]
+        Stages ("mtf" then "rle") applied to BWT sequences before Huffman compression
+    applied_stages : list[str]
+        Stages applied to the current compressed sequence
+    memory_budget : int
+        Maximum number of bytes used by external memory BWT transforms
+    checkpoint_rate : int
+        Number of text positions between two checkpoints saved with new BWT sequences
+        for random access decoding; None to save no checkpoints
+    records : list[list]
+        Header and length of each FASTA record making up the current sequence
+    codec : str
+        Codec used for new compressions : "huffman", "twobit" (fixed 2-bit packing),
+        "context" (order-k context model with a range coder) or "adaptive"
+        (single pass adaptive Huffman coding)
+    codec_options : dict
+        Keyword arguments given to the codec classes, e.g. {"context":{"order":16}}
+    applied_codec : str
+        Codec of the current compressed sequence
+    codec_handler : TwoBitCodec, ContextCoder or AdaptiveHuffmanCodec
+        Codec object of the current sequence when it is not compressed with Huffman
+    huffman_block_size : int
+        Number of characters per block for new Huffman compressions, the blocks being
+        coded and decoded on several processors; None to code a single block
+    huffman_layout : dict
+        Block size and block offsets of the current Huffman compressed sequence
+    alphabet : SequenceAlphabet
+        Alphabet check of the current sequence, kept until the sequence changes
+    kmer_size : int
+        Number of nucleotides coded as a single symbol by new Huffman compressions
+    max_code_length : int
+        Maximum number of bits of the codes of new Huffman compressions; None for no limit
+    original_length : int
+        Length of the sequence given by the decompression of the current sequence;
+        None until it is compressed or loaded from a container
     """
 
+    #Codec classes sharing the encode/decode/get_fields/from_fields interface
+    CODECS = {"twobit":TwoBitCodec,"context":ContextCoder,"adaptive":AdaptiveHuffmanCodec}
+
     def __init__(self,controller) -> None:
         """
         Class constructor method for initializing all the attributes
@@ -61,10 +122,30 @@ class Model():
         self.bwt_handler = None
         self.huffman_handler = None
         self.decoding_dict = None
+        self.last_bits = None
         self.current_file = None
         self.current_sequence = None
         self.current_function = None
         self.bwt_status = None
+        self.fm_index = None
+        self.block_size = None
+        self.workers = None
+        self.bwt_metadata = {}
+        self.bwt_stages = ["mtf","rle"]
+        self.applied_stages = []
+        self.memory_budget = 256*1024*1024
+        self.checkpoint_rate = None
+        self.records = []
+        self.codec = "huffman"
+        self.codec_options = {}
+        self.applied_codec = None
+        self.codec_handler = None
+        self.huffman_block_size = None
+        self.huffman_layout = {}
+        self.alphabet = None
+        self.kmer_size = 1
+        self.max_code_length = None
+        self.original_length = None
         self.create_save_directory()
 
     def file_loader(self,input_file,file_name) -> str:
@@ -85,25 +166,59 @@ class Model():
         """
         #Load new file name
         self.current_file = file_name
-        #Extract sequence from file using sequence_extractor method
-        self.current_sequence = self.sequence_extractor(input_file)
+        self.applied_stages = []
+        self.applied_codec = None
+        self.records = []
+        self.huffman_layout = {}
+        self.original_length = None
+        self.decoding_dict = None
+        self.last_bits = None
+        self.fm_index = None
+        self.bwt_metadata = {}
+        if Container.is_container(input_file):
+            #Read the compressed sequence, its header and its BWT layout from the binary file
+            self.container_to_sequence(Container.load(input_file))
+        else:
+            #Extract sequence from file using sequence_extractor method
+            self.current_sequence = self.sequence_extractor(input_file)
+            #Load the BWT layout saved alongside the file if there is one
+            metadata_file = f"{os.path.splitext(input_file)[0]}.meta"
+            if os.path.exists(metadata_file):
+                with open(metadata_file,"r") as metadata_input:
+                    self.bwt_metadata = json.load(metadata_input)
+                #Recover the records table of files that are not in FASTA format
+                if not self.records:
+                    self.records = self.bwt_metadata.pop("records",[])
         #Conditional update of attributes
         if self.is_uncompressed():
-            self.bwt_handler = Bwt(self.current_sequence)
+            self.bwt_handler = self.create_bwt_handler(self.current_sequence)
             #Checking if sequence is bwt
             if self.bwt_handler.input_is_bwt():
+                self.check_bwt_layout(self.current_sequence)
                 self.bwt_status = True
+                #Load the FM-index saved alongside the BWT file if there is one
+                index_file = f"{os.path.splitext(input_file)[0]}.fmi"
+                if os.path.exists(index_file):
+                    try:
+                        self.fm_index = FmIndex.load(index_file,self.current_sequence)
+                    except ValueError:
+                        #A stale index is rebuilt when it is needed
+                        self.fm_index = None
             else:
                 self.bwt_status = False
         else:
             self.bwt_handler = None
-        self.huffman_handler = Huffman(self.current_sequence,self.decoding_dict)
+        #Reuse the alphabet check instead of letting Huffman scan the sequence again
+        self.huffman_handler = Huffman(self.current_sequence,self.decoding_dict,
+                                       self.is_uncompressed(),self.last_bits,
+                                       **self.huffman_layout)
         return self.current_sequence
 
 
     def sequence_extractor(self,input_file) -> str:
         """
         Class method to read a sequence file and extract the sequence inside
+        Compressed files saved as text before the container format are still read
 
         Parameters
         -----------
@@ -127,6 +242,18 @@ class Model():
             string_dict = all_lines[-1]
             #Convert dictionnary from string format to original format
             self.string_to_dict(string_dict)
+        elif all_lines and all_lines[0].startswith(">"):
+            #Separate the FASTA headers from the sequence of each record
+            sequence_lines = []
+            for line in all_lines:
+                if line.startswith(">"):
+                    self.records.append([line[1:].strip(),0])
+                else:
+                    line = line.replace(" ","").replace("\n","")
+                    self.records[-1][1] += len(line)
+                    sequence_lines.append(line)
+            #Recover the full DNA sequence made of all the records
+            raw_sequence = "".join(sequence_lines)
         else:
             #Recover the full DNA sequence
             raw_sequence = "".join(all_lines)
@@ -145,103 +272,377 @@ class Model():
         bool :
             Verification result of compression status of self.current_sequence
         """
-        #Go through all the characters in the sequence
-        for char in self.current_sequence:
-            #Check if character in list
-            if char not in ["A","T","G","C","N","$"]:
-                return False
-        return True
+        #Compressed sequences know their codec, whatever their Chars are
+        if self.applied_codec is not None:
+            return False
+        #Only scan a sequence the first time it is checked
+        if self.alphabet is None or self.alphabet.sequence is not self.current_sequence:
+            self.alphabet = SequenceAlphabet(self.current_sequence)
+        return self.alphabet.is_nucleotide()
 
 
-    def compress_sequence(self) -> str:
+    def compress_sequence(self,binary_display=False,codec=None) -> str:
         """
         Class method that compresses the current sequence
 
+        Parameters
+        -----------
+        binary_display : bool (default = False)
+            Build the intermediate binary sequence to be displayed
+        codec : str (default = None)
+            Codec used for the compression; the codec attribute if not precised
+
         Returns:
         ----------
         current_sequence : str
             Final Char sequence after compression
         binary_sequence : str
-            Intermediate binary sequence used for compression
+            Intermediate binary sequence used for compression; None if not displayed
         """
-        #Transform current_sequence to binary_sequence
-        binary_sequence = self.huffman_handler.sequence_to_binary()
-        #Transform binary_sequence to Char sequence
+        self.applied_codec = codec or self.codec
+        if self.applied_codec in self.CODECS:
+            #Nucleotide codecs are applied without any stage
+            self.applied_stages = []
+            codec_class = self.CODECS[self.applied_codec]
+            self.codec_handler = codec_class(**self.codec_options.get(self.applied_codec,{}))
+            self.original_length = len(self.current_sequence)
+            packed_sequence = self.codec_handler.encode(self.current_sequence)
+            binary_sequence = None
+            if binary_display:
+                binary_sequence = BitReader(packed_sequence).to_binary()
+            self.current_sequence = packed_sequence.decode("latin-1")
+            return self.current_sequence , binary_sequence
+        #Apply the move-to-front and run-length stages to BWT sequences
+        if self.bwt_status and self.bwt_stages:
+            self.applied_stages = list(self.bwt_stages)
+            staged_sequence = self.stages_encoder(self.current_sequence)
+            self.huffman_handler = Huffman(staged_sequence,uncompressed=True,
+                                           kmer_size=self.kmer_size,
+                                           max_code_length=self.max_code_length)
+        elif ((self.huffman_handler.kmer_size,self.huffman_handler.max_code_length)
+              != (self.kmer_size,self.max_code_length)):
+            #Build the codes of the k-mers of the sequence within the length limit
+            self.huffman_handler = Huffman(self.current_sequence,uncompressed=True,
+                                           kmer_size=self.kmer_size,
+                                           max_code_length=self.max_code_length)
+        #Pack the codes of current_sequence into bytes, block by block for long sequences
+        if (self.huffman_block_size
+            and len(self.huffman_handler.original_sequence) > self.huffman_block_size):
+            self.huffman_handler.block_to_bytes(self.huffman_block_size,self.workers)
+            self.huffman_layout = {"block_size":self.huffman_handler.block_size,
+                                   "block_offsets":self.huffman_handler.block_offsets}
+        else:
+            self.huffman_handler.sequence_to_bytes()
+            self.huffman_layout = {}
+        #Build the binary_sequence only if it is displayed
+        binary_sequence = None
+        if binary_display:
+            binary_sequence = self.huffman_handler.sequence_to_binary()
+        #Transform the packed bytes to Char sequence
         huffman_sequence, decoding_dict = self.huffman_handler.binary_to_char()
         #Update model attributes
+        self.original_length = len(self.huffman_handler.original_sequence)
         self.current_sequence = huffman_sequence
         self.decoding_dict = decoding_dict
+        self.last_bits = self.huffman_handler.last_bits
         return self.current_sequence , binary_sequence
 
-    def decompress_sequence(self) -> str:
+    def decompress_sequence(self,binary_display=False) -> str:
         """
         Class method that decompresses the current sequence
 
+        Parameters
+        -----------
+        binary_display : bool (default = False)
+            Build the intermediate binary sequence to be displayed
+
         Returns:
         ----------
         current_sequence : str
             Final Char sequence after decompression
         binary_sequence : str
-            Intermediate binary sequence used for decompression
+            Intermediate binary sequence used for decompression; None if not displayed
         """
-        #Transform current_sequence to binary_sequence
-        binary_sequence = self.huffman_handler.char_to_binary()
-        #Transform binary_sequence to original_sequence
-        decompressed_sequence = self.huffman_handler.binary_to_sequence()
+        #Build the binary_sequence only if it is displayed
+        binary_sequence = None
+        if self.applied_codec in self.CODECS:
+            packed_sequence = self.current_sequence.encode("latin-1")
+            if binary_display:
+                binary_sequence = BitReader(packed_sequence).to_binary()
+            #Decode the nucleotides and restore the exception runs
+            decompressed_sequence = self.codec_handler.decode(packed_sequence)
+            #The codes of the new handler are only built if the sequence is compressed again
+            self.huffman_handler = Huffman(decompressed_sequence,uncompressed=True)
+        else:
+            if binary_display:
+                binary_sequence = self.huffman_handler.char_to_binary()
+            #Read the compressed bits back to original_sequence
+            decompressed_sequence = self.huffman_handler.binary_to_sequence(self.workers)
+            self.huffman_layout = {}
+        #Compare the decoded sequence with the length saved in the container
+        if self.original_length is not None and len(decompressed_sequence) != self.original_length:
+            raise ValueError(f"{len(decompressed_sequence)} characters were decoded "
+                             f"instead of {self.original_length}")
+        self.original_length = None
+        #Reverse the stages applied before compression
+        if self.applied_stages:
+            decompressed_sequence = self.stages_decoder(decompressed_sequence)
+            self.applied_stages = []
+            self.huffman_handler = Huffman(decompressed_sequence,uncompressed=True)
+        self.applied_codec = None
+        if self.bwt_status:
+            self.check_bwt_layout(decompressed_sequence)
         #Update bwt_handler with new sequence
-        self.bwt_handler = Bwt(decompressed_sequence)
+        self.bwt_handler = self.create_bwt_handler(decompressed_sequence)
+        self.fm_index = None
         #Update current_sequence
         self.current_sequence = decompressed_sequence
         return self.current_sequence,binary_sequence
 
-    def sequence_to_bwt(self) -> Generator:
+    def stages_encoder(self,sequence:str) -> str:
+        """
+        Class method that applies the applied_stages to a sequence in order
+
+        Parameters
+        -----------
+        sequence : str
+            BWT sequence to be prepared for the Huffman compression
+
+        Returns:
+        ----------
+        sequence : str
+            Symbols obtained after all the stages
+        """
+        if "mtf" in self.applied_stages:
+            sequence = MoveToFront().encode(sequence)
+        if "rle" in self.applied_stages:
+            sequence = ZeroRunLength().encode(sequence)
+        return sequence
+
+    def stages_decoder(self,sequence:str) -> str:
+        """
+        Class method that reverses the applied_stages of a sequence in reverse order
+
+        Parameters
+        -----------
+        sequence : str
+            Symbols obtained after the Huffman decompression
+
+        Returns:
+        ----------
+        sequence : str
+            BWT sequence before the stages
+        """
+        if "rle" in self.applied_stages:
+            sequence = ZeroRunLength().decode(sequence)
+        if "mtf" in self.applied_stages:
+            sequence = MoveToFront().decode(sequence)
+        return sequence
+
+    def sequence_to_bwt(self,step_display=False) -> Generator:
         """
         Class method that transforms normal_sequence to bwt_sequence
 
+        Parameters
+        -----------
+        step_display : bool (default = False)
+            If True the rotation matrix steps are returned for display, otherwise
+            the transform is computed directly from the suffix array in linear time
+
         Returns:
         ----------
         Generator :
             When called returns the results of bwt transformation step by step
         """
-        #Return bwt generation steps one by one
-        yield from self.bwt_handler.bwt_generator()
-        #Recover final result of transformation directly
-        bwt_sequence = list(self.bwt_handler.bwt_generator())[-1]
+        self.bwt_metadata = {}
+        self.fm_index = None
+        #Several records are transformed together with one $ each
+        several_records = len(self.records) > 1
+        if step_display and not several_records:
+            #Return bwt generation steps one by one
+            yield from self.bwt_handler.bwt_generator()
+            #Recover final result of transformation stored by the generator
+            bwt_sequence = self.bwt_handler.bwt_sequence
+        elif (self.block_size and len(self.current_sequence) > self.block_size
+              and not several_records):
+            #Transform the blocks of the sequence in parallel
+            bwt_sequence = self.bwt_handler.block_builder(self.block_size,self.workers)
+            yield bwt_sequence
+            #Record the block layout needed for the reverse transformation
+            self.bwt_metadata = {"block_size":self.block_size,
+                                 "primary_indices":self.bwt_handler.primary_indices}
+        else:
+            #Compute the transformation directly using the suffix array
+            bwt_sequence = self.bwt_handler.bwt_builder()
+            yield bwt_sequence
+        #Index the bwt_sequence while its suffix array is available
+        if self.bwt_handler.suffix_array is not None:
+            self.fm_index = FmIndex(bwt_sequence,self.bwt_handler.suffix_array,
+                                    record_lengths=[length for _,length in self.records])
+            #Sample the checkpoints used for random access decoding
+            if self.checkpoint_rate and not several_records:
+                self.bwt_metadata = {
+                    "checkpoint_rate":self.checkpoint_rate,
+                    "checkpoints":self.bwt_handler.checkpoint_sampler(self.checkpoint_rate)}
         #Update model attribuutes using new bwt_sequence
         self.current_sequence = bwt_sequence
         self.huffman_handler = Huffman(bwt_sequence)
-        self.bwt_handler = Bwt(bwt_sequence)
+        self.bwt_handler = self.create_bwt_handler(bwt_sequence)
         self.bwt_status = True
 
-    def bwt_to_sequence(self) -> Generator:
+    def bwt_to_sequence(self,step_display=False) -> Generator:
         """
         Class method that transforms bwt_sequence to normal_sequence
 
+        Parameters
+        -----------
+        step_display : bool (default = False)
+            If True the matrix reconstruction steps are returned for display, otherwise
+            the sequence is decoded directly in linear time using LF-mapping
+
         Returns:
         ----------
         Generator :
             When called returns the results of bwt reverse transformation step by step
         """
-        #Return reverse bwt transformation steps one by one
-        yield from self.bwt_handler.bwt_decoder()
-        #Recover last result of bwt transformation directly
-        original_sequence = list(self.bwt_handler.bwt_decoder())[-1]
+        if self.bwt_handler.block_size:
+            #Reverse the blocks of the sequence in parallel
+            original_sequence = self.bwt_handler.block_decoder(self.workers)
+            yield original_sequence
+        elif step_display and len(self.records) <= 1:
+            #Return reverse bwt transformation steps one by one
+            yield from self.bwt_handler.bwt_decoder()
+            #Recover last result of bwt transformation stored by the decoder
+            original_sequence = self.bwt_handler.normal_sequence
+        else:
+            #Decode the sequence directly using LF-mapping
+            original_sequence = self.bwt_handler.lf_decoder()
+            yield original_sequence
         #Update model attribuutes using new normal_sequence
+        self.fm_index = None
+        self.bwt_metadata = {}
         self.current_sequence = original_sequence
         self.huffman_handler = Huffman(original_sequence)
         self.bwt_handler = Bwt(original_sequence)
         self.bwt_status = False
 
 
+    def file_to_bwt(self,input_file,file_name) -> str:
+        """
+        Class method that transforms a sequence file larger than memory into a BWT file
+        The sequence is never loaded : it is memory-mapped and the BWT is written as a stream
+        Multi-record FASTA files raise a ValueError : their records are only transformed
+        in memory by sequence_to_bwt, with one $ per record
+
+        Parameters
+        -----------
+        input_file : str
+            Represents the file path of the sequence to be transformed
+        file_name : str
+            Represents the name of the file without an extension
+
+        Returns:
+        ----------
+        file_name : str
+            Name of the BWT file that was saved in data directory
+        """
+        bwt_file = f"{file_name}_bwt.txt"
+        ExternalBwt(input_file,f"./data/{bwt_file}",self.memory_budget).transform()
+        #Remove the index and the layout of a previous BWT saved under the same name
+        for sidecar_file in (f"./data/{file_name}_bwt.fmi",f"./data/{file_name}_bwt.meta"):
+            if os.path.exists(sidecar_file):
+                os.remove(sidecar_file)
+        return bwt_file
+
+    def file_to_huffman(self,input_file,file_name,sample_size=None) -> str:
+        """
+        Class method that compresses a sequence file larger than memory with the Huffman
+        algorithm : the file is read in chunks and the compressed bytes are written into
+        a container as each chunk is coded, the header being completed at the end
+
+        Parameters
+        -----------
+        input_file : str
+            Represents the file path of the sequence to be compressed
+        file_name : str
+            Represents the name of the file without an extension
+        sample_size : int (default = None)
+            Number of characters at the start of the sequence whose frequencies are used
+            for the codes; the whole sequence is read twice when not precised
+
+        Returns:
+        ----------
+        file_name : str
+            Name of the compressed file that was saved in data directory
+        """
+        read_chunks = HuffmanStreamEncoder.read_sequence_chunks
+        if sample_size is None:
+            encoder = HuffmanStreamEncoder.from_chunks(read_chunks(input_file))
+        else:
+            sample = []
+            for chunk in read_chunks(input_file,min(sample_size,HuffmanStreamEncoder.CHUNK_SIZE)):
+                sample.append(chunk)
+                sample_size -= len(chunk)
+                if sample_size <= 0:
+                    break
+            encoder = HuffmanStreamEncoder.from_sample("".join(sample))
+        huffman_file = f"{file_name}_huffman.dsk"
+        container = Container(code_lengths=encoder.code_lengths)
+        with container.start_stream(f"./data/{huffman_file}") as container_output:
+            for chunk in read_chunks(input_file):
+                container.write_stream(container_output,encoder.feed(chunk))
+            container.write_stream(container_output,encoder.finish())
+            #The header values only known at the end are written last
+            container.last_bits = encoder.last_bits
+            container.original_length = encoder.sequence_length
+            container.end_stream(container_output)
+        return huffman_file
+
+    def huffman_to_file(self,input_file,file_name) -> str:
+        """
+        Class method that decompresses a Huffman file larger than memory : the compressed
+        bytes are read in chunks and the sequence is written as each chunk is decoded
+        Only the files compressed with Huffman in a single block without stages can be streamed
+
+        Parameters
+        -----------
+        input_file : str
+            Represents the file path of the compressed sequence
+        file_name : str
+            Represents the name of the file without an extension
+
+        Returns:
+        ----------
+        file_name : str
+            Name of the decompressed file that was saved in data directory
+        """
+        container = Container.load(input_file,read_payload=False)
+        if container.codec != "huffman" or container.stages or container.block_offsets:
+            raise ValueError(f"{input_file} can't be decompressed as a stream")
+        decoder = HuffmanStreamDecoder(container.code_lengths,container.last_bits)
+        original_file = f"{file_name}_original.txt"
+        sequence_length = 0
+        with open (f"./data/{original_file}","w") as original_output:
+            for symbols in decoder.decode_chunks(container.read_payload_chunks(input_file)):
+                original_output.write(symbols)
+                sequence_length += len(symbols)
+        if sequence_length != container.original_length:
+            raise ValueError(f"{sequence_length} characters were decoded "
+                             f"instead of {container.original_length}")
+        return original_file
+
     def save_file(self) -> str:
         """
-        Class method that saves the current sequence into .txt file
+        Class method that saves the current sequence into .txt file, or into a .dsk
+        container file if it is compressed
 
         Returns:
         ----------
         file_name : str
             Name of the file that was saved in data directory
         """
+        #Layout saved in a .meta file next to BWT text files
+        metadata = {}
         #Verify if sequence is compressed and save file accordingly
         if self.is_uncompressed():
             #Verify is sequence is bwt or not
@@ -252,30 +653,174 @@ class Model():
                 with open (f"./data/{file_name}","w") as bwt_output:
                     #Write sequence into file
                     bwt_output.write(self.current_sequence)
+                #Save the FM-index alongside single block BWT files for later queries
+                index_file = f"./data/{self.current_file}_bwt.fmi"
+                if not self.bwt_metadata.get("block_size"):
+                    self.get_fm_index().save(index_file)
+                elif os.path.exists(index_file):
+                    os.remove(index_file)
+                metadata = dict(self.bwt_metadata)
+                #Files that are not in FASTA format keep the records table in the metadata
+                if len(self.records) > 1:
+                    metadata["records"] = self.records
             else:
                 #Create file_name
                 file_name = f"{self.current_file}_original.txt"
                 #Create new file
                 with open (f"./data/{file_name}","w") as original_output:
-                    #Write sequence into file
-                    original_output.write(self.current_sequence)
+                    if len(self.records) > 1:
+                        #Write each record back under its FASTA header
+                        start = 0
+                        for header,length in self.records:
+                            original_output.write(f">{header}\n")
+                            original_output.write(self.current_sequence[start:start+length] + "\n")
+                            start += length
+                    else:
+                        #Write sequence into file
+                        original_output.write(self.current_sequence)
         else:
             #Verify is sequence was bwt or not before compression
             if self.bwt_status:
                 #Create file_name
-                file_name = f"{self.current_file}_bwt_huffman.txt"
+                file_name = f"{self.current_file}_bwt_{self.applied_codec}.dsk"
             else:
                 #Create file_name
-                file_name = f"{self.current_file}_huffman.txt"
-            #Transform the decoding_dictionnary to a string
-            string_dict = self.dict_to_string()
-            #Create new file
-            with open (f"./data/{file_name}","w") as huffman_output:
-                #Write sequence and dictionnary into file
-                huffman_output.writelines([self.current_sequence,"\n",string_dict])
+                file_name = f"{self.current_file}_{self.applied_codec}.dsk"
+            #Write the header, the BWT layout and the compressed bytes into a container
+            self.sequence_to_container().save(f"./data/{file_name}")
+        #Save the layout of the BWT sequence alongside the file
+        metadata_file = f"./data/{os.path.splitext(file_name)[0]}.meta"
+        if metadata:
+            with open(metadata_file,"w") as metadata_output:
+                json.dump(metadata,metadata_output)
+        #Remove the layout of a previous file saved under the same name
+        elif os.path.exists(metadata_file):
+            os.remove(metadata_file)
         return file_name
 
 
+    def check_bwt_layout(self,sequence:str) -> None:
+        """
+        Class method verifying that the layout of a BWT sequence was loaded : the $ of
+        a BWT sequence belong to its blocks or its records, which can't be decoded without it
+
+        Parameters
+        -----------
+        sequence : str
+            BWT sequence loaded or decompressed
+
+        Returns:
+        ----------
+        None
+        """
+        if (sequence.count("$") > 1 and not self.bwt_metadata.get("block_size")
+            and len(self.records) <= 1):
+            raise ValueError("The block layout or the records of the BWT sequence are missing")
+
+    def create_bwt_handler(self,sequence:str) -> Bwt:
+        """
+        Class method that creates a Bwt object following the layout of the current BWT
+
+        Parameters
+        -----------
+        sequence : str
+            Sequence to be handled by the Bwt object
+
+        Returns:
+        ----------
+        Bwt :
+            Bwt object aware of the block layout of the sequence
+        """
+        return Bwt(sequence,self.bwt_metadata.get("block_size"),
+                   self.bwt_metadata.get("checkpoint_rate"),self.bwt_metadata.get("checkpoints"),
+                   [length for _,length in self.records])
+
+    def decode_record(self,index:int) -> str:
+        """
+        Class method that decodes a single record of the current multi-record BWT sequence
+
+        Parameters
+        -----------
+        index : int
+            Position of the record in the original FASTA file
+
+        Returns:
+        ----------
+        str :
+            Sequence of the requested record
+        """
+        return self.bwt_handler.decode_record(index,self.fm_index)
+
+    def decode_region(self,start:int,end:int) -> str:
+        """
+        Class method that decodes a region of the current BWT sequence
+        without reversing the whole transformation
+
+        Parameters
+        -----------
+        start : int
+            Position of the first nucleotide of the region in the original sequence
+        end : int
+            Position following the last nucleotide of the region
+
+        Returns:
+        ----------
+        str :
+            The requested region of the original sequence
+        """
+        return self.bwt_handler.decode_range(start,end,self.fm_index)
+
+    def get_fm_index(self) -> FmIndex:
+        """
+        Class method that returns the FM-index of the current BWT sequence
+        The index is only built if it wasn't computed or loaded before
+
+        Returns:
+        ----------
+        fm_index : FmIndex
+            Index answering pattern queries on the current BWT sequence
+        """
+        #Blocks are transformed independently so they can't be searched as one text
+        if self.bwt_metadata.get("block_size"):
+            raise ValueError("The FM-index needs a BWT sequence made of a single block")
+        if self.fm_index is None:
+            self.fm_index = FmIndex(self.current_sequence,
+                                    record_lengths=[length for _,length in self.records])
+        return self.fm_index
+
+    def count_pattern(self,pattern:str) -> int:
+        """
+        Class method that counts the occurrences of a pattern in the current BWT sequence
+
+        Parameters
+        -----------
+        pattern : str
+            Pattern to search without reversing the transformation
+
+        Returns:
+        ----------
+        int :
+            Number of occurrences of the pattern
+        """
+        return self.get_fm_index().count(pattern)
+
+    def locate_pattern(self,pattern:str) -> list:
+        """
+        Class method that locates the occurrences of a pattern in the current BWT sequence
+
+        Parameters
+        -----------
+        pattern : str
+            Pattern to search without reversing the transformation
+
+        Returns:
+        ----------
+        list[int] or list[tuple] :
+            Sorted start positions of the pattern in the original sequence;
+            (record, offset) pairs for a sequence made of several FASTA records
+        """
+        return self.get_fm_index().locate(pattern)
+
     def update_current_function(self,function) -> None:
         """
         Class method to update the current_function arrtibute
@@ -305,33 +850,105 @@ class Model():
         return self.current_sequence
 
 
-    def dict_to_string(self) -> str:
+    def sequence_to_container(self) -> Container:
         """
-        Class method that transforms a decoding_dict into a string for the saving process
+        Class method that gathers the compressed sequence and everything needed
+        for its decompression in a Container for the saving process
 
-        Input
+        Returns:
         ----------
-        decoding_dict : dict
-            Dictionnary used for the decompression process
+        Container :
+            Header values and compressed bytes of the current sequence
+        """
+        if self.applied_codec in self.CODECS:
+            #Save the fields needed by the codec to decode the sequence
+            container = Container(self.applied_codec,fields=self.codec_handler.get_fields())
+        else:
+            #Files compressed before canonical codes are coded again with canonical codes
+            self.current_sequence = self.huffman_handler.canonical_repack()
+            self.decoding_dict = self.huffman_handler.decoding_dict
+            self.last_bits = self.huffman_handler.last_bits
+            container = Container(code_lengths=self.huffman_handler.code_lengths)
+            container.last_bits = self.last_bits
+            container.block_size = self.huffman_layout.get("block_size",0)
+            container.block_offsets = self.huffman_layout.get("block_offsets",[])
+        container.bwt = bool(self.bwt_status)
+        container.stages = self.applied_stages
+        #Save the layout of the BWT sequence and the records table in the header
+        if self.bwt_status:
+            container.bwt_block_size = self.bwt_metadata.get("block_size",0)
+            container.primary_indices = self.bwt_metadata.get("primary_indices",[])
+            container.checkpoint_rate = self.bwt_metadata.get("checkpoint_rate",0)
+            container.checkpoints = self.bwt_metadata.get("checkpoints",[])
+        if len(self.records) > 1:
+            container.records = self.records
+        container.original_length = self.get_original_length()
+        #Code points 0 to 255 are the latin-1 characters
+        container.payload = self.current_sequence.encode("latin-1")
+        return container
+
+    def container_to_sequence(self,container:Container) -> None:
+        """
+        Class method that updates the attributes from a Container loaded from a file
+        for the decompression of its sequence
+
+        Parameters
+        -----------
+        container : Container
+            Header values and compressed bytes read from a file
 
         Returns:
         ----------
-        string_dict : str
-            Decoding_dict transformed into string format for lighter save
+        None
         """
-        #Initialize string_dict
-        string_dict = ""
-        #Go through all items in decoding_dict attribute
-        for i,j in self.decoding_dict.items():
-            #Add items in specific format
-            string_dict += f"{i}:{j},"
-        return string_dict
+        self.applied_codec = container.codec
+        self.applied_stages = container.stages
+        self.bwt_status = container.bwt
+        self.last_bits = container.last_bits
+        self.original_length = container.original_length
+        #Recover the layout of the BWT sequence and the records table
+        self.records = container.records
+        if container.bwt_block_size:
+            self.bwt_metadata = {"block_size":container.bwt_block_size,
+                                 "primary_indices":container.primary_indices}
+        elif container.checkpoint_rate:
+            self.bwt_metadata = {"checkpoint_rate":container.checkpoint_rate,
+                                 "checkpoints":container.checkpoints}
+        if self.applied_codec in self.CODECS:
+            self.codec_handler = self.CODECS[self.applied_codec].from_fields(container.fields)
+            self.decoding_dict = {}
+        else:
+            #Rebuild the canonical codes from the code lengths
+            _,self.decoding_dict = Huffman.canonical_codes(container.code_lengths)
+            if container.block_offsets:
+                self.huffman_layout = {"block_size":container.block_size,
+                                       "block_offsets":container.block_offsets}
+        self.current_sequence = container.payload.decode("latin-1")
+
+    def get_original_length(self) -> int:
+        """
+        Class method that gives the length of the sequence obtained by the decompression
+        of the current sequence; text files don't save it so they are decoded once
+
+        Returns:
+        ----------
+        original_length : int
+            Number of characters given by the decompression before the stages are reversed
+        """
+        if self.original_length is None:
+            if self.applied_codec in self.CODECS:
+                packed_sequence = self.current_sequence.encode("latin-1")
+                self.original_length = len(self.codec_handler.decode(packed_sequence))
+            else:
+                self.original_length = len(self.huffman_handler.binary_to_sequence(self.workers))
+        return self.original_length
 
 
     def string_to_dict(self,string_dict) -> None:
         """
-        Class method that converts a decoding_dict from string
-        format to a dictionnary for the decompression of the sequence
+        Class method that converts the decoding_dict of a compressed text file from
+        string format to a dictionnary for the decompression of the sequence
+        The last item holds the last Char and its number of bits
 
         Parameters
         -----------
@@ -346,14 +963,18 @@ class Model():
         dict_elements = string_dict.split(",")
         #Remove the last , :
         dict_elements = dict_elements[:-1]
-        #Initializing the decoding_dict attribute
-        self.decoding_dict = {}
+        #Text files were only compressed with Huffman
+        self.applied_codec = "huffman"
+        #Initializing the decoding_dict items
+        dict_items = []
         #Fill the dictionnary with the original values
         for items in dict_elements:
             #Split key and value using : separator
             split_items = items.split(":")
-            #Fill the dictionnary
-            self.decoding_dict[split_items[0]] = split_items[1]
+            dict_items.append((split_items[0],split_items[1]))
+        #Recover the last Char number of bits
+        self.last_bits = int(dict_items.pop()[1])
+        self.decoding_dict = dict(dict_items)
 
     @staticmethod
     def create_save_directory() -> None:
@@ -379,6 +1000,7 @@ class Model():
         files_list : list[str]
             A list of all the files inside data directory
         """
-        #Get all files inside data directory
-        files_list = os.listdir("./data")
+        #Get all files inside data directory except the FM-index and layout files
+        files_list = [file_name for file_name in os.listdir("./data")
+                      if not file_name.endswith((".fmi",".meta"))]
         return files_list
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Move-to-front and zero run-length module part of the dnashrink package used between
+the Burrows-Wheeler Transform and the Huffman compression to skew symbol frequencies
+"""
+
+__author__ = 'Mohamed Ouertani'
+
+
+class MoveToFront():
+
+    """
+    MoveToFront class replacing each character by its rank in a recently used list
+    The runs of identical characters produced by the BWT become runs of rank 0
+
+    Attributes
+    ----------
+    alphabet : str
+        Initial order of the characters in the recently used list
+    """
+
+    def __init__(self,alphabet="$ACGNT") -> None:
+        """
+        Class constructor method for initializing all the attributes
+
+        Parameters
+        -----------
+        alphabet : str (default = "$ACGNT")
+            Initial order of the characters in the recently used list
+
+        Returns:
+        ----------
+        None
+        """
+        self.alphabet = alphabet
+
+    def encode(self,sequence:str) -> str:
+        """
+        Class method transforming a sequence into its move-to-front ranks
+
+        Parameters
+        -----------
+        sequence : str
+            Sequence made of the alphabet characters
+
+        Returns:
+        ----------
+        str :
+            Ranks written as digit characters ("0" for the most recent character)
+        """
+        recent = list(self.alphabet)
+        ranks = []
+        for char in sequence:
+            rank = recent.index(char)
+            #Move the character to the front of the list
+            if rank:
+                del recent[rank]
+                recent.insert(0,char)
+            ranks.append(chr(48+rank))
+        return "".join(ranks)
+
+    def decode(self,ranks:str) -> str:
+        """
+        Class method recovering a sequence from its move-to-front ranks
+
+        Parameters
+        -----------
+        ranks : str
+            Ranks written as digit characters
+
+        Returns:
+        ----------
+        str :
+            The original sequence
+        """
+        recent = list(self.alphabet)
+        sequence = []
+        for rank_char in ranks:
+            rank = ord(rank_char) - 48
+            char = recent[rank]
+            #Move the character to the front of the list
+            if rank:
+                del recent[rank]
+                recent.insert(0,char)
+            sequence.append(char)
+        return "".join(sequence)
+
+
+class ZeroRunLength():
+
+    """
+    ZeroRunLength class encoding the runs of rank 0 like bzip2 (RLE0)
+    A run of n zeros is written as n in bijective base 2 using the RUNA and RUNB symbols
+
+    Attributes
+    ----------
+    runa : str
+        Symbol standing for the digit 1 of the run length
+    runb : str
+        Symbol standing for the digit 2 of the run length
+    """
+
+    def __init__(self,runa="a",runb="b") -> None:
+        """
+        Class constructor method for initializing all the attributes
+
+        Parameters
+        -----------
+        runa : str (default = "a")
+            Symbol standing for the digit 1 of the run length
+        runb : str (default = "b")
+            Symbol standing for the digit 2 of the run length
+
+        Returns:
+        ----------
+        None
+        """
+        self.runa = runa
+        self.runb = runb
+
+    def encode(self,ranks:str) -> str:
+        """
+        Class method replacing the runs of "0" ranks by RUNA/RUNB symbols
+
+        Parameters
+        -----------
+        ranks : str
+            Move-to-front ranks written as digit characters
+
+        Returns:
+        ----------
+        str :
+            Ranks with every run of zeros encoded
+        """
+        symbols = []
+        run_length = 0
+        #An extra non zero rank flushes the last run
+        for rank in ranks + "1":
+            if rank == "0":
+                run_length += 1
+                continue
+            #Write the run length least significant digit first
+            while run_length > 0:
+                if run_length & 1:
+                    symbols.append(self.runa)
+                    run_length = (run_length-1) >> 1
+                else:
+                    symbols.append(self.runb)
+                    run_length = (run_length-2) >> 1
+            symbols.append(rank)
+        #Remove the flushing rank
+        symbols.pop()
+        return "".join(symbols)
+
+    def decode(self,symbols:str) -> str:
+        """
+        Class method expanding the RUNA/RUNB symbols back into runs of "0" ranks
+
+        Parameters
+        -----------
+        symbols : str
+            Encoded ranks
+
+        Returns:
+        ----------
+        str :
+            The move-to-front ranks
+        """
+        ranks = []
+        run_length = 0
+        weight = 1
+        #An extra non run symbol flushes the last run
+        for symbol in symbols + "1":
+            if symbol == self.runa:
+                run_length += weight
+                weight <<= 1
+            elif symbol == self.runb:
+                run_length += 2*weight
+                weight <<= 1
+            else:
+                if run_length:
+                    ranks.append("0"*run_length)
+                    run_length = 0
+                    weight = 1
+                ranks.append(symbol)
+        #Remove the flushing symbol
+        ranks.pop()
+        return "".join(ranks)
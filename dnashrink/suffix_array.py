@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Suffix array module part of the dnashrink package used to sort all the suffixes
+of a DNA sequence in linear time with the SA-IS algorithm
+"""
+
+__author__ = 'Mohamed Ouertani'
+
+# Standard library imports
+from array import array
+
+
+class SuffixArray():
+
+    """
+    SuffixArray class used for the linear time construction of the Burrows-Wheeler Transform
+
+    Attributes
+    ----------
+    input_sequence : str
+        Sequence whose suffixes will be sorted; a unique $ sentinel is added at its end
+    record_lengths : list[int]
+        Lengths of the records making up the input_sequence; each record then ends
+        with its own $ sentinel, the sentinels being ordered like the records
+    text : bytes
+        Byte representation of the input_sequence followed by the $ sentinel
+    suffix_array : array
+        Start positions of all the suffixes of text in lexicographic order
+    """
+
+    def __init__(self,input_sequence:str,record_lengths=None) -> None:
+        """
+        Class constructor method for initializing all the attributes
+
+        Parameters
+        -----------
+        input_sequence : str
+            Sequence whose suffixes will be sorted
+        record_lengths : list[int] (default = None)
+            Lengths of the records making up the input_sequence if there are several
+
+        Returns:
+        ----------
+        None
+        """
+        self.input_sequence = input_sequence
+        #A single record keeps the plain text with one $
+        if record_lengths and len(record_lengths) > 1:
+            self.record_lengths = record_lengths
+        else:
+            self.record_lengths = None
+        if self.record_lengths:
+            #Add a $ after each record
+            records = []
+            start = 0
+            for length in self.record_lengths:
+                records.append(input_sequence[start:start+length])
+                start += length
+            self.text = ("$".join(records) + "$").encode("latin-1")
+        else:
+            self.text = (input_sequence + "$").encode("latin-1")
+        self.suffix_array = None
+
+    def build(self) -> array:
+        """
+        Class method that builds the suffix array of the text attribute
+
+        Returns:
+        ----------
+        suffix_array : array
+            Start positions of all the suffixes in lexicographic order
+        """
+        #Get the characters of the sequence in alphabetical order
+        alphabet = sorted(set(self.input_sequence.encode("latin-1")))
+        #Map each character to a rank starting at 1 ; 0 is kept for the $ sentinel
+        ranks = bytearray(range(256))
+        for rank,char in enumerate(alphabet,start=1):
+            ranks[char] = rank
+        ranks[ord("$")] = 0
+        #Translate the text into its integer ranks representation
+        ranked_text = self.text.translate(bytes(ranks))
+        if self.record_lengths:
+            #Sort all the suffixes using distinct sentinels for the records
+            self.suffix_array = self.records_sais(ranked_text,len(alphabet)+1)
+        else:
+            #Sort all the suffixes using the SA-IS algorithm
+            self.suffix_array = self.sais(ranked_text,len(alphabet)+1)
+        return self.suffix_array
+
+    def records_sais(self,ranked_text:bytes,alphabet_size:int) -> array:
+        """
+        Class method sorting the suffixes of several records in a single pass
+        The $ of record j gets rank j+1 so the first rows of the matrix hold the
+        $ of each record in order, and a final sentinel 0 is added for SA-IS
+
+        Parameters
+        -----------
+        ranked_text : bytes
+            Integer representation of the records, each followed by a 0 for its $
+        alphabet_size : int
+            Number of distinct integers in ranked_text
+
+        Returns:
+        ----------
+        suffix_array : array
+            Start positions of all the suffixes of text in lexicographic order
+        """
+        records_count = len(self.record_lengths)
+        #Shift the characters above the sentinels and number the sentinels
+        records_text = array("l",list(ranked_text))
+        sentinel = 0
+        for position,rank in enumerate(records_text):
+            if rank:
+                records_text[position] = rank + records_count
+            else:
+                sentinel += 1
+                records_text[position] = sentinel
+        records_text.append(0)
+        #The final sentinel is the smallest suffix and is removed from the result
+        return self.sais(records_text,alphabet_size+records_count)[1:]
+
+    def bwt(self) -> tuple:
+        """
+        Class method that derives the Burrows-Wheeler Transform from the suffix array
+        The BWT character of each suffix is the character that precedes it in the text
+
+        Returns:
+        ----------
+        bwt_sequence : str
+            Last column of the sorted rotations matrix
+        primary_index : int
+            Row of the sorted rotations matrix holding the original sequence
+        """
+        #Build the suffix array if it wasn't done already
+        if self.suffix_array is None:
+            self.build()
+        text = self.text
+        #Index -1 of the text is the $ sentinel which precedes the first suffix
+        bwt_sequence = bytes(text[position-1] for position in self.suffix_array)
+        #The original sequence is the row preceded by the sentinel
+        primary_index = bwt_sequence.index(b"$")
+        return bwt_sequence.decode("latin-1"),primary_index
+
+    @staticmethod
+    def sais(text,alphabet_size:int) -> array:
+        """
+        Static class method implementing the SA-IS suffix sorting algorithm
+        (Nong, Zhang & Chan 2009) in O(n) time
+
+        Parameters
+        -----------
+        text : bytes or array
+            Integer representation of the text ending with a unique smallest sentinel 0
+        alphabet_size : int
+            Number of distinct integers that may appear in the text
+
+        Returns:
+        ----------
+        suffix_array : array
+            Start positions of all the suffixes of the text in lexicographic order
+        """
+        length = len(text)
+        if length == 1:
+            return array("l",[0])
+        #Classify each position as S-type (1) or L-type (0) going from right to left
+        s_type = bytearray(length)
+        s_type[-1] = 1
+        for i in range(length-2,-1,-1):
+            if text[i] < text[i+1] or (text[i] == text[i+1] and s_type[i+1]):
+                s_type[i] = 1
+        #Mark the leftmost S-type positions (LMS)
+        lms_mark = bytearray(length)
+        lms_positions = []
+        for i in range(1,length):
+            if s_type[i] and not s_type[i-1]:
+                lms_mark[i] = 1
+                lms_positions.append(i)
+        #Compute the size of each character bucket
+        bucket_sizes = [0]*alphabet_size
+        for char in text:
+            bucket_sizes[char] += 1
+        bucket_heads = [0]*alphabet_size
+        bucket_tails = [0]*alphabet_size
+        total = 0
+        for char,size in enumerate(bucket_sizes):
+            bucket_heads[char] = total
+            total += size
+            bucket_tails[char] = total
+
+        def induce(sorted_lms) -> array:
+            #Place the LMS suffixes at the end of their buckets keeping their order
+            suffix_array = array("l",[-1])*length
+            tails = bucket_tails[:]
+            for position in reversed(sorted_lms):
+                char = text[position]
+                tails[char] -= 1
+                suffix_array[tails[char]] = position
+            #Induce the L-type suffixes from left to right
+            heads = bucket_heads[:]
+            for i in range(length):
+                previous = suffix_array[i] - 1
+                if previous >= 0 and not s_type[previous]:
+                    char = text[previous]
+                    suffix_array[heads[char]] = previous
+                    heads[char] += 1
+            #Induce the S-type suffixes from right to left
+            tails = bucket_tails[:]
+            for i in range(length-1,-1,-1):
+                previous = suffix_array[i] - 1
+                if previous >= 0 and s_type[previous]:
+                    char = text[previous]
+                    tails[char] -= 1
+                    suffix_array[tails[char]] = previous
+            return suffix_array
+
+        def lms_substrings_equal(first,second) -> bool:
+            #The sentinel substring is unique
+            if first == length-1 or second == length-1:
+                return False
+            i = 0
+            while True:
+                first_is_lms = lms_mark[first+i]
+                second_is_lms = lms_mark[second+i]
+                #Both substrings reached their ending LMS position at the same time
+                if i > 0 and first_is_lms and second_is_lms:
+                    return True
+                if (first_is_lms != second_is_lms
+                        or text[first+i] != text[second+i]):
+                    return False
+                i += 1
+
+        #First induced sort orders the LMS substrings
+        suffix_array = induce(lms_positions)
+        #Name each LMS substring according to its rank
+        names = array("l",[-1])*length
+        name = -1
+        previous = None
+        for position in suffix_array:
+            if lms_mark[position]:
+                if previous is None or not lms_substrings_equal(previous,position):
+                    name += 1
+                names[position] = name
+                previous = position
+        #Build the reduced text of LMS substring names in text order
+        reduced_text = array("l",(names[position] for position in lms_positions))
+        #Sort the reduced text recursively only if the names are not unique
+        if name+1 < len(lms_positions):
+            reduced_suffix_array = SuffixArray.sais(reduced_text,name+1)
+        else:
+            reduced_suffix_array = array("l",[0])*len(reduced_text)
+            for index,rank in enumerate(reduced_text):
+                reduced_suffix_array[rank] = index
+        #Second induced sort using the correctly ordered LMS suffixes
+        return induce([lms_positions[index] for index in reduced_suffix_array])
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Two bit module part of the dnashrink package used to compress nucleotide sequences
+with a fixed 2-bit code per base, the N runs and other symbols being kept aside.
+NumPy is used for the packing loops when it is installed
+"""
+
+__author__ = 'Mohamed Ouertani'
+
+# Standard library imports
+import re
+# Third party imports
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class TwoBitCodec():
+
+    """
+    TwoBitCodec class packing 4 nucleotides per byte (A=00, C=01, G=10, T=11).
+    The runs of any other symbol are saved in an exception list and are packed as A
+
+    Attributes
+    ----------
+    sequence_length : int
+        Number of nucleotides of the packed sequence
+    runs : list[list]
+        Start, length and symbol of each run of non ACGT symbols
+    backend : str
+        "numpy" when the packing is vectorized, "python" otherwise
+    """
+
+    #2-bit code of each nucleotide
+    BASES = "ACGT"
+    #Runs of a single symbol that is not a nucleotide
+    RUN_PATTERN = re.compile(r"([^ACGT])\1*")
+
+    def __init__(self,sequence_length=None,runs=None) -> None:
+        """
+        Class constructor method for initializing all the attributes
+
+        Parameters
+        -----------
+        sequence_length : int (default = None)
+            Number of nucleotides of the packed sequence if it is already compressed
+        runs : list[list] (default = None)
+            Exception list of the packed sequence if it is already compressed
+
+        Returns:
+        ----------
+        None
+        """
+        self.sequence_length = sequence_length
+        self.runs = runs if runs is not None else []
+        self.backend = "numpy" if np is not None else "python"
+
+    def encode(self,sequence:str) -> bytes:
+        """
+        Class method packing a sequence 4 nucleotides per byte and recording
+        the runs of the other symbols
+
+        Parameters
+        -----------
+        sequence : str
+            Sequence to be packed
+
+        Returns:
+        ----------
+        bytes :
+            Packed sequence; the last byte is padded with A
+        """
+        self.sequence_length = len(sequence)
+        self.runs = self.find_runs(sequence)
+        #Pad the sequence so its length is a multiple of 4
+        sequence += "A"*(-len(sequence) % 4)
+        if self.backend == "numpy":
+            codes = np.zeros(256,dtype=np.uint8)
+            for code,base in enumerate(self.BASES):
+                codes[ord(base)] = code
+            quads = codes[np.frombuffer(sequence.encode("latin-1"),dtype=np.uint8)].reshape(-1,4)
+            packed = (quads[:,0] << 6) | (quads[:,1] << 4) | (quads[:,2] << 2) | quads[:,3]
+            return packed.tobytes()
+        #Write each nucleotide as a base 4 digit; other symbols become 0
+        digits = bytearray(b"0"*256)
+        for code,base in enumerate(self.BASES):
+            digits[ord(base)] = ord("0") + code
+        digit_sequence = sequence.encode("latin-1").translate(bytes(digits))
+        if not digit_sequence:
+            return b""
+        #Parsing a power of 2 base takes linear time
+        return int(digit_sequence,4).to_bytes(len(digit_sequence)//4,"big")
+
+    def decode(self,packed:bytes) -> str:
+        """
+        Class method unpacking a sequence and restoring its exception runs
+
+        Parameters
+        -----------
+        packed : bytes
+            Packed sequence
+
+        Returns:
+        ----------
+        str :
+            The original sequence
+        """
+        if self.backend == "numpy":
+            packed_array = np.frombuffer(packed,dtype=np.uint8)
+            quads = np.empty((len(packed_array),4),dtype=np.uint8)
+            for position,shift in enumerate((6,4,2,0)):
+                quads[:,position] = (packed_array >> shift) & 3
+            bases = np.frombuffer(self.BASES.encode("latin-1"),dtype=np.uint8)
+            unpacked = bases[quads.reshape(-1)].tobytes().decode("latin-1")
+        else:
+            #Each byte value gives its 4 nucleotides
+            quads = ["".join(self.BASES[(value >> shift) & 3] for shift in (6,4,2,0))
+                     for value in range(256)]
+            unpacked = "".join(map(quads.__getitem__,packed))
+        return self.restore_runs(unpacked[:self.sequence_length],self.runs)
+
+    def get_fields(self) -> dict:
+        """
+        Class method giving the fields saved in the header of the compressed file
+
+        Returns:
+        ----------
+        dict :
+            Sequence length and exception runs
+        """
+        return {"length":self.sequence_length,"runs":self.runs_to_string(self.runs)}
+
+    @classmethod
+    def from_fields(cls,fields:dict):
+        """
+        Class method creating a codec from the fields saved in a compressed file header
+
+        Parameters
+        -----------
+        fields : dict
+            Header fields written by get_fields
+
+        Returns:
+        ----------
+        TwoBitCodec :
+            Codec able to decode the compressed sequence
+        """
+        return cls(int(fields["length"]),cls.string_to_runs(fields["runs"]))
+
+    @staticmethod
+    def find_runs(sequence:str) -> list:
+        """
+        Static class method finding the runs of symbols that are not nucleotides
+
+        Parameters
+        -----------
+        sequence : str
+            Sequence to be searched
+
+        Returns:
+        ----------
+        runs : list[list]
+            Start, length and symbol of each run
+        """
+        return [[run.start(),run.end()-run.start(),run.group(1)]
+                for run in TwoBitCodec.RUN_PATTERN.finditer(sequence)]
+
+    @staticmethod
+    def restore_runs(sequence:str,runs:list) -> str:
+        """
+        Static class method writing the runs back over the positions they were taken from
+
+        Parameters
+        -----------
+        sequence : str
+            Decoded sequence holding A at the positions of the runs
+        runs : list[list]
+            Start, length and symbol of each run
+
+        Returns:
+        ----------
+        str :
+            The original sequence
+        """
+        if not runs:
+            return sequence
+        #Put the runs back between the decoded slices
+        pieces = []
+        position = 0
+        for start,length,symbol in runs:
+            pieces.append(sequence[position:start])
+            pieces.append(symbol*length)
+            position = start + length
+        pieces.append(sequence[position:])
+        return "".join(pieces)
+
+    @staticmethod
+    def runs_to_string(runs:list) -> str:
+        """
+        Static class method writing an exception list for the saving process
+
+        Parameters
+        -----------
+        runs : list[list]
+            Start, length and symbol of each run
+
+        Returns:
+        ----------
+        str :
+            Runs written as start+length+symbol separated by ;
+        """
+        return ";".join(f"{start}+{length}+{symbol}" for start,length,symbol in runs)
+
+    @staticmethod
+    def string_to_runs(string_runs:str) -> list:
+        """
+        Static class method reading an exception list written by runs_to_string
+
+        Parameters
+        -----------
+        string_runs : str
+            Runs written as start+length+symbol separated by ;
+
+        Returns:
+        ----------
+        runs : list[list]
+            Start, length and symbol of each run
+        """
+        runs = []
+        for string_run in filter(None,string_runs.split(";")):
+            start,length,symbol = string_run.split("+")
+            runs.append([int(start),int(length),symbol])
+        return runs
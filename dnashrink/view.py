@@ -9,7 +9,6 @@ the UI logic of the application
 __author__ = 'Mohamed Ouertani'
 
 # Standard library imports
-import os
 import tkinter as tk
 from tkinter import DISABLED, END, RIGHT, Y, ttk, filedialog, messagebox
 from tkinter.font import NORMAL
@@ -80,8 +79,8 @@ class View(ThemedTk):
         self.file_list.grid(column=1,row=0,pady=2,padx=5,sticky="news")
         #Bind file selection event from combobox to file_loader method
         self.file_list.bind("<<ComboboxSelected>>", self.file_loader)
-        #Load all the files in data directory to combobox
-        self.update_file_list(os.listdir("./data"))
+        #Load all the sequence files in data directory to combobox
+        self.update_file_list(self.controller.model.get_file_list())
 
         #Create a list of all the frame names
         frame_list = ["File control",
@@ -98,7 +97,7 @@ class View(ThemedTk):
         bwt_buttons = ["Sequence to BWT","BWT to sequence"]
         self.function_framer(main_frame,frame_list[2],bwt_buttons,0,3)
         #Create the Labelframe and buttons for the steps
-        step_buttons = ["Next","End"]
+        step_buttons = ["Next","End","Previous page","Next page"]
         self.function_framer(main_frame,frame_list[3],step_buttons,0,5)
 
         #Create frame for text widget
@@ -156,6 +155,7 @@ class View(ThemedTk):
         file_path = filedialog.askopenfilename(initialdir="./data",
                                                    title="Select a file",
                                                    filetypes=(("text files","*.txt"),
+                                                              ("dnashrink files","*.dsk"),
                                                               ("fasta file",".fasta"),
                                                               ("all files","*.*")))
         #Check if a file is selected or not and show message
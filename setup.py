@@ -23,6 +23,9 @@ setuptools.setup(
                     "ttkthemes==3.2.2"
                       ],
     extras_require={
+        'numpy': [
+            'numpy >= 1.20.0',
+        ],
         'dev': [
             'pytest >= 6.0.0',
             'pytest-cov >= 2.10.0',
@@ -0,0 +1,524 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Tests of the dnashrink transforms against naive implementations and of the model
+saving compressed sequences and loading them back
+"""
+
+__author__ = 'Mohamed Ouertani'
+
+# Standard library imports
+import os
+import random
+import tempfile
+import unittest
+from fractions import Fraction
+# Local package imports
+from dnashrink.binary_tree import BinaryTree
+from dnashrink.bwt import Bwt
+from dnashrink.container import Container
+from dnashrink.context_model import ContextCoder
+from dnashrink.fm_index import FmIndex
+from dnashrink.huffman import Huffman
+from dnashrink.model import Model
+
+
+class BwtTest(unittest.TestCase):
+
+    """
+    BwtTest class comparing the Burrows-Wheeler Transform built from the suffix array
+    with the last column of the sorted rotations matrix
+    """
+
+    #Sequences with runs, repeats and random nucleotides
+    SEQUENCES = ["A","ACGT","AAAAAAAA","ACACACACA","GATTACA","NNACGTNN",
+                 "CCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCA"]
+
+    @staticmethod
+    def naive_bwt(sequence:str) -> str:
+        """
+        Static class method building the BWT from all the rotations of the sequence
+
+        Parameters
+        -----------
+        sequence : str
+            Sequence to be transformed
+
+        Returns:
+        ----------
+        str :
+            Last column of the sorted rotations
+        """
+        text = sequence + "$"
+        rotations = sorted(text[start:] + text[:start] for start in range(len(text)))
+        return "".join(rotation[-1] for rotation in rotations)
+
+    def get_sequences(self) -> list:
+        """
+        Class method giving the fixed sequences and random sequences of several lengths
+
+        Returns:
+        ----------
+        list[str] :
+            Sequences to be transformed
+        """
+        generator = random.Random(1)
+        return self.SEQUENCES + ["".join(generator.choice("ACGTN") for _ in range(length))
+                                 for length in (2,17,64,255,1000)]
+
+    def test_suffix_array_bwt(self) -> None:
+        """
+        Class method verifying the SA-IS construction against the naive rotations
+        """
+        for sequence in self.get_sequences():
+            self.assertEqual(Bwt(sequence).bwt_builder(),self.naive_bwt(sequence),sequence)
+
+    def test_lf_inverse(self) -> None:
+        """
+        Class method verifying that the LF-mapping decoder gives back the sequence
+        """
+        for sequence in self.get_sequences():
+            self.assertEqual(Bwt(self.naive_bwt(sequence)).lf_decoder(),sequence,sequence)
+
+
+class FmIndexTest(unittest.TestCase):
+
+    """
+    FmIndexTest class comparing the pattern queries of the FM-index with a scan of
+    the original sequence
+    """
+
+    #Patterns found many times, once or never in the sequence
+    PATTERNS = ["A","CG","GAT","TTTT","ACGTA","CCCCCCCCCCCC","N"]
+
+    def setUp(self) -> None:
+        """
+        Class method transforming a random sequence
+
+        Returns:
+        ----------
+        None
+        """
+        generator = random.Random(4)
+        self.sequence = "".join(generator.choice("ACGT") for _ in range(3000))
+        self.bwt_handler = Bwt(self.sequence)
+        self.bwt_sequence = self.bwt_handler.bwt_builder()
+
+    def scan(self,pattern:str) -> list:
+        """
+        Class method finding the start positions of a pattern one position at a time
+
+        Parameters
+        -----------
+        pattern : str
+            Pattern to search
+
+        Returns:
+        ----------
+        list[int] :
+            Start positions of the pattern in the sequence
+        """
+        return [start for start in range(len(self.sequence))
+                if self.sequence.startswith(pattern,start)]
+
+    def test_count_locate(self) -> None:
+        """
+        Class method verifying count and locate with sampled positions taken from the
+        suffix array and recovered by LF-mapping
+        """
+        for fm_index in (FmIndex(self.bwt_sequence,self.bwt_handler.suffix_array),
+                         FmIndex(self.bwt_sequence,sa_rate=7)):
+            for pattern in self.PATTERNS:
+                positions = self.scan(pattern)
+                self.assertEqual(fm_index.count(pattern),len(positions),pattern)
+                self.assertEqual(fm_index.locate(pattern),positions,pattern)
+
+    def test_stale_index(self) -> None:
+        """
+        Class method verifying that an index saved for another sequence isn't loaded
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            index_file = os.path.join(directory,"index.fmi")
+            FmIndex(self.bwt_sequence).save(index_file)
+            loaded_index = FmIndex.load(index_file,self.bwt_sequence)
+            self.assertEqual(loaded_index.locate("GAT"),self.scan("GAT"))
+            other_sequence = Bwt(self.sequence[::-1]).bwt_builder()
+            with self.assertRaises(ValueError):
+                FmIndex.load(index_file,other_sequence)
+
+
+class ContainerTest(unittest.TestCase):
+
+    """
+    ContainerTest class reading back the header and payload of a container file and
+    verifying that damaged files are rejected
+    """
+
+    def setUp(self) -> None:
+        """
+        Class method saving a container whose header has every optional section
+
+        Returns:
+        ----------
+        None
+        """
+        self.directory = tempfile.TemporaryDirectory()
+        self.container_file = os.path.join(self.directory.name,"sequence.dsk")
+        self.container = Container(code_lengths={"A":1,"C":2,"G":3,"T":3},
+                                   payload=bytes(range(256))*4)
+        self.container.bwt = True
+        self.container.stages = ["mtf","rle"]
+        self.container.last_bits = 5
+        self.container.original_length = 4000
+        self.container.block_size = 500
+        self.container.block_offsets = [0,300,700]
+        self.container.checkpoint_rate = 64
+        self.container.checkpoints = [3,1,4,1,5]
+        self.container.records = [["chr1",1500],["chr2",2500]]
+        self.container.save(self.container_file)
+        with open(self.container_file,"rb") as container_input:
+            self.file_content = container_input.read()
+
+    def tearDown(self) -> None:
+        """
+        Class method removing the temporary directory
+
+        Returns:
+        ----------
+        None
+        """
+        self.directory.cleanup()
+
+    def load_all(self) -> Container:
+        """
+        Class method loading the container file, then streaming its payload
+
+        Returns:
+        ----------
+        Container :
+            Container read with its payload
+        """
+        container = Container.load(self.container_file)
+        streamed_container = Container.load(self.container_file,read_payload=False)
+        self.assertEqual(b"".join(streamed_container.read_payload_chunks(self.container_file,
+                                                                         100)),
+                         container.payload)
+        return container
+
+    def test_round_trip(self) -> None:
+        """
+        Class method verifying that every header value and the payload are read back
+        """
+        container = self.load_all()
+        for attribute in ("codec","bwt","stages","last_bits","original_length","code_lengths",
+                          "block_size","block_offsets","checkpoint_rate","checkpoints",
+                          "records","payload"):
+            self.assertEqual(getattr(container,attribute),getattr(self.container,attribute),
+                             attribute)
+
+    def test_damaged_files(self) -> None:
+        """
+        Class method verifying that truncated or modified files raise a ValueError
+        """
+        damaged_files = [self.file_content[:length] for length in range(len(self.file_content))]
+        for position in range(0,len(self.file_content),7):
+            damaged_content = bytearray(self.file_content)
+            damaged_content[position] ^= 0x10
+            damaged_files.append(bytes(damaged_content))
+        for damaged_content in damaged_files:
+            with open(self.container_file,"wb") as container_output:
+                container_output.write(damaged_content)
+            with self.assertRaises(ValueError,msg=len(damaged_content)):
+                self.load_all()
+
+
+class ContextCoderTest(unittest.TestCase):
+
+    """
+    ContextCoderTest class decoding the output of the context model range coder with a
+    coder rebuilt from the header fields
+    """
+
+    def get_sequences(self) -> list:
+        """
+        Class method giving sequences with and without symbols other than ACGT
+
+        Returns:
+        ----------
+        list[str] :
+            Sequences to be compressed
+        """
+        generator = random.Random(16)
+        random_sequence = "".join(generator.choice("ACGT") for _ in range(20000))
+        repeated_sequence = "ACGTTGCA"*500 + random_sequence[:4000]
+        return ["","A","ACGT",random_sequence,repeated_sequence,
+                "NNNN" + random_sequence[:5000] + "N"*300 + random_sequence[5000:9000] + "NN",
+                random_sequence[:3000] + "RYKM" + random_sequence[3000:6000] + "acgtn"]
+
+    def test_round_trip(self) -> None:
+        """
+        Class method verifying the round trip of short, hashed and unhashed contexts
+        """
+        for order,table_bits in ((1,22),(2,22),(4,22),(12,22),(16,12)):
+            for sequence in self.get_sequences():
+                coder = ContextCoder(order,table_bits)
+                compressed = coder.encode(sequence)
+                decoder = ContextCoder.from_fields(coder.get_fields())
+                self.assertEqual(decoder.decode(compressed),sequence,(order,len(sequence)))
+
+    def test_compression(self) -> None:
+        """
+        Class method verifying that a repeated sequence is coded below 2 bits per base
+        """
+        sequence = self.get_sequences()[4]
+        compressed = ContextCoder(4).encode(sequence)
+        self.assertLess(8*len(compressed),2*len(sequence))
+
+
+class LimitedCodesTest(unittest.TestCase):
+
+    """
+    LimitedCodesTest class comparing the package-merge code lengths with the lengths
+    of the minimum-redundancy tree
+    """
+
+    @staticmethod
+    def get_frequencies(distinct:bool) -> list:
+        """
+        Static class method giving random frequency lists of 2 to 80 characters
+
+        Parameters
+        -----------
+        distinct : bool
+            Whether the frequencies of a list are all different, so the optimal lengths
+            are unique, or are drawn from a few values
+
+        Returns:
+        ----------
+        list[list[tuple]] :
+            Characters and frequencies of each list
+        """
+        generator = random.Random(24)
+        frequency_lists = []
+        for _ in range(100):
+            characters_count = generator.randint(2,80)
+            if distinct:
+                frequencies = generator.sample(range(1,10**6),characters_count)
+            else:
+                frequencies = [generator.choice((1,2,3,5,1000,10**6))
+                               for _ in range(characters_count)]
+            frequency_lists.append([(f"c{index}",frequency)
+                                    for index,frequency in enumerate(frequencies)])
+        return frequency_lists
+
+    @staticmethod
+    def cost(list_frequencies:list,code_lengths:dict) -> int:
+        """
+        Static class method giving the number of bits coding all the characters
+
+        Parameters
+        -----------
+        list_frequencies : list[tuple]
+            Characters and their frequencies
+        code_lengths : dict
+            Length of the code of each character
+
+        Returns:
+        ----------
+        int :
+            Total length of the codes
+        """
+        return sum(code_lengths[car]*freq for car,freq in list_frequencies)
+
+    def test_unconstrained(self) -> None:
+        """
+        Class method verifying that a limit no code reaches gives the optimal lengths
+        """
+        for distinct in (True,False):
+            for list_frequencies in self.get_frequencies(distinct):
+                tree_lengths = BinaryTree().heap_builder(list_frequencies).get_code_lengths()
+                limited_lengths = Huffman.limited_code_lengths(list_frequencies,
+                                                               len(list_frequencies))
+                #Equal frequencies may be swapped between two lengths
+                if distinct:
+                    self.assertEqual(limited_lengths,tree_lengths)
+                self.assertEqual(self.cost(list_frequencies,limited_lengths),
+                                 self.cost(list_frequencies,tree_lengths))
+
+    def test_limit(self) -> None:
+        """
+        Class method verifying that the codes respect the limit and the Kraft inequality
+        """
+        for list_frequencies in self.get_frequencies(False):
+            optimal_cost = self.cost(list_frequencies,
+                                     BinaryTree().heap_builder(list_frequencies).get_code_lengths())
+            minimum_length = (len(list_frequencies)-1).bit_length()
+            for max_length in range(minimum_length,minimum_length+4):
+                code_lengths = Huffman.limited_code_lengths(list_frequencies,max_length)
+                self.assertEqual(set(code_lengths),{car for car,_ in list_frequencies})
+                self.assertLessEqual(max(code_lengths.values()),max_length)
+                self.assertLessEqual(sum(Fraction(1,1 << length)
+                                         for length in code_lengths.values()),1)
+                self.assertGreaterEqual(self.cost(list_frequencies,code_lengths),optimal_cost)
+            with self.assertRaises(ValueError):
+                Huffman.limited_code_lengths(list_frequencies,minimum_length-1)
+
+
+class ModelRoundTripTest(unittest.TestCase):
+
+    """
+    ModelRoundTripTest class compressing a sequence, saving it, loading the saved file
+    and decompressing it in a new model
+    """
+
+    def setUp(self) -> None:
+        """
+        Class method moving to a temporary directory holding the data directory
+
+        Returns:
+        ----------
+        None
+        """
+        self.previous_directory = os.getcwd()
+        self.directory = tempfile.TemporaryDirectory()
+        os.chdir(self.directory.name)
+        random.seed(21)
+        self.sequence = "".join(random.choice("ACGT") for _ in range(25050))
+        with open("sequence.txt","w") as sequence_output:
+            sequence_output.write(self.sequence)
+
+    def tearDown(self) -> None:
+        """
+        Class method going back to the previous directory and removing the temporary one
+
+        Returns:
+        ----------
+        None
+        """
+        os.chdir(self.previous_directory)
+        self.directory.cleanup()
+
+    def test_kmer_blocks(self) -> None:
+        """
+        Class method verifying that k-mers coded in blocks whose size is not a
+        multiple of k are decoded after a save and a load
+        """
+        model = Model(None)
+        model.kmer_size = 3
+        model.huffman_block_size = 1001
+        model.workers = 1
+        model.file_loader("sequence.txt","sequence")
+        model.compress_sequence()
+        file_name = model.save_file()
+        loaded_model = Model(None)
+        loaded_model.workers = 1
+        loaded_model.file_loader(f"./data/{file_name}","sequence")
+        decompressed_sequence,_ = loaded_model.decompress_sequence()
+        self.assertEqual(decompressed_sequence,self.sequence)
+
+
+    def test_other_characters(self) -> None:
+        """
+        Class method verifying that files which aren't nucleotide sequences are loaded as
+        in the first versions, without the codes of a file loaded before
+        """
+        model = Model(None)
+        model.file_loader("sequence.txt","sequence")
+        model.compress_sequence()
+        file_name = model.save_file()
+        model.file_loader(f"./data/{file_name}","sequence")
+        for sequence in ("acgtacgtnn","ACGRYKMACGT"):
+            with open("other.txt","w") as other_output:
+                other_output.write(sequence)
+            model.file_loader("other.txt","other")
+            self.assertEqual(model.current_sequence,sequence)
+            self.assertFalse(model.is_uncompressed())
+            self.assertIsNone(model.decoding_dict)
+            self.assertIsNone(model.last_bits)
+            self.assertIsNone(model.huffman_handler.code_lengths)
+
+    def test_bwt_layout(self) -> None:
+        """
+        Class method verifying that a compressed blocked BWT sequence is decoded from
+        its container alone, the block layout being saved in its header
+        """
+        model = Model(None)
+        model.block_size = 1000
+        model.workers = 1
+        model.file_loader("sequence.txt","sequence")
+        list(model.sequence_to_bwt())
+        model.compress_sequence()
+        file_name = model.save_file()
+        self.assertFalse(os.path.exists(f"./data/{os.path.splitext(file_name)[0]}.meta"))
+        loaded_model = Model(None)
+        loaded_model.workers = 1
+        loaded_model.file_loader(f"./data/{file_name}","sequence")
+        loaded_model.decompress_sequence()
+        list(loaded_model.bwt_to_sequence())
+        self.assertEqual(loaded_model.current_sequence,self.sequence)
+
+    def test_decode_region(self) -> None:
+        """
+        Class method verifying that regions decoded from the checkpoints of a saved BWT
+        sequence, or from its blocks, match the original sequence
+        """
+        regions = [(0,1),(0,1000),(4321,5321),(24999,25050),(25049,25050),(7,7)]
+        for block_size,checkpoint_rate in ((0,64),(0,1),(1000,0)):
+            model = Model(None)
+            model.block_size = block_size
+            model.checkpoint_rate = checkpoint_rate
+            model.file_loader("sequence.txt","sequence")
+            list(model.sequence_to_bwt())
+            file_name = model.save_file()
+            loaded_model = Model(None)
+            loaded_model.file_loader(f"./data/{file_name}","sequence")
+            for start,end in regions:
+                self.assertEqual(loaded_model.decode_region(start,end),self.sequence[start:end])
+
+    def test_external_bwt(self) -> None:
+        """
+        Class method verifying that the external BWT matches the in-memory one and
+        replaces the index and the layout of a BWT previously saved under its name
+        """
+        for block_size,sidecar_file in ((1000,"./data/sequence_bwt.meta"),
+                                        (0,"./data/sequence_bwt.fmi")):
+            model = Model(None)
+            model.block_size = block_size
+            model.workers = 1
+            model.file_loader("sequence.txt","sequence")
+            list(model.sequence_to_bwt())
+            model.save_file()
+            self.assertTrue(os.path.exists(sidecar_file))
+            bwt_file = model.file_to_bwt("sequence.txt","sequence")
+            self.assertFalse(os.path.exists(sidecar_file))
+        loaded_model = Model(None)
+        loaded_model.file_loader(f"./data/{bwt_file}","sequence")
+        self.assertEqual(loaded_model.current_sequence,Bwt(self.sequence).bwt_builder())
+
+    def test_records(self) -> None:
+        """
+        Class method verifying that each record of a FASTA file is decoded alone from a
+        saved BWT sequence, and that the external BWT rejects several records
+        """
+        records = [("chr1",self.sequence[:10000]),("chr2",self.sequence[10000:10001]),
+                   ("chr3",self.sequence[10001:])]
+        with open("records.fasta","w") as fasta_output:
+            for header,sequence in records:
+                fasta_output.write(f">{header}\n{sequence}\n")
+        model = Model(None)
+        model.file_loader("records.fasta","records")
+        list(model.sequence_to_bwt())
+        self.assertEqual(model.current_sequence.count("$"),len(records))
+        file_name = model.save_file()
+        loaded_model = Model(None)
+        loaded_model.file_loader(f"./data/{file_name}","records")
+        for index,(_,sequence) in enumerate(records):
+            self.assertEqual(loaded_model.decode_record(index),sequence)
+        with self.assertRaises(ValueError):
+            model.file_to_bwt("records.fasta","records")
+        self.assertEqual(sorted(os.listdir("./data")),["records_bwt.fmi","records_bwt.meta",
+                                                        "records_bwt.txt"])
+
+if __name__ == "__main__":
+    unittest.main()